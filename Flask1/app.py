@@ -1,66 +1,143 @@
-from flask import Flask
-from flask import request, jsonify, g, abort
+from flask import Flask, Blueprint, current_app
+from flask.cli import ScriptInfo
+import click
+import functools
+import collections
+import itertools
+import operator
+import os
+import random
+import sqlite3
+import threading
+import time
+from flask import request, jsonify, g, abort, url_for, Response, stream_with_context, has_request_context
+from flask import request_started, request_finished
+from flask.json.provider import DefaultJSONProvider
 from pathlib import Path
+import base64
+import html
+import json
 from werkzeug.exceptions import HTTPException
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.sql import func
-from pathlib import Path
-from flask_migrate import Migrate
+from werkzeug.local import LocalProxy
+from werkzeug.wsgi import ClosingIterator
+from sqlalchemy import text, event, exc, insert, delete, Row, and_, or_, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+from cache import TTLCache, DataVersionWatcher, TableVersions, MISSING
+from sqlite_engine import DEFAULT_PRAGMAS, configure_sqlite_engine
+from metrics import DEFAULT_BUCKETS, RequestMetrics, instrument_engine
+from json_provider import OrjsonProvider, orjson
+from replica import SQLiteReplica
+from group_commit import GroupCommitWriter
+from compression import DEFAULT_LEVELS, available_encodings, get_encoder, compress, compress_chunks
+from datetime import datetime, timezone
+from models import db, is_read_request, is_write_request
+from models import AuthorModel, QuoteModel, QuoteCounterModel, RatingStatsModel, ChangeModel, ChangeLogStateModel
+from models import QuoteSlotModel
 
 BASE_DIR = Path(__file__).parent
 DATABASE = BASE_DIR / "test.db"
 
-app = Flask(__name__)
-app.config['JSON_AS_ASCII'] = False
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{BASE_DIR / 'quotes.db'}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# app.config['SQLALCHEMY_ECHO'] = True
-
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-
-class AuthorModel(db.Model):
-   __tablename__ = "authors"
-   id = db.Column(db.Integer, primary_key=True)
-   name = db.Column(db.String(302), unique=True, nullable=False)
-   quotes = db.relationship('QuoteModel', backref='author', lazy='dynamic', cascade="all, delete-orphan")
-
-   def __init__(self, name):
-       self.name = name
-
-   def __repr__(self):
-      return f"Author({self.name})"
-   
-   def to_dict(self):
-      return {
-         "id": self.id,
-         "name": self.name
-      }
-
-class QuoteModel(db.Model):
-   __tablename__ = "quotes"
-   id = db.Column(db.Integer, primary_key=True)
-   author_id = db.Column(db.Integer, db.ForeignKey(AuthorModel.id), nullable=False)
-   text = db.Column(db.String(255), unique=False, nullable=False)
-   rating = db.Column(db.Integer, unique=False, nullable=False, default=1, server_default="1")
-
-   def __init__(self, author: AuthorModel, text, rating):
-       self.author_id = author.id
-       self.text  = text
-       self.rating = rating
-      
-   def __repr__(self):
-      return f"Quote({self.author}, {self.text}, {self.rating})"
+# Маршруты и обработчики; приложение собирает create_app()
+bp = Blueprint("quotes", __name__)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+   """Учитывает время сериализации ответов jsonify() в g.serialize_time."""
+
+   def response(self, *args, **kwargs):
+      started = time.perf_counter()
+      try:
+         return super().response(*args, **kwargs)
+      finally:
+         if has_request_context():
+            g.serialize_time = g.get("serialize_time", 0.0) + time.perf_counter() - started
+
+
+class TimedOrjsonProvider(TimedJSONProvider, OrjsonProvider):
+   pass
+
+
+def log_slow_query(cursor, statement, parameters, executemany, elapsed):
+   if executemany:
+      parameters = parameters[0] if parameters else ()
+   plan = []
+   if statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+      try:
+         plan = [row[-1] for row in cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+      except sqlite3.Error as e:
+         plan = [f"EXPLAIN failed: {e}"]
+   current_app.logger.warning("Slow query (%.1f ms): %s\n  parameters: %r\n  plan: %s",
+                              elapsed * 1000, " ".join(statement.split()), parameters, "; ".join(plan) or "-")
+
+
+def record_statement(cursor, statement, parameters, executemany, elapsed):
+   if has_request_context():
+      g.sql_count = g.get("sql_count", 0) + 1
+      g.sql_time = g.get("sql_time", 0.0) + elapsed
+   threshold = current_app.config['SLOW_QUERY_THRESHOLD_MS']
+   if threshold is not None and elapsed * 1000 >= threshold:
+      log_slow_query(cursor, statement, parameters, executemany, elapsed)
+
+
+class AppState:
+   """Кэши, выборка, метрики и фоновые потоки одного экземпляра приложения
+   (app.extensions["quotes"]); создается в create_app()."""
 
-   def to_dict(self):
-      return {
-         "id": self.id,
-         "author_id": self.author_id,
-         "text": self.text,
-         "rating": self.rating
-      }
+   def __init__(self, app):
+      config = app.config
+      self.entity_cache = TTLCache(config['ENTITY_CACHE_SIZE'], config['ENTITY_CACHE_TTL'])
+      self.entity_cache_watcher = None
+      # Имя автора -> id для PUT /authors/by-name, POST /authors/batch и импорта
+      self.author_ids = TTLCache(config['AUTHOR_ID_CACHE_SIZE'], config['AUTHOR_ID_CACHE_TTL'])
+      # Создается при первом обращении: путь к БД известен только в контексте приложения
+      self.table_versions = None
+      self.request_metrics = RequestMetrics(config['METRICS_LATENCY_BUCKETS'])
+      # Будит ожидающие (long-poll) запросы GET /changes после commit в этом процессе
+      self.changes_signal = threading.Condition()
+      # Сжатые тела ответов с ETag: ключ - (кодировка, уровень, ETag, путь с параметрами)
+      self.compressed_cache = TTLCache(config['COMPRESSION_CACHE_SIZE'], config['COMPRESSION_CACHE_TTL'])
+      self.replica = None
+      if config['SQLITE_REPLICA']:
+         self.replica = SQLiteReplica(config['QUOTES_DATABASE'], config['SQLITE_REPLICA_DATABASE'],
+                                      config['SQLITE_REPLICA_REFRESH_INTERVAL'], on_swap=swap_replica)
+      self.group_writer = None
+      if config['GROUP_COMMIT']:
+         self.group_writer = GroupCommitWriter(app, db.session, config['GROUP_COMMIT_MAX_BATCH'],
+                                               config['GROUP_COMMIT_MAX_DELAY'])
+
+
+def state() -> AppState:
+   return current_app.extensions["quotes"]
+
+
+entity_cache = LocalProxy(lambda: state().entity_cache)
+author_ids = LocalProxy(lambda: state().author_ids)
+request_metrics = LocalProxy(lambda: state().request_metrics)
+changes_signal = LocalProxy(lambda: state().changes_signal)
+
+
+# Сигналы запроса: счетчики в g обнуляются в начале (контекст приложения может быть
+# общим для нескольких запросов, например в test_client внутри команды CLI).
+# Для потоковых ответов время и размер учитываются без тела, которое отдается позже
+# (calculate_content_length() прочитал бы поток целиком в память).
+def start_request_metrics(sender, **extra):
+   g.request_started = time.perf_counter()
+   g.sql_count, g.sql_time, g.serialize_time, g.compress_time = 0, 0.0, 0.0, 0.0
+
+
+def finish_request_metrics(sender, response, **extra):
+   duration = time.perf_counter() - g.request_started
+   route = request.url_rule.rule if request.url_rule else "<unmatched>"
+   request_metrics.observe(request.method, route, response.status_code, duration,
+                           g.sql_count, g.sql_time, response.content_length or 0)
+   if current_app.config['SERVER_TIMING']:
+      response.headers["Server-Timing"] = (
+         f'db;dur={g.sql_time * 1000:.2f};desc="{g.sql_count} queries", '
+         f'serialize;dur={g.serialize_time * 1000:.2f}, '
+         f'compress;dur={g.compress_time * 1000:.2f}, '
+         f'total;dur={duration * 1000:.2f}'
+      )
 
 
 def validate(in_data: dict, method="POST") -> dict:
@@ -76,45 +153,708 @@ def validate(in_data: dict, method="POST") -> dict:
       in_data.pop("text")
 
    return in_data
-   
+
+
+def encode_cursor(data: dict) -> str:
+   """Непрозрачный курсор: base64(JSON) без padding."""
+   raw = json.dumps(data, separators=(",", ":")).encode()
+   return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+   try:
+      raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+      data = json.loads(raw)
+   except ValueError:
+      abort(400, "Invalid cursor")
+   if not isinstance(data, dict):
+      abort(400, "Invalid cursor")
+   return data
+
+
+# Значения INTEGER SQLite: большее число в курсоре - OverflowError при передаче параметра
+SQLITE_INTEGERS = range(-2 ** 63, 2 ** 63)
+
+
+def is_cursor_int(value) -> bool:
+   """Целое из курсора: true/false - тоже int для isinstance, но не id."""
+   return type(value) is int and value in SQLITE_INTEGERS
+
+
+def parse_page_size(raw, default: int, max_limit: int) -> int:
+   """?limit= -> размер страницы; нечисловой или меньше 1 - 400, а не размер по умолчанию."""
+   if raw is None:
+      return default
+   try:
+      limit = int(raw)
+   except ValueError:
+      limit = 0
+   if limit < 1:
+      abort(400, "limit must be a positive integer")
+   return min(limit, max_limit)
+
+
+def get_page_size() -> int:
+   return parse_page_size(request.args.get("limit"), current_app.config['QUOTES_PAGE_SIZE'],
+                          current_app.config['QUOTES_MAX_PAGE_SIZE'])
+
+
+def paginate_quotes(query):
+   """Keyset-пагинация по quotes.id: ?limit=N&after=<cursor>.
+
+   Стоимость запроса зависит от размера страницы, а не от размера таблицы.
+   Возвращает (список цитат, курсор следующей страницы или None).
+   """
+   limit = get_page_size()
+   after = request.args.get("after")
+   if after:
+      last_id = decode_cursor(after).get("id")
+      if not is_cursor_int(last_id):
+         abort(400, "Invalid cursor")
+      query = query.filter(QuoteModel.id > last_id)
+   quotes_db = query.order_by(QuoteModel.id).limit(limit + 1).all()
+   next_cursor = None
+   if len(quotes_db) > limit:
+      quotes_db = quotes_db[:limit]
+      next_cursor = encode_cursor({"id": quotes_db[-1].id})
+   return quotes_db, next_cursor
+
+
+def page_response(items: list, next_cursor):
+   """Тело ответа остается списком, курсор отдается в заголовках X-Next-Cursor и Link."""
+   response = jsonify(items)
+   if next_cursor:
+      args = {**request.view_args, **request.args.to_dict(), "after": next_cursor}
+      response.headers["X-Next-Cursor"] = next_cursor
+      response.headers["Link"] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+   return response, 200
+
+def wants_stream() -> bool:
+   """Потоковый режим: ?stream=1 или Accept: application/x-ndjson."""
+   if request.args.get("stream") == "1":
+      return True
+   return request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+
+def stream_response(query, **options):
+   """NDJSON-ответ: строки читаются из БД пачками (yield_per) и сразу отдаются клиенту,
+   поэтому память на запрос не зависит от количества строк. options передаются в to_dict().
+   """
+   def generate():
+      for item in query.yield_per(current_app.config['STREAM_BATCH_SIZE']):
+         yield current_app.json.dumps(row_to_dict(item, **options), separators=(",", ":")) + "\n"
+   return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+EXPANSIONS = {"author"}
+
+
+def get_expand() -> set:
+   """?expand=author - встроить в каждую цитату объект автора."""
+   expand = set(filter(None, request.args.get("expand", "").split(",")))
+   unknown = expand - EXPANSIONS
+   if unknown:
+      abort(400, f"Unknown expand: {', '.join(sorted(unknown))}")
+   return expand
+
+
+# Быстрый путь чтения: только нужные столбцы как строки Row, без создания ORM-объектов,
+# identity map и to_dict() на каждую строку
+QUOTE_COLUMNS = (QuoteModel.id, QuoteModel.author_id, QuoteModel.text, QuoteModel.rating)
+AUTHOR_COLUMNS = (AuthorModel.id, AuthorModel.name)
+
+
+def quote_query(query, expand: set):
+   """Без ?expand - строки Row по QUOTE_COLUMNS. С ?expand=author - ORM-объекты, авторы
+   загружаются тем же SELECT через JOIN, без отдельного запроса на каждую цитату."""
+   if "author" in expand:
+      return query.options(joinedload(QuoteModel.author))
+   return query.with_entities(*QUOTE_COLUMNS)
+
+
+# dict(zip(...)) вместо Row._asdict(): на странице из 1000 строк примерно в 9 раз быстрее
+def row_to_dict(item, **options) -> dict:
+   if isinstance(item, Row):
+      return dict(zip(item._fields, item))
+   return item.to_dict(**options)
+
+
+def rows_to_dicts(items: list, **options) -> list:
+   if items and isinstance(items[0], Row):
+      fields = items[0]._fields
+      return [dict(zip(fields, row)) for row in items]
+   return [item.to_dict(**options) for item in items]
+
+
+def expand_rows(rows: list, expand: set) -> list:
+   """?expand для готовых словарей цитат (кэш, FTS-поиск): все авторы одним SELECT ... IN."""
+   if "author" in expand and rows:
+      author_ids = {row["author_id"] for row in rows}
+      authors = {author.id: author.to_dict() for author in AuthorModel.query.filter(AuthorModel.id.in_(author_ids))}
+      rows = [{**row, "author": authors.get(row["author_id"])} for row in rows]
+   return rows
+
+
+def random_counts_statement(author_id=None, min_rating=None):
+   """(rating, count) непустых корзин quote_slots для /quotes/random."""
+   bucket = RatingStatsModel.TOTAL if author_id is None else author_id
+   statement = db.select(RatingStatsModel.rating, RatingStatsModel.count).where(
+      RatingStatsModel.author_id == bucket, RatingStatsModel.count > 0)
+   if min_rating is not None:
+      statement = statement.where(RatingStatsModel.rating >= min_rating)
+   return statement.order_by(RatingStatsModel.rating)
+
+
+def pick_random_slots(counts, n):
+   """Равномерно n различных (rating, slot) из корзин с количеством цитат counts."""
+   counts = list(counts)
+   total = sum(count for _, count in counts)
+   picks = []
+   for idx in sorted(random.sample(range(total), min(n, total))):
+      for rating, count in counts:
+         if idx < count:
+            picks.append((rating, idx + 1))
+            break
+         idx -= count
+   return picks
+
+
+def random_slots_filter(author_id, picks):
+   """Условие на QuoteSlotModel для выбранных слотов: по OR на оценку, каждое - по первичному ключу."""
+   bucket = RatingStatsModel.TOTAL if author_id is None else author_id
+   slots = collections.defaultdict(list)
+   for rating, slot in picks:
+      slots[rating].append(slot)
+   return or_(*(and_(QuoteSlotModel.author_id == bucket, QuoteSlotModel.rating == rating, QuoteSlotModel.slot.in_(rating_slots))
+                for rating, rating_slots in slots.items()))
+
+
+# Ошибки записи по вине клиента: нарушение ограничений и значения, которые драйвер не может
+# связать (список или объект JSON вместо строки). OperationalError (занятая БД) сюда не входит
+CLIENT_WRITE_ERRORS = (exc.IntegrityError, exc.ProgrammingError, exc.InterfaceError, exc.DataError)
+
+
+def run_write(job, *args):
+   """Выполнить job(*args) (см. GroupCommitWriter) и зафиксировать: через групповой
+   commit, если он включен, иначе в сессии запроса. Возвращает результат задания.
+   Ошибки job и commit (IntegrityError и т. п.) пробрасываются вызывающему,
+   сессия запроса при этом уже откачена."""
+   group_writer = state().group_writer
+   if group_writer is not None:
+      # Соединение запроса возвращается в пул до ожидания: иначе ждущие запросы
+      # могут занять весь пул, и писателю не достанется соединения
+      db.session.close()
+      return group_writer.submit(job, *args).result()
+   try:
+      finish = job(*args)
+      db.session.flush()
+      result = finish()
+      db.session.commit()
+   except Exception:
+      db.session.rollback()
+      raise
+   return result
+
+
+def create_author(name):
+   author = AuthorModel(name)
+   db.session.add(author)
+   return author.to_dict
+
+
+def create_quote(author, data):
+   quote = QuoteModel(author=author, **data)
+   db.session.add(quote)
+   return quote.to_dict
+
+
+def parse_ndjson(lines) -> list:
+   """Строки NDJSON -> элементы. Пустые строки пропускаются, нечитаемые возвращаются
+   как None и становятся ошибками своих элементов."""
+   items = []
+   for line in lines:
+      if not line.strip():
+         continue
+      try:
+         items.append(json.loads(line))
+      except ValueError:
+         items.append(None)
+   return items
+
+
+def read_bulk_items() -> list:
+   """Тело пакетного запроса: JSON-массив или NDJSON (Content-Type: application/x-ndjson)."""
+   if request.mimetype == "application/x-ndjson":
+      items = parse_ndjson(request.stream)
+   else:
+      items = request.get_json(silent=True)
+      if not isinstance(items, list):
+         abort(400, "Expected a JSON array or NDJSON body")
+   if len(items) > current_app.config['QUOTES_BULK_MAX_ITEMS']:
+      abort(413, f"Too many items, max is {current_app.config['QUOTES_BULK_MAX_ITEMS']}")
+   return items
+
+
+def check_bulk_quotes(items: list, author_id=None) -> tuple:
+   """Проверка элементов пакета по правилам validate(). Возвращает (результаты по элементам,
+   None для прошедших проверку; список (индекс, строка для вставки)).
+
+   author_id задан - все цитаты этого автора, иначе author_id берется из каждого элемента.
+   """
+   fields = {"text", "rating"} if author_id else {"text", "rating", "author_id"}
+   results = [None] * len(items)
+   rows = []
+   for index, item in enumerate(items):
+      if not isinstance(item, dict):
+         results[index] = {"index": index, "status": 400, "message": "Item must be a JSON object"}
+         continue
+      unknown = set(item) - fields
+      if unknown:
+         results[index] = {"index": index, "status": 400, "message": f"Unknown fields: {', '.join(sorted(unknown))}"}
+         continue
+      data = validate(dict(item), "POST")
+      if data["text"] is None:
+         results[index] = {"index": index, "status": 400, "message": "NOT NULL constraint failed"}
+         continue
+      # Типы - строго: список в text не свяжется драйвером и сорвал бы весь пакет,
+      # а true прошел бы isinstance(..., int) и вернулся бы в ответе как есть
+      if type(data["text"]) is not str:
+         results[index] = {"index": index, "status": 400, "message": "text must be a string"}
+         continue
+      data["author_id"] = author_id or data.get("author_id")
+      if type(data["author_id"]) is not int:
+         results[index] = {"index": index, "status": 400, "message": "author_id must be an integer"}
+         continue
+      # validate() пропускает 1.0 и true как рейтинг 1: в ответе - то, что сохранено
+      data["rating"] = int(data["rating"])
+      rows.append((index, data))
+   return results, rows
+
+
+def insert_bulk_quotes(session, results: list, rows: list, check_authors: bool, chunk_size: int) -> int:
+   """Вставить строки check_bulk_quotes() в сессии session (commit - за вызывающим) и
+   заполнить их результаты. check_authors - проверить, что авторы существуют.
+   Возвращает количество вставленных цитат."""
+   if check_authors:
+      author_ids = list({data["author_id"] for _, data in rows})
+      existing = set()
+      for start in range(0, len(author_ids), chunk_size):
+         chunk = author_ids[start:start + chunk_size]
+         existing.update(session.scalars(db.select(AuthorModel.id).where(AuthorModel.id.in_(chunk))))
+      valid_rows = []
+      for index, data in rows:
+         if data["author_id"] in existing:
+            valid_rows.append((index, data))
+         else:
+            results[index] = {"index": index, "status": 400, "message": f"Author with id = {data['author_id']} not found"}
+      rows = valid_rows
+
+   # sort_by_parameter_order=True SQLite выполняет по одному INSERT на строку: вставляем
+   # пачку одним INSERT ... VALUES и сопоставляем id строкам по значениям (у одинаковых
+   # элементов id взаимозаменяемы)
+   table = QuoteModel.__table__
+   stmt = insert(table).returning(table.c.id, table.c.author_id, table.c.text, table.c.rating)
+   for start in range(0, len(rows), chunk_size):
+      chunk = rows[start:start + chunk_size]
+      ids = collections.defaultdict(collections.deque)
+      for quote_id, *key in session.execute(stmt, [data for _, data in chunk]):
+         ids[tuple(key)].append(quote_id)
+      for index, data in chunk:
+         data["id"] = ids[data["author_id"], data["text"], data["rating"]].popleft()
+         results[index] = {"index": index, "status": 201, "quote": data}
+   return len(rows)
+
+
+def bulk_insert_quotes(items: list, author_id=None):
+   """Проверка всего пакета и вставка одной транзакцией; результаты по элементам в порядке запроса."""
+   results, rows = check_bulk_quotes(items, author_id)
+   try:
+      inserted = insert_bulk_quotes(db.session, results, rows, not author_id, current_app.config['QUOTES_BULK_CHUNK_SIZE'])
+      db.session.commit()
+   except CLIENT_WRITE_ERRORS:
+      db.session.rollback()
+      abort(400, "Batch rejected: constraint failed")
+   return jsonify(inserted=inserted, failed=len(items) - inserted, results=results), 200
+
+def resolve_author_ids(names, use_cache=True) -> tuple:
+   """Имена авторов -> id, недостающие авторы создаются. Возвращает (словарь имя -> id,
+   множество созданных имен). Commit - за вызывающим.
+
+   Известные имена берутся из кэша author_ids (если use_cache и включен
+   ENTITY_CACHE_COORDINATION), остальные - одним SELECT на пачку, новые
+   вставляются одним INSERT ... ON CONFLICT DO NOTHING RETURNING. DO UPDATE вернул бы
+   и существующие строки, но ради этого переписывал бы их, и триггеры журнала изменений
+   записывали бы обновления, которых не было. Имена, вставленные другим соединением
+   между SELECT и INSERT, дочитываются повторным SELECT. В кэш результат попадает
+   после commit (cache_resolved_authors).
+   """
+   # Без сброса по записям других процессов кэш мог бы вернуть id удаленного автора,
+   # а id в authors переиспользуются - цитаты попали бы к другому автору
+   use_cache = use_cache and current_app.config['ENTITY_CACHE_COORDINATION']
+   if use_cache:
+      sync_entity_caches()
+   ids, missing = {}, []
+   for name in dict.fromkeys(names):
+      author_id = author_ids.get(name) if use_cache else MISSING
+      if author_id is MISSING:
+         missing.append(name)
+      else:
+         ids[name] = author_id
+   found, created = insert_missing_authors(db.session, missing, current_app.config['QUOTES_BULK_CHUNK_SIZE'])
+   ids.update(found)
+   if use_cache:
+      db.session.info.setdefault("resolved_authors", {}).update(found)
+   return ids, created
+
+
+def insert_missing_authors(session, names: list, chunk_size: int) -> tuple:
+   """Имена -> id по БД в сессии session, недостающие авторы вставляются (см. resolve_author_ids).
+   Возвращает (словарь имя -> id, множество созданных имен)."""
+   ids, created = {}, set()
+   table = AuthorModel.__table__
+   stmt = sqlite_insert(table).on_conflict_do_nothing(index_elements=["name"]).returning(table.c.name, table.c.id)
+   for start in range(0, len(names), chunk_size):
+      chunk = names[start:start + chunk_size]
+      ids.update(session.execute(db.select(AuthorModel.name, AuthorModel.id).where(AuthorModel.name.in_(chunk))).all())
+      new_names = [name for name in chunk if name not in ids]
+      if new_names:
+         inserted = dict(session.execute(stmt, [{"name": name} for name in new_names]).all())
+         ids.update(inserted)
+         created.update(inserted)
+         lost = [name for name in new_names if name not in inserted]
+         if lost:
+            ids.update(session.execute(db.select(AuthorModel.name, AuthorModel.id).where(AuthorModel.name.in_(lost))).all())
+   return ids, created
+
+
+def sync_entity_caches():
+   """При ENTITY_CACHE_COORDINATION сбросить кэши сущностей и имен авторов,
+   если файл БД изменило другое соединение."""
+   app_state = state()
+   if current_app.config['ENTITY_CACHE_COORDINATION']:
+      if app_state.entity_cache_watcher is None:
+         app_state.entity_cache_watcher = DataVersionWatcher(db.engine.url.database,
+                                                             current_app.config['ENTITY_CACHE_SYNC_INTERVAL'])
+      if app_state.entity_cache_watcher.changed():
+         entity_cache.clear()
+         author_ids.clear()
+
+
+def get_cached_entity(model, entity_id):
+   """to_dict() сущности из кэша или из БД; None, если сущности нет."""
+   app_state = state()
+   sync_entity_caches()
+
+   # Клиент, который недавно писал, читает основную БД в обход кэша:
+   # в кэше может лежать значение, прочитанное из отстающей реплики
+   if app_state.replica is not None and is_read_request() and not g.get("read_replica"):
+      entity = db.session.get(model, entity_id)
+      return entity.to_dict() if entity is not None else None
+
+   key = (model.__tablename__, entity_id)
+   data = entity_cache.get(key)
+   if data is MISSING:
+      # Поколение - до чтения из БД: если запись успеет сменить строку и сбросить кэш,
+      # пока мы читаем старую версию, set() ее не сохранит
+      generation = entity_cache.generation
+      entity = db.session.get(model, entity_id)
+      if entity is None:
+         return None
+      data = entity.to_dict()
+      entity_cache.set(key, data, generation)
+   return data
+
+
+def invalidate_entities(model, *entity_ids):
+   for entity_id in entity_ids:
+      entity_cache.pop((model.__tablename__, entity_id))
+
+
+def get_table_versions() -> TableVersions:
+   app_state = state()
+   if app_state.table_versions is None:
+      app_state.table_versions = TableVersions(db.engine.url.database, current_app.config['TABLE_VERSIONS_SYNC_INTERVAL'])
+   return app_state.table_versions
+
+
+# Таблицы, измененные в текущей транзакции, копятся в session.info; после успешного
+# commit их версии перечитываются из БД, а ожидающие GET /changes будятся. Учитываются
+# и flush ORM-объектов, и массовые insert()/update()/delete() через session.execute().
+def touched_tables(session) -> set:
+   return session.info.setdefault("touched_tables", set())
+
+
+@event.listens_for(db.session, "after_flush")
+def track_flushed_tables(session, flush_context):
+   for obj in itertools.chain(session.new, session.dirty, session.deleted):
+      touched_tables(session).add(obj.__tablename__)
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def track_dml_tables(orm_execute_state):
+   if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+      touched_tables(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+@event.listens_for(db.session, "after_commit")
+def bump_table_versions(session):
+   tables = session.info.pop("touched_tables", None)
+   if tables:
+      get_table_versions().invalidate()
+      if tables & {"quotes", "authors"}:
+         with changes_signal:
+            changes_signal.notify_all()
+
+
+@event.listens_for(db.session, "after_commit")
+def cache_resolved_authors(session):
+   for name, author_id in session.info.pop("resolved_authors", {}).items():
+      author_ids.set(name, author_id)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def forget_touched_tables(session, previous_transaction):
+   session.info.pop("touched_tables", None)
+   session.info.pop("resolved_authors", None)
+
+
+def swap_replica():
+   """Новый снимок реплики: закрыть соединения пула со старым файлом и сбросить кэш сущностей."""
+   db.engines["replica"].dispose()
+   entity_cache.clear()
+
+
+REPLICA_COOKIE = "quotes_written_at"
+
+
+@bp.before_app_request
+def choose_read_bind():
+   """g.read_replica - момент снимка реплики, если GET-запрос читает реплику, иначе None.
+
+   Реплика не используется, пока ее нет, и для клиента, чья последняя запись
+   (cookie REPLICA_COOKIE) сделана позже снимка: он видит свои изменения.
+   """
+   g.read_replica = None
+   replica = state().replica
+   if replica is None or not is_read_request():
+      return
+   if current_app.config['SQLITE_REPLICA_REFRESH']:
+      replica.start()
+   synced_at = replica.poll()
+   written_at = request.cookies.get(REPLICA_COOKIE, default=0.0, type=float)
+   if synced_at and written_at < synced_at:
+      g.read_replica = synced_at
+
+
+@bp.after_app_request
+def mark_written(response):
+   if state().replica is not None and not is_read_request() and response.status_code < 400:
+      response.set_cookie(REPLICA_COOKIE, f"{time.time():.6f}", max_age=current_app.config['SQLITE_REPLICA_STICKY_SECONDS'],
+                          httponly=True, samesite="Lax")
+   return response
+
+
+def conditional(*tables):
+   """Условный GET: ETag и Last-Modified по версиям таблиц.
+
+   Если клиент прислал совпадающий If-None-Match (или не изменившийся If-Modified-Since),
+   304 отдается до вызова обработчика, то есть без обращения к ORM.
+   """
+   def decorator(view):
+      @functools.wraps(view)
+      def wrapper(*args, **kwargs):
+         if request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+         # Встроенный автор: ответ зависит и от authors, и отличается от обычного представления
+         expand_author = "quotes" in tables and "author" in request.args.get("expand", "").split(",")
+         etag, modified_at = get_table_versions().get(*tables, *(("authors",) if expand_author else ()))
+         if expand_author:
+            etag += ".author"
+         if wants_stream():
+            etag += ".ndjson"
+         # Ответ из реплики зависит от снимка, а не только от версий таблиц
+         if g.read_replica:
+            etag += f".r{int(g.read_replica * 1000)}"
+            modified_at = max(modified_at, g.read_replica)
+         # Last-Modified - с точностью до секунды, и запись в ту же секунду, что и
+         # If-Modified-Since, могла быть уже после ответа клиенту. Поэтому 304 - только
+         # если последнее изменение было в более раннюю секунду. Пока секунда изменения
+         # не прошла, Last-Modified - она сама (такой ответ будет проверен заново),
+         # потом - следующая секунда: все изменения до нее клиент уже получил.
+         changed_second = int(modified_at)
+         last_modified = datetime.fromtimestamp(min(changed_second + 1, int(time.time())), timezone.utc)
+         if request.if_none_match:
+            # Сжатый ответ отдается с ETag, к которому добавлена кодировка (compress_response)
+            encoding = negotiate_encoding()
+            if encoding and request.if_none_match.contains(f"{etag}.{encoding}"):
+               etag += f".{encoding}"
+            not_modified = request.if_none_match.contains(etag)
+         else:
+            not_modified = request.if_modified_since is not None and changed_second < request.if_modified_since.timestamp()
+         if not_modified:
+            response = Response(status=304)
+            # 304 повторяет заголовки представления: без Vary кэш отдал бы клиенту без
+            # поддержки сжатия сохраненное сжатое тело
+            if current_app.config['COMPRESSION']:
+               response.vary.add("Accept-Encoding")
+         else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+               return response
+         response.set_etag(etag)
+         response.last_modified = last_modified
+         return response
+      return wrapper
+   return decorator
+
+
+def negotiate_encoding():
+   """Content-Encoding ответа: лучшая по Accept-Encoding из COMPRESSION_ENCODINGS или None."""
+   config = current_app.config
+   if not config['COMPRESSION']:
+      return None
+   return request.accept_encodings.best_match(available_encodings(config['COMPRESSION_ENCODINGS']))
+
+
+@bp.after_app_request
+def compress_response(response):
+   """Сжатие ответов COMPRESSION_MIMETYPES по Accept-Encoding.
+
+   Обычное тело сжимается, если оно не короче COMPRESSION_MIN_SIZE; результат для ответа
+   с ETag берется из кэша, пока ETag не изменится. Потоковое тело (NDJSON) сжимается по
+   мере отдачи, без порога и кэша. К ETag сжатого ответа добавляется кодировка: у разных
+   представлений разные ETag, а conditional() узнает его в If-None-Match.
+   """
+   config = current_app.config
+   if (not config['COMPRESSION'] or response.mimetype not in config['COMPRESSION_MIMETYPES']
+         or response.status_code != 200 or "Content-Encoding" in response.headers):
+      return response
+   response.vary.add("Accept-Encoding")
+   encoding = negotiate_encoding()
+   if encoding is None:
+      return response
+   level = config['COMPRESSION_LEVELS'][encoding]
+   etag, weak = response.get_etag()
+   if response.is_streamed:
+      chunks = response.response
+      response.response = ClosingIterator(compress_chunks(chunks, encoding, level),
+                                          [chunks.close] if hasattr(chunks, "close") else None)
+      response.headers.pop("Content-Length", None)
+   else:
+      body = response.get_data()
+      if len(body) < config['COMPRESSION_MIN_SIZE']:
+         return response
+      started = time.perf_counter()
+      key = (encoding, level, etag, weak, request.full_path) if etag else None
+      data = state().compressed_cache.get(key) if key else MISSING
+      if data is MISSING:
+         data = compress(body, encoding, level)
+         if key:
+            state().compressed_cache.set(key, data)
+      response.set_data(data)
+      g.compress_time = g.get("compress_time", 0.0) + time.perf_counter() - started
+   response.headers["Content-Encoding"] = encoding
+   if etag:
+      response.set_etag(f"{etag}.{encoding}", weak)
+   return response
+
 # Обработка ошибок и возврат сообщения в виде JSON
-@app.errorhandler(HTTPException)
+@bp.app_errorhandler(HTTPException)
 def handle_exception(e):
     return jsonify({"message": e.description}), e.code
 
-@app.teardown_appcontext
+# Занятая БД - временная ошибка: 503 с Retry-After вместо 400
+@bp.app_errorhandler(exc.OperationalError)
+def handle_database_error(e):
+    db.session.rollback()
+    if "locked" in str(e.orig) or "busy" in str(e.orig):
+        return jsonify({"message": "Database is busy, try again later"}), 503, {"Retry-After": "1"}
+    return jsonify({"message": "Database error"}), 500
+
 def close_connection(exception):
     db = getattr(g, '_database', None)
     if db is not None:
         db.close()
 
-@app.route("/authors", methods=["GET", "POST"])
+@bp.get("/cache/stats")
+def get_cache_stats():
+   return jsonify(entity_cache.stats()), 200
+
+@bp.get("/metrics")
+def get_metrics():
+   return Response(request_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@bp.route("/authors", methods=["GET", "POST"])
+@conditional("authors")
 def handle_authors():
       if request.method == "GET":
-         authors = AuthorModel.query.all()
-         authors_dict = []
-         for author in authors:
-            authors_dict.append(author.to_dict())
+         if wants_stream():
+            return stream_response(AuthorModel.query.with_entities(*AUTHOR_COLUMNS).order_by(AuthorModel.id))
+         authors = AuthorModel.query.with_entities(*AUTHOR_COLUMNS).all()
+         authors_dict = rows_to_dicts(authors)
          return jsonify(authors_dict), 200       
       if request.method == "POST":
          author_data = request.json
-         author = AuthorModel(author_data.get("name", "Ivan"))
-         db.session.add(author)
          try:
-            db.session.commit()
-            return author.to_dict(), 201
-         except:
-            abort(400, "UNIQUE constraint failed")   
+            return run_write(create_author, author_data.get("name", "Ivan")), 201
+         except exc.IntegrityError:
+            abort(400, "UNIQUE constraint failed")
+         except CLIENT_WRITE_ERRORS:
+            abort(400, "name must be a string")
+
+@bp.put("/authors/by-name/<name>")
+def upsert_author_by_name(name):
+   """Идемпотентное создание автора по имени: 201 - создан, 200 - уже был."""
+   # Одно имя - один SELECT по индексу, кэш ничего не сэкономит
+   ids, created = resolve_author_ids([name], use_cache=False)
+   db.session.commit()
+   return jsonify({"id": ids[name], "name": name}), 201 if created else 200
+
+@bp.post("/authors/batch")
+def batch_authors():
+   """Авторы по списку имен (строки или {"name": ...}, JSON-массив или NDJSON):
+   id существующих и новых одной транзакцией, результаты в порядке запроса."""
+   results, names = check_author_names(read_bulk_items())
+   ids, created = resolve_author_ids(name for _, name in names)
+   db.session.commit()
+   return jsonify(author_batch_results(results, names, ids, created)), 200
 
-@app.route("/authors/<int:author_id>", methods=["GET", "PUT", "DELETE"])
+def check_author_names(items: list) -> tuple:
+   """Элементы /authors/batch -> (результаты с ошибками элементов, список (индекс, имя))."""
+   results = [None] * len(items)
+   names = []
+   for index, item in enumerate(items):
+      name = item.get("name") if isinstance(item, dict) else item
+      if not isinstance(name, str) or not name:
+         results[index] = {"index": index, "status": 400, "message": 'Item must be a name or {"name": name}'}
+         continue
+      names.append((index, name))
+   return results, names
+
+def author_batch_results(results: list, names: list, ids: dict, created: set) -> dict:
+   created = set(created)
+   for index, name in names:
+      # Повтор имени в пакете - уже существующий автор
+      status = 201 if name in created else 200
+      created.discard(name)
+      results[index] = {"index": index, "status": status, "author": {"id": ids[name], "name": name}}
+   counts = collections.Counter(result["status"] for result in results)
+   return {"created": counts[201], "existing": counts[200], "failed": counts[400], "results": results}
+
+@bp.route("/authors/<int:author_id>", methods=["GET", "PUT", "DELETE"])
+@conditional("authors")
 def handle_author(author_id):
-      author = AuthorModel.query.get(author_id)
+      if request.method == "GET":
+         author = get_cached_entity(AuthorModel, author_id)
+         if not author:
+            abort(404, f"Author with id = {author_id} not found")
+         return jsonify(author), 200
+
+      author = db.session.get(AuthorModel, author_id)
       if not author:
          abort(404, f"Author with id = {author_id} not found")
-      
-      if request.method == "GET":
-         return jsonify(author.to_dict()), 200
 
+      old_name = author.name
       message = {}
       if request.method == "PUT":
          new_data = request.json
@@ -123,51 +863,76 @@ def handle_author(author_id):
             setattr(author, key, value)
          message = author.to_dict()
 
+      deleted_ids = []
       if request.method == "DELETE":
-         quotes_db = QuoteModel.query.filter_by(author_id=author_id).all()
-         for quote in quotes_db:
-            db.session.delete(quote)
-         db.session.delete(author)
+         # Set-based удаление: один DELETE по индексу author_id вместо загрузки и удаления каждой цитаты
+         deleted_ids = db.session.scalars(
+            delete(QuoteModel).where(QuoteModel.author_id == author_id).returning(QuoteModel.id)).all()
+         db.session.execute(delete(AuthorModel).where(AuthorModel.id == author_id))
          message = {"message": f"Author with id={author_id} deleted successfully"}
     
       try:
          db.session.commit()
+         invalidate_entities(AuthorModel, author_id)
+         invalidate_entities(QuoteModel, *deleted_ids)
+         author_ids.pop(old_name)
          return jsonify(message), 200
-      except:
-         abort(400, f"Database commit operation failed.") 
+      except CLIENT_WRITE_ERRORS:
+         db.session.rollback()
+         abort(400, "Database commit operation failed.")
 
-@app.route("/authors/<int:author_id>/quotes", methods=["GET", "POST"])
+@bp.route("/authors/<int:author_id>/quotes", methods=["GET", "POST"])
+@conditional("authors", "quotes")
 def handle_quotes_by_author(author_id):
-   author = AuthorModel.query.get(author_id)
+   author = db.session.get(AuthorModel, author_id)
    if not author:
       abort(404, f"Author with id = {author_id} not found")
 
    if request.method == "GET":
-      quotes_db = QuoteModel.query.filter_by(author_id=author_id).all()
-      quotes_dict = []
-      for quote in quotes_db:
-         quotes_dict.append(quote.to_dict())
-      return jsonify(quotes_dict), 200      
+      expand = get_expand()
+      query = quote_query(QuoteModel.query.filter_by(author_id=author_id), expand)
+      if wants_stream():
+         return stream_response(query.order_by(QuoteModel.id), expand=expand)
+      quotes_db, next_cursor = paginate_quotes(query)
+      quotes_dict = rows_to_dicts(quotes_db, expand=expand)
+      return page_response(quotes_dict, next_cursor)
 
    if request.method == "POST":
       data = request.json
       data = validate(data, "POST")
-      new_quote = QuoteModel(author=author, **data)
-      db.session.add(new_quote)
       try:
-         db.session.commit()
-         return jsonify(new_quote.to_dict()), 200
-      except:       
+         new_quote = run_write(create_quote, author, data)
+      except exc.IntegrityError:
          abort(400, "NOT NULL constraint failed")
+      except CLIENT_WRITE_ERRORS:
+         abort(400, "text must be a string")
+      return jsonify(new_quote), 200
+
+@bp.post("/authors/<int:author_id>/quotes/bulk")
+def bulk_quotes_by_author(author_id):
+   if not db.session.get(AuthorModel, author_id):
+      abort(404, f"Author with id = {author_id} not found")
+   return bulk_insert_quotes(read_bulk_items(), author_id)
+
+@bp.post("/quotes/bulk")
+def bulk_quotes():
+   return bulk_insert_quotes(read_bulk_items())
 
-@app.route("/quotes/<int:quote_id>", methods=["GET", "PUT", "DELETE"])
+@bp.route("/quotes/<int:quote_id>", methods=["GET", "PUT", "DELETE"])
+@conditional("quotes")
 def handle_quote_by_id(quote_id):
-      quote = QuoteModel.query.get(quote_id)
+      if request.method == "GET":
+         expand = get_expand()
+         quote = get_cached_entity(QuoteModel, quote_id)
+         if not quote:
+            abort(404, f"Quote with id={quote_id} not found")
+         if "author" in expand:
+            quote = {**quote, "author": get_cached_entity(AuthorModel, quote["author_id"])}
+         return jsonify(quote), 200
+
+      quote = db.session.get(QuoteModel, quote_id)
       if not quote:
          abort(404, f"Quote with id={quote_id} not found")
-      
-      if request.method == "GET":
-         return jsonify(quote.to_dict()), 200
 
       message = {}
       if request.method == "PUT":
@@ -184,59 +949,590 @@ def handle_quote_by_id(quote_id):
       
       try:
          db.session.commit()
+         invalidate_entities(QuoteModel, quote_id)
          return jsonify(message), 200
-      except:
-         abort(400, f"Database commit operation failed.") 
+      except CLIENT_WRITE_ERRORS:
+         db.session.rollback()
+         abort(400, "Database commit operation failed.")
          
-@app.route("/quotes")
+@bp.route("/quotes")
+@conditional("quotes")
 def get_quotes():
    """Сериализация: list[quotes] -> list[dict] -> str(JSON)"""
-   quotes_db = QuoteModel.query
-   quotes = []
-   for quote in quotes_db:
-      quotes.append(quote.to_dict())
-   
-   return jsonify(quotes), 200
-
-@app.get("/quotes/random")
+   expand = get_expand()
+   if wants_stream():
+      return stream_response(quote_query(QuoteModel.query, expand).order_by(QuoteModel.id), expand=expand)
+   quotes_db, next_cursor = paginate_quotes(quote_query(QuoteModel.query, expand))
+   quotes = rows_to_dicts(quotes_db, expand=expand)
+
+   return page_response(quotes, next_cursor)
+
+@bp.delete("/quotes")
+def delete_quotes():
+   """Массовое удаление одним DELETE: ?author_id= и/или ?rating=."""
+   conditions = []
+   for name in ("author_id", "rating"):
+      if name in request.args:
+         value = request.args.get(name, type=int)
+         if value is None:
+            abort(400, f"{name} must be an integer")
+         conditions.append(getattr(QuoteModel, name) == value)
+   if not conditions:
+      abort(400, "At least one filter (author_id, rating) is required")
+
+   deleted_ids = db.session.scalars(delete(QuoteModel).where(*conditions).returning(QuoteModel.id)).all()
+   try:
+      db.session.commit()
+   except exc.IntegrityError:
+      db.session.rollback()
+      abort(400, "Database commit operation failed.")
+   invalidate_entities(QuoteModel, *deleted_ids)
+   return jsonify(deleted=len(deleted_ids)), 200
+
+@bp.get("/quotes/random")
 def get_random_quote():
-   quote = QuoteModel.query.order_by(func.random()).limit(1)
-   if quote:
-      return jsonify(quote[0].to_dict()), 200
-   abort(404)
+   """?n=K - K различных цитат списком, ?author_id= и ?min_rating= - ограничения выборки."""
+   n = request.args.get("n", default=1, type=int)
+   author_id = request.args.get("author_id", type=int)
+   min_rating = request.args.get("min_rating", type=int)
+   expand = get_expand()
+   if n < 1:
+      abort(400, "n must be a positive integer")
+   if author_id is not None and author_id < 1:
+      abort(404)
+   n = min(n, current_app.config['QUOTES_MAX_PAGE_SIZE'])
+
+   quotes = {}
+   # Между чтением count и поиском слотов цитату могли удалить: слот пропадет или
+   # укажет на уже выбранную цитату, недостающие добираются заново
+   for _ in range(3):
+      counts = db.session.execute(random_counts_statement(author_id, min_rating)).all()
+      picks = pick_random_slots(counts, n - len(quotes))
+      if not picks:
+         break
+      statement = quote_query(QuoteModel.query, expand).join(QuoteSlotModel, QuoteSlotModel.quote_id == QuoteModel.id)
+      for quote in statement.filter(random_slots_filter(author_id, picks)):
+         quotes.setdefault(quote.id, quote)
+      if len(quotes) >= n or len(picks) >= sum(count for _, count in counts):
+         break
+
+   if not quotes:
+      abort(404)
+   chosen = list(quotes.values())
+   random.shuffle(chosen)
+   if "n" not in request.args:
+      return jsonify(row_to_dict(chosen[0], expand=expand)), 200
+   return jsonify([row_to_dict(quote, expand=expand) for quote in chosen[:n]]), 200
 
-@app.get("/quotes/count")
+@bp.get("/quotes/count")
+@conditional("quotes")
 def get_quotes_count():
-   count = QuoteModel.query.count()
+   count = QuoteCounterModel.get_count()
    if count:
       return jsonify(count=count), 200
    abort(404)
 
-@app.get("/quotes/filter")
+@bp.get("/authors/<int:author_id>/quotes/count")
+@conditional("authors", "quotes")
+def get_author_quotes_count(author_id):
+   if not db.session.get(AuthorModel, author_id):
+      abort(404, f"Author with id = {author_id} not found")
+   return jsonify(count=QuoteCounterModel.get_count(author_id)), 200
+
+@bp.get("/stats/ratings")
+@conditional("quotes")
+def get_rating_stats():
+   return jsonify(RatingStatsModel.summary()), 200
+
+@bp.get("/authors/<int:author_id>/stats")
+@conditional("authors", "quotes")
+def get_author_stats(author_id):
+   if not get_cached_entity(AuthorModel, author_id):
+      abort(404, f"Author with id = {author_id} not found")
+   return jsonify(author_id=author_id, **RatingStatsModel.summary(author_id)), 200
+
+@bp.get("/authors/top")
+@conditional("authors", "quotes")
+def get_top_authors():
+   """?by=count|avg_rating, ?n= (по умолчанию 10), ?min_count= - не учитывать авторов с меньшим числом цитат.
+
+   Агрегация по rating_stats (не более 5 строк на автора), а не по quotes.
+   """
+   rows = db.session.execute(top_authors_statement(request.args, current_app.config['QUOTES_MAX_PAGE_SIZE'])).all()
+   return jsonify(top_authors_results(rows)), 200
+
+def top_authors_statement(args, max_n: int):
+   """SELECT для /authors/top по аргументам запроса (by, n, min_count)."""
+   by = args.get("by", default="count")
+   if by not in ("count", "avg_rating"):
+      abort(400, "by must be count or avg_rating")
+   n = args.get("n", default=10, type=int)
+   min_count = args.get("min_count", default=1, type=int)
+   if n < 1:
+      abort(400, "n must be a positive integer")
+   n = min(n, max_n)
+
+   stats = RatingStatsModel
+   count = db.func.sum(stats.count).label("count")
+   # Деление целых в SQLAlchemy 2 - "истинное" (приводится к REAL), но тип результата -
+   # Numeric, и без cast значение пришло бы Decimal и ушло бы в JSON строкой
+   avg_rating = db.cast(db.func.sum(stats.rating * stats.count) / db.func.sum(stats.count), db.Float).label("avg_rating")
+   totals = (db.select(stats.author_id, count, avg_rating)
+             .where(stats.author_id != stats.TOTAL)
+             .group_by(stats.author_id)
+             .having(count >= max(min_count, 1))
+             .order_by((count if by == "count" else avg_rating).desc(), stats.author_id)
+             .limit(n)
+             .subquery("top"))
+   return (db.select(totals.c.author_id, AuthorModel.name, totals.c.count, totals.c.avg_rating)
+           .join(AuthorModel, AuthorModel.id == totals.c.author_id)
+           .order_by((totals.c.count if by == "count" else totals.c.avg_rating).desc(), totals.c.author_id))
+
+def top_authors_results(rows) -> list:
+   return [{"author_id": author_id, "name": name, "count": count, "avg_rating": round(avg, 2)}
+           for author_id, name, count, avg in rows]
+
+SEARCH_QUOTES_SQL = text("""
+   SELECT * FROM (
+      SELECT quotes.id, quotes.author_id, quotes.text, quotes.rating,
+             bm25(quotes_fts) AS rank,
+             snippet(quotes_fts, 0, :open, :close, '…', :tokens) AS snippet
+      FROM quotes_fts JOIN quotes ON quotes.id = quotes_fts.rowid
+      WHERE quotes_fts MATCH :q
+   )
+   WHERE rank > :rank OR (rank = :rank AND id > :id)
+   ORDER BY rank, id
+   LIMIT :limit
+""")
+
+# snippet() отмечает совпадения управляющими символами, а не разметкой SEARCH_HIGHLIGHT:
+# текст цитаты сначала экранируется как HTML, и только потом маркеры становятся тегами
+SNIPPET_MARKERS = ("\x02", "\x03")
+
+
+def search_results(rows, highlight) -> list:
+   """Строки SEARCH_QUOTES_SQL -> словари; snippet - экранированный HTML с тегами highlight."""
+   (open_marker, close_marker), (open_tag, close_tag) = SNIPPET_MARKERS, highlight
+   results = []
+   for row in rows:
+      row = dict(row)
+      row["snippet"] = html.escape(row["snippet"]).replace(open_marker, open_tag).replace(close_marker, close_tag)
+      results.append(row)
+   return results
+
+def changes_statement(since: int, limit: int):
+   """Записи журнала после since вместе с текущим состоянием строк (одним запросом)."""
+   quote, author = db.aliased(QuoteModel), db.aliased(AuthorModel)
+   return (db.select(ChangeModel.seq, ChangeModel.table_name, ChangeModel.op, ChangeModel.row_id,
+                     quote.author_id, quote.text, quote.rating, author.id.label("author_row"), author.name)
+           .outerjoin(quote, and_(ChangeModel.table_name == "quotes", quote.id == ChangeModel.row_id))
+           .outerjoin(author, and_(ChangeModel.table_name == "authors", author.id == ChangeModel.row_id))
+           .where(ChangeModel.seq > since)
+           .order_by(ChangeModel.seq)
+           .limit(limit))
+
+
+def changes_below_statement(horizon: int):
+   """Количество записей журнала до горизонта включительно (см. get_changes)."""
+   return db.select(db.func.count()).select_from(ChangeModel).where(ChangeModel.seq <= horizon)
+
+
+def change_to_dict(row) -> dict:
+   data = None
+   if row.table_name == "quotes" and row.text is not None:
+      data = {"id": row.row_id, "author_id": row.author_id, "text": row.text, "rating": row.rating}
+   elif row.table_name == "authors" and row.author_row is not None:
+      data = {"id": row.row_id, "name": row.name}
+   return {"seq": row.seq, "table": row.table_name, "op": row.op, "id": row.row_id, "data": data}
+
+
+def fetch_changes(since: int, limit: int) -> list:
+   # Журнал читается из основной БД: в реплике новых записей может еще не быть
+   rows = db.session.execute(changes_statement(since, limit), bind_arguments={"bind": db.engine})
+   return [change_to_dict(row) for row in rows]
+
+
+@bp.get("/changes")
+def get_changes():
+   """Изменения quotes и authors после ?since=<seq> по возрастанию seq.
+
+   data - текущее состояние строки (null, если строка уже удалена), поэтому клиент
+   применяет записи как upsert/delete по id. ?wait=<с> - long-poll: если изменений
+   нет, ответ ждет их до wait секунд. since=0 дает полный снимок; since меньше
+   горизонта очистки журнала - 410, клиенту нужно начать с since=0. Первая страница
+   снимка после очистки может быть больше limit: она доходит до горизонта.
+   """
+   since = request.args.get("since", default=0, type=int)
+   wait = request.args.get("wait", default=0, type=float)
+   limit = get_page_size()
+   if since < 0:
+      abort(400, "since must be a non-negative integer")
+   horizon = ChangeLogStateModel.get_horizon()
+   if 0 < since < horizon:
+      abort(410, "since is older than the change log horizon, restart from since=0")
+   if since < horizon:
+      # Продолжение снимка с seq ниже горизонта получило бы 410: первая страница since=0
+      # включает весь журнал до горизонта (после очистки - не больше записи на строку) и еще limit
+      limit += db.session.scalar(changes_below_statement(horizon), bind_arguments={"bind": db.engine})
+   wait = min(max(wait, 0.0), current_app.config['CHANGES_MAX_WAIT'])
+
+   deadline = time.monotonic() + wait
+   changes = fetch_changes(since, limit)
+   while not changes and (remaining := deadline - time.monotonic()) > 0:
+      # Соединение не держим, пока ждем
+      db.session.close()
+      with changes_signal:
+         changes_signal.wait(min(remaining, current_app.config['CHANGES_POLL_INTERVAL']))
+      changes = fetch_changes(since, limit)
+
+   last_seq = changes[-1]["seq"] if changes else since
+   if since < horizon:
+      # Все записи до горизонта уже в ответе
+      last_seq = max(last_seq, horizon)
+   return jsonify(changes=changes, last_seq=last_seq, more=len(changes) == limit), 200
+
+
+@bp.get("/quotes/search")
+@conditional("quotes")
+def search_quotes():
+   """Полнотекстовый поиск по FTS5 (синтаксис запросов FTS5), сортировка по bm25.
+
+   Keyset-пагинация по (rank, id): ?limit=N&after=<cursor>.
+   """
+   q = request.args.get("q", default="", type=str).strip()
+   if not q:
+      abort(400, "Query parameter q is required")
+   limit = get_page_size()
+   expand = get_expand()
+   rank, last_id = float("-inf"), 0
+   after = request.args.get("after")
+   if after:
+      cursor = decode_cursor(after)
+      rank, last_id = cursor.get("rank"), cursor.get("id")
+      if not (type(rank) is float or is_cursor_int(rank)) or not is_cursor_int(last_id):
+         abort(400, "Invalid cursor")
+
+   open_marker, close_marker = SNIPPET_MARKERS
+   try:
+      rows = db.session.execute(SEARCH_QUOTES_SQL, {
+         "q": q, "rank": rank, "id": last_id, "limit": limit + 1,
+         "open": open_marker, "close": close_marker, "tokens": current_app.config['SEARCH_SNIPPET_TOKENS'],
+      }).mappings().all()
+   except exc.OperationalError as e:
+      # Ошибки разбора MATCH - ошибка клиента, занятая БД уходит в handle_database_error
+      if "locked" in str(e.orig) or "busy" in str(e.orig):
+         raise
+      abort(400, "Invalid search query")
+
+   next_cursor = None
+   if len(rows) > limit:
+      rows = rows[:limit]
+      next_cursor = encode_cursor({"rank": rows[-1]["rank"], "id": rows[-1]["id"]})
+   rows = search_results(rows, current_app.config['SEARCH_HIGHLIGHT'])
+   return page_response(expand_rows(rows, expand), next_cursor)
+
+# Фильтры /quotes/filter: поле -> (столбец, тип значения, допустимые операторы).
+# Поле без оператора - равенство: ?rating=5, ?rating__gte=4, ?id__in=1,2,3, ?author__name__contains=Пуш.
+# prefix - по индексу (ix_quotes_text, уникальный индекс authors.name); contains - LIKE '%...%',
+# индекс не помогает, поэтому такой запрос просматривает таблицу и всегда ограничен limit
+QUOTE_FILTER_FIELDS = {
+   "id": (QuoteModel.id, int, ("eq", "in", "gt", "gte", "lt", "lte")),
+   "author_id": (QuoteModel.author_id, int, ("eq", "in")),
+   "rating": (QuoteModel.rating, int, ("eq", "in", "gt", "gte", "lt", "lte")),
+   "text": (QuoteModel.text, str, ("eq", "contains", "prefix")),
+   "author__name": (AuthorModel.name, str, ("eq", "contains", "prefix")),
+}
+# Сортировка только по индексированным столбцам: ?sort=-rating,author_id
+QUOTE_SORT_FIELDS = {"id": QuoteModel.id, "rating": QuoteModel.rating, "author_id": QuoteModel.author_id}
+FILTER_RESERVED = {"sort", "limit", "stream", "expand"}
+FILTER_OPERATORS = {"eq": operator.eq, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le,
+                    "in": None, "contains": None, "prefix": None}
+SCAN_OPERATORS = {"contains"}
+
+
+def escape_like(value: str) -> str:
+   return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_quote_filter(args: dict, max_limit: int):
+   """Аргументы запроса -> (фильтры, сортировка, limit, параметры запроса).
+
+   Фильтры и сортировка - форма запроса (ключ кэша quote_filter_statement), значения
+   уходят в параметры. contains - LIKE (регистр не учитывается только для ASCII), полный
+   просмотр: без ?limit ответ ограничен max_limit строк. prefix - диапазон
+   [значение, следующее значение) по индексу.
+   """
+   filters, params = set(), {}
+   for key, raw in args.items():
+      if key in FILTER_RESERVED:
+         continue
+      field, _, op = key.rpartition("__")
+      if not field or op not in FILTER_OPERATORS:
+         field, op = key, "eq"
+      spec = QUOTE_FILTER_FIELDS.get(field)
+      if spec is None or op not in spec[2]:
+         abort(400, f"Unknown filter: {key}")
+      kind = spec[1]
+      try:
+         values = [kind(value) for value in raw.split(",")] if op == "in" else [kind(raw)]
+      except ValueError:
+         abort(400, f"{key} must be {'an integer' if kind is int else 'a string'}")
+      name = f"{field}__{op}"
+      filters.add((field, op))
+      if op == "in":
+         if len(values) > max_limit:
+            abort(400, f"{key} accepts at most {max_limit} values")
+         params[name] = values
+      elif op == "contains":
+         params[name] = f"%{escape_like(values[0])}%"
+      elif op == "prefix":
+         if not values[0] or values[0][-1] == chr(0x10FFFF):
+            abort(400, f"{key} must be a non-empty string")
+         params[name] = values[0]
+         params[name + "__next"] = values[0][:-1] + chr(ord(values[0][-1]) + 1)
+      else:
+         params[name] = values[0]
+
+   sort = []
+   for name in filter(None, args.get("sort", "").split(",")):
+      desc = name.startswith("-")
+      if name.lstrip("-") not in QUOTE_SORT_FIELDS:
+         abort(400, f"Unknown sort field: {name.lstrip('-')}")
+      sort.append((name.lstrip("-"), desc))
+
+   limit = None
+   if "limit" in args:
+      # Не isdigit(): "²" - цифра, но int() ее не примет
+      try:
+         limit = int(args["limit"])
+      except ValueError:
+         limit = 0
+      if limit < 1:
+         abort(400, "limit must be a positive integer")
+      params["limit"] = min(limit, max_limit)
+   elif any(op in SCAN_OPERATORS for _, op in filters):
+      limit = params["limit"] = max_limit
+   return tuple(sorted(filters)), tuple(sort), limit is not None, params
+
+
+@functools.lru_cache(maxsize=256)
+def quote_filter_statement(filters: tuple, sort: tuple, limited: bool, expand_author=False):
+   """SELECT для формы фильтра. Значения передаются через bindparam, поэтому один объект
+   statement переиспользуется для всех запросов этой формы: ключ кэша SQLAlchemy
+   запоминается в объекте, и скомпилированный SQL берется из кэша без повторной сборки.
+   """
+   if expand_author:
+      stmt = db.select(QuoteModel).options(joinedload(QuoteModel.author))
+   else:
+      stmt = db.select(*QUOTE_COLUMNS)
+   if any(field.startswith("author__") for field, _ in filters):
+      stmt = stmt.join(AuthorModel, AuthorModel.id == QuoteModel.author_id)
+   for field, op in filters:
+      column = QUOTE_FILTER_FIELDS[field][0]
+      name = f"{field}__{op}"
+      if op == "in":
+         stmt = stmt.where(column.in_(bindparam(name, expanding=True)))
+      elif op == "contains":
+         stmt = stmt.where(column.like(bindparam(name), escape="\\"))
+      elif op == "prefix":
+         stmt = stmt.where(and_(column >= bindparam(name), column < bindparam(name + "__next")))
+      else:
+         stmt = stmt.where(FILTER_OPERATORS[op](column, bindparam(name)))
+   order_by = [QUOTE_SORT_FIELDS[name].desc() if desc else QUOTE_SORT_FIELDS[name] for name, desc in sort]
+   if "id" not in (name for name, _ in sort):
+      order_by.append(QuoteModel.id.desc() if sort and sort[-1][1] else QuoteModel.id)
+   stmt = stmt.order_by(*order_by)
+   if limited:
+      stmt = stmt.limit(bindparam("limit"))
+   return stmt
+
+
+@bp.get("/quotes/filter")
+@conditional("quotes", "authors")
 def get_filtered_quotes():
-   args = request.args
-   
-   # Частный случай
-   # author = args.get("author", default="", type=str)
-   # rating = args.get("rating", default=0, type=int)
-     
-   # query = QuoteModel.query
-   # if author:
-   #    query = query.filter(QuoteModel.author.contains(author))
-   # if rating:
-   #    query = query.filter_by(rating=rating)
-   # quotes_db = query.all()
-
-   # Универсальное решение  
-   quotes_db = QuoteModel.query.filter_by(**args).all()
-   
+   """Фильтрация по QUOTE_FILTER_FIELDS, ?sort= и ?limit= (не больше QUOTES_MAX_PAGE_SIZE).
+
+   Без limit возвращаются все подходящие цитаты (с фильтром contains - не больше
+   QUOTES_MAX_PAGE_SIZE); ничего не найдено - 404.
+   """
+   expand = get_expand()
+   filters, sort, limited, params = parse_quote_filter(request.args.to_dict(), current_app.config['QUOTES_MAX_PAGE_SIZE'])
+   stmt = quote_filter_statement(filters, sort, limited, "author" in expand)
+   if wants_stream():
+      result = db.session.execute(stmt, params, execution_options={"yield_per": current_app.config['STREAM_BATCH_SIZE']})
+      return stream_response(result.scalars() if expand else result, expand=expand)
+   result = db.session.execute(stmt, params)
+   quotes_db = (result.scalars() if expand else result).all()
    if quotes_db:
-      quotes = []
-      for quote in quotes_db:
-         quotes.append(quote.to_dict())      
-      return jsonify(quotes), 200
+      return jsonify(rows_to_dicts(quotes_db, expand=expand)), 200
    abort(404)
 
+class LazyGroup(click.Group):
+   """Группа команд flask, код которой импортируется только при ее вызове:
+   обслуживающий процесс не загружает Alembic и команды обслуживания."""
+
+   def __init__(self, name, load, **kwargs):
+      super().__init__(name, **kwargs)
+      self._load = load
+
+   def _group(self, ctx) -> click.Group:
+      return self._load(ctx.ensure_object(ScriptInfo).load_app())
+
+   def list_commands(self, ctx):
+      return self._group(ctx).list_commands(ctx)
+
+   def get_command(self, ctx, name):
+      return self._group(ctx).get_command(ctx, name)
+
+
+def init_migrate(app):
+   """Подключить Flask-Migrate (flask db и flask_migrate.upgrade())."""
+   if "migrate" not in app.extensions:
+      from flask_migrate import Migrate
+      Migrate(app, db)
+   return app.extensions["migrate"].migrate
+
+
+def load_db_cli(app):
+   init_migrate(app)
+   from flask_migrate.cli import db as db_cli
+   return db_cli
+
+
+def load_quotes_cli(app):
+   from cli import quotes_cli
+   return quotes_cli
+
+
+def default_config() -> dict:
+   """Настройки по умолчанию (с учетом переменных окружения) для create_app() и asgi_app.py."""
+   config = {}
+   config['JSON_AS_ASCII'] = False
+   # QUOTES_DATABASE - путь к файлу БД (например, для бенчмарков на отдельной копии)
+   config['QUOTES_DATABASE'] = Path(os.environ.get("QUOTES_DATABASE", BASE_DIR / "quotes.db"))
+   config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+   # Размер страницы для списков цитат по умолчанию и верхняя граница для ?limit=
+   config['QUOTES_PAGE_SIZE'] = 100
+   config['QUOTES_MAX_PAGE_SIZE'] = 1000
+   # Сколько строк читать из БД за раз в потоковом (NDJSON) режиме
+   config['STREAM_BATCH_SIZE'] = 1000
+   # Разметка совпадений во фрагментах /quotes/search; текст фрагмента экранируется как HTML
+   config['SEARCH_HIGHLIGHT'] = ("<b>", "</b>")
+   config['SEARCH_SNIPPET_TOKENS'] = 16
+   # Пакетная загрузка цитат: строк в одном INSERT и максимум элементов в запросе
+   config['QUOTES_BULK_CHUNK_SIZE'] = 500
+   config['QUOTES_BULK_MAX_ITEMS'] = 100_000
+   # Кэш GET /quotes/<id> и /authors/<id>. При ENTITY_CACHE_COORDINATION кэш сбрасывается,
+   # если файл БД изменил другой процесс (проверка PRAGMA data_version не чаще ENTITY_CACHE_SYNC_INTERVAL с)
+   config['ENTITY_CACHE_SIZE'] = 10_000
+   config['ENTITY_CACHE_TTL'] = 60
+   config['ENTITY_CACHE_COORDINATION'] = False
+   config['ENTITY_CACHE_SYNC_INTERVAL'] = 0.5
+   # Кэш имя автора -> id для /authors/batch и импорта (0 - без кэша). Используется только
+   # при ENTITY_CACHE_COORDINATION и сбрасывается вместе с кэшем сущностей
+   config['AUTHOR_ID_CACHE_SIZE'] = 10_000
+   config['AUTHOR_ID_CACHE_TTL'] = 60
+   # ETag/Last-Modified строятся по версиям таблиц из БД (table_versions). Их перечитывают
+   # после commit этого процесса и после записи других процессов: PRAGMA data_version
+   # проверяется не чаще TABLE_VERSIONS_SYNC_INTERVAL с
+   config['TABLE_VERSIONS_SYNC_INTERVAL'] = 0.0
+
+   # Профиль SQLite: PRAGMA для каждого соединения, BEGIN IMMEDIATE для пишущих запросов,
+   # размеры пула. SQLITE_READ_ONLY_BIND - отдельный пул read-only соединений для GET-запросов
+   config['SQLITE_PRAGMAS'] = DEFAULT_PRAGMAS
+   config['SQLITE_BEGIN_IMMEDIATE'] = True
+   config['SQLITE_READ_ONLY_BIND'] = False
+   config['SQLALCHEMY_ENGINE_OPTIONS'] = {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10}
+   # Реплика для чтения (SQLITE_REPLICA_DATABASE, по умолчанию из переменной QUOTES_REPLICA_DATABASE):
+   # GET-запросы читают копию основной БД, которую фоновый поток обновляет через backup API
+   # не чаще SQLITE_REPLICA_REFRESH_INTERVAL с. Из нескольких процессов сервера копирует один -
+   # владелец блокировки файла реплики (SQLiteReplica.run). При SQLITE_REPLICA_REFRESH = False
+   # реплику обновляет только flask quotes refresh-replica. Клиент после записи получает cookie
+   # и SQLITE_REPLICA_STICKY_SECONDS с читает основную БД, пока реплика его не догонит
+   config['SQLITE_REPLICA_DATABASE'] = os.environ.get("QUOTES_REPLICA_DATABASE")
+   config['SQLITE_REPLICA_REFRESH'] = True
+   config['SQLITE_REPLICA_REFRESH_INTERVAL'] = 1.0
+   config['SQLITE_REPLICA_STICKY_SECONDS'] = 10
+
+   # Журнал изменений GET /changes: наибольшее ожидание long-poll (?wait=, с) и период,
+   # с которым ожидающий запрос перепроверяет БД (записи других процессов)
+   config['CHANGES_MAX_WAIT'] = 30
+   config['CHANGES_POLL_INTERVAL'] = 0.5
+
+   # Групповой commit (по умолчанию из переменной QUOTES_GROUP_COMMIT=1): POST /authors и
+   # POST /authors/<id>/quotes выполняет один поток-писатель, объединяя до GROUP_COMMIT_MAX_BATCH
+   # записей, пришедших за GROUP_COMMIT_MAX_DELAY с, в одну транзакцию
+   config['GROUP_COMMIT'] = os.environ.get("QUOTES_GROUP_COMMIT") == "1"
+   config['GROUP_COMMIT_MAX_BATCH'] = 64
+   config['GROUP_COMMIT_MAX_DELAY'] = 0.002
+
+   # Сжатие ответов по Accept-Encoding: кодировки в порядке предпочтения сервера (zstd и br -
+   # если установлены zstandard и brotli), уровень для каждой, минимальный размер тела (байт)
+   # и типы содержимого. Сжатые тела ответов с ETag хранятся в кэше COMPRESSION_CACHE_SIZE записей
+   config['COMPRESSION'] = True
+   config['COMPRESSION_ENCODINGS'] = ("zstd", "br", "gzip", "deflate")
+   config['COMPRESSION_LEVELS'] = dict(DEFAULT_LEVELS)
+   config['COMPRESSION_MIN_SIZE'] = 1024
+   config['COMPRESSION_MIMETYPES'] = {"application/json", "application/x-ndjson", "text/plain"}
+   config['COMPRESSION_CACHE_SIZE'] = 128
+   config['COMPRESSION_CACHE_TTL'] = 60
+
+   # Инструментирование: заголовок Server-Timing (SQL-запросы, время в БД и сериализации),
+   # метрики Prometheus на /metrics. SLOW_QUERY_THRESHOLD_MS - журнал запросов дольше порога
+   # с параметрами и EXPLAIN QUERY PLAN (None - выключен)
+   config['SERVER_TIMING'] = True
+   config['METRICS_LATENCY_BUCKETS'] = DEFAULT_BUCKETS
+   config['SLOW_QUERY_THRESHOLD_MS'] = None
+   # Кодировать JSON через orjson, если он установлен (requirements-fast.txt); вывод не меняется
+   config['JSON_FAST_PROVIDER'] = True
+
+   # config['SQLALCHEMY_ECHO'] = True
+   return config
+
+
+def create_app(config=None):
+   """Собрать приложение. config - словарь, переопределяющий настройки по умолчанию
+   (например, {"QUOTES_DATABASE": путь} для отдельного экземпляра на своей БД)."""
+   app = Flask(__name__)
+   app.config.update(default_config())
+   app.config.update(config or {})
+
+   # Производные настройки: URI и дополнительные bind'ы по итоговой конфигурации
+   database = app.config['QUOTES_DATABASE']
+   app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{database}")
+   app.config['SQLITE_REPLICA'] = bool(app.config['SQLITE_REPLICA_DATABASE'])
+   binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+   if app.config['SQLITE_READ_ONLY_BIND']:
+      binds["readonly"] = {"url": f"sqlite:///file:{database}?mode=ro&uri=true", **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+   if app.config['SQLITE_REPLICA']:
+      binds["replica"] = {"url": f"sqlite:///file:{app.config['SQLITE_REPLICA_DATABASE']}?mode=ro&uri=true",
+                          **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+
+   # Неверный уровень сжатия - ошибка при запуске, а не в первом запросе
+   for encoding in available_encodings(app.config['COMPRESSION_ENCODINGS']):
+      get_encoder(encoding, app.config['COMPRESSION_LEVELS'][encoding])
+
+   provider = TimedOrjsonProvider if app.config['JSON_FAST_PROVIDER'] and orjson is not None else TimedJSONProvider
+   app.json = provider(app)
+
+   db.init_app(app)
+   with app.app_context():
+      for bind_key, engine in db.engines.items():
+         configure_sqlite_engine(engine, app.config['SQLITE_PRAGMAS'], begin_immediate=is_write_request,
+                                 readonly=bind_key in ("readonly", "replica"))
+         instrument_engine(engine, record_statement)
+
+   app.extensions["quotes"] = AppState(app)
+   request_started.connect(start_request_metrics, app)
+   request_finished.connect(finish_request_metrics, app)
+   app.register_blueprint(bp)
+   app.teardown_appcontext(close_connection)
+
+   app.cli.add_command(LazyGroup("db", load_db_cli, help="Perform database migrations."))
+   app.cli.add_command(LazyGroup("quotes", load_quotes_cli, help="Обслуживание базы цитат."))
+   return app
+
+
 if __name__ == "__main__":
-   app.run(debug=True)
+   create_app().run(debug=True)
 
@@ -0,0 +1,458 @@
+"""Асинхронный (ASGI) режим: маршруты и формат JSON как в app.py, на Quart + aiosqlite.
+
+Запуск (зависимости - requirements-async.txt):
+    hypercorn asgi_app:app
+
+Модели берутся из models.py, проверки, запросы и курсоры - из app.py, настройки по
+умолчанию - из default_config(). Реализованы все маршруты app.py, включая потоковый режим
+(NDJSON), пакетную загрузку, статистику и /changes (long-poll перепроверяет журнал раз в
+CHANGES_POLL_INTERVAL с). /cache/stats и /metrics отвечают 501: кэш сущностей и метрики
+запросов, как и ?expand=author, условные GET, реплика для чтения и групповой commit, есть
+только в синхронном приложении.
+Совпадение ответов проверяет tests/test_parity.py.
+"""
+import asyncio
+import random
+import time
+
+from quart import Quart, request, jsonify, abort, url_for, has_request_context
+from sqlalchemy import select, delete, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from app import default_config, CLIENT_WRITE_ERRORS, SEARCH_QUOTES_SQL, QUOTE_COLUMNS, AUTHOR_COLUMNS
+from models import AuthorModel, QuoteModel, QuoteCounterModel, QuoteSlotModel, RatingStatsModel, ChangeLogStateModel
+from app import validate, encode_cursor, decode_cursor, parse_quote_filter, quote_filter_statement, rows_to_dicts
+from app import SNIPPET_MARKERS, search_results, random_counts_statement, pick_random_slots, random_slots_filter
+from app import row_to_dict, parse_ndjson, check_bulk_quotes, insert_bulk_quotes, insert_missing_authors
+from app import check_author_names, author_batch_results, top_authors_statement, top_authors_results
+from app import changes_statement, changes_below_statement, change_to_dict, parse_page_size, is_cursor_int
+from sqlite_engine import configure_sqlite_engine
+
+CONFIG_PREFIXES = ("QUOTES_", "SEARCH_", "SQLITE_", "STREAM_", "CHANGES_", "SQLALCHEMY_ENGINE_OPTIONS")
+
+# Те же настройки по умолчанию и переменные окружения, что у create_app()
+app = Quart(__name__)
+app.config.update({key: value for key, value in default_config().items() if key.startswith(CONFIG_PREFIXES)})
+app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{app.config['QUOTES_DATABASE']}")
+
+
+def is_write_request() -> bool:
+   return has_request_context() and request.method not in ("GET", "HEAD") and app.config['SQLITE_BEGIN_IMMEDIATE']
+
+
+engine = create_async_engine(app.config['SQLALCHEMY_DATABASE_URI'].replace("sqlite://", "sqlite+aiosqlite://", 1),
+                             **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+configure_sqlite_engine(engine.sync_engine, app.config['SQLITE_PRAGMAS'], begin_immediate=is_write_request)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+def get_page_size() -> int:
+   return parse_page_size(request.args.get("limit"), app.config['QUOTES_PAGE_SIZE'], app.config['QUOTES_MAX_PAGE_SIZE'])
+
+
+async def paginate_quotes(session, stmt):
+   limit = get_page_size()
+   after = request.args.get("after")
+   if after:
+      last_id = decode_cursor(after).get("id")
+      if not is_cursor_int(last_id):
+         abort(400, "Invalid cursor")
+      stmt = stmt.where(QuoteModel.id > last_id)
+   quotes_db = (await session.scalars(stmt.order_by(QuoteModel.id).limit(limit + 1))).all()
+   next_cursor = None
+   if len(quotes_db) > limit:
+      quotes_db = quotes_db[:limit]
+      next_cursor = encode_cursor({"id": quotes_db[-1].id})
+   return quotes_db, next_cursor
+
+
+def page_response(items: list, next_cursor):
+   response = jsonify(items)
+   if next_cursor:
+      args = {**request.view_args, **request.args.to_dict(), "after": next_cursor}
+      response.headers["X-Next-Cursor"] = next_cursor
+      response.headers["Link"] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+   return response, 200
+
+
+def wants_stream() -> bool:
+   """Потоковый режим: ?stream=1 или Accept: application/x-ndjson."""
+   if request.args.get("stream") == "1":
+      return True
+   return request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+
+
+def stream_response(stmt, params=None):
+   """NDJSON-ответ по строкам stmt (столбцы, не ORM-объекты): строки читаются пачками
+   (yield_per) в своей сессии, которая живет, пока отдается тело ответа."""
+   async def generate():
+      async with Session() as session:
+         result = await session.stream(stmt, params, execution_options={"yield_per": app.config['STREAM_BATCH_SIZE']})
+         async for row in result:
+            yield app.json.dumps(row_to_dict(row), separators=(",", ":")) + "\n"
+   return generate(), 200, {"Content-Type": "application/x-ndjson"}
+
+
+async def read_bulk_items() -> list:
+   """Тело пакетного запроса, как read_bulk_items() в app.py: JSON-массив или NDJSON."""
+   if request.mimetype == "application/x-ndjson":
+      items = parse_ndjson((await request.get_data()).splitlines())
+   else:
+      items = await request.get_json(silent=True)
+      if not isinstance(items, list):
+         abort(400, "Expected a JSON array or NDJSON body")
+   if len(items) > app.config['QUOTES_BULK_MAX_ITEMS']:
+      abort(413, f"Too many items, max is {app.config['QUOTES_BULK_MAX_ITEMS']}")
+   return items
+
+
+async def bulk_insert_quotes(items: list, author_id=None):
+   results, rows = check_bulk_quotes(items, author_id)
+   async with Session() as session:
+      try:
+         inserted = await session.run_sync(insert_bulk_quotes, results, rows, not author_id,
+                                           app.config['QUOTES_BULK_CHUNK_SIZE'])
+         await session.commit()
+      except CLIENT_WRITE_ERRORS:
+         await session.rollback()
+         abort(400, "Batch rejected: constraint failed")
+   return jsonify(inserted=inserted, failed=len(items) - inserted, results=results), 200
+
+
+async def rating_summary(session, author_id=RatingStatsModel.TOTAL) -> dict:
+   return await session.run_sync(lambda sync_session: RatingStatsModel.summary(author_id, sync_session))
+
+
+async def get_quote_count(session, author_id=QuoteCounterModel.TOTAL) -> int:
+   counter = await session.get(QuoteCounterModel, author_id)
+   return counter.count if counter else 0
+
+
+# Обработка ошибок и возврат сообщения в виде JSON
+@app.errorhandler(HTTPException)
+async def handle_exception(e):
+   return jsonify({"message": e.description}), e.code
+
+
+@app.errorhandler(exc.OperationalError)
+async def handle_database_error(e):
+   if "locked" in str(e.orig) or "busy" in str(e.orig):
+      return jsonify({"message": "Database is busy, try again later"}), 503, {"Retry-After": "1"}
+   return jsonify({"message": "Database error"}), 500
+
+
+# Кэш сущностей и метрики запросов есть только в синхронном приложении
+@app.get("/cache/stats")
+@app.get("/metrics")
+async def not_implemented():
+   abort(501, "Not available in the ASGI application")
+
+
+@app.route("/authors", methods=["GET", "POST"])
+async def handle_authors():
+   if request.method == "GET" and wants_stream():
+      return stream_response(select(*AUTHOR_COLUMNS).order_by(AuthorModel.id))
+   async with Session() as session:
+      if request.method == "GET":
+         authors = await session.scalars(select(AuthorModel))
+         return jsonify([author.to_dict() for author in authors]), 200
+
+      author_data = await request.get_json()
+      author = AuthorModel(author_data.get("name", "Ivan"))
+      session.add(author)
+      try:
+         await session.commit()
+      except exc.IntegrityError:
+         await session.rollback()
+         abort(400, "UNIQUE constraint failed")
+      except CLIENT_WRITE_ERRORS:
+         await session.rollback()
+         abort(400, "name must be a string")
+      return author.to_dict(), 201
+
+
+@app.put("/authors/by-name/<name>")
+async def upsert_author_by_name(name):
+   async with Session() as session:
+      ids, created = await session.run_sync(insert_missing_authors, [name], 1)
+      await session.commit()
+   return jsonify({"id": ids[name], "name": name}), 201 if created else 200
+
+
+@app.post("/authors/batch")
+async def batch_authors():
+   results, names = check_author_names(await read_bulk_items())
+   async with Session() as session:
+      ids, created = await session.run_sync(insert_missing_authors, list(dict.fromkeys(name for _, name in names)),
+                                            app.config['QUOTES_BULK_CHUNK_SIZE'])
+      await session.commit()
+   return jsonify(author_batch_results(results, names, ids, created)), 200
+
+
+@app.route("/authors/<int:author_id>", methods=["GET", "PUT", "DELETE"])
+async def handle_author(author_id):
+   async with Session() as session:
+      author = await session.get(AuthorModel, author_id)
+      if not author:
+         abort(404, f"Author with id = {author_id} not found")
+      if request.method == "GET":
+         return jsonify(author.to_dict()), 200
+
+      if request.method == "PUT":
+         for key, value in (await request.get_json()).items():
+            setattr(author, key, value)
+         message = author.to_dict()
+      if request.method == "DELETE":
+         await session.execute(delete(QuoteModel).where(QuoteModel.author_id == author_id))
+         await session.execute(delete(AuthorModel).where(AuthorModel.id == author_id))
+         message = {"message": f"Author with id={author_id} deleted successfully"}
+      try:
+         await session.commit()
+      except CLIENT_WRITE_ERRORS:
+         await session.rollback()
+         abort(400, "Database commit operation failed.")
+      return jsonify(message), 200
+
+
+@app.route("/authors/<int:author_id>/quotes", methods=["GET", "POST"])
+async def handle_quotes_by_author(author_id):
+   async with Session() as session:
+      author = await session.get(AuthorModel, author_id)
+      if not author:
+         abort(404, f"Author with id = {author_id} not found")
+
+      if request.method == "GET":
+         if wants_stream():
+            return stream_response(select(*QUOTE_COLUMNS).filter_by(author_id=author_id).order_by(QuoteModel.id))
+         quotes_db, next_cursor = await paginate_quotes(session, select(QuoteModel).filter_by(author_id=author_id))
+         return page_response([quote.to_dict() for quote in quotes_db], next_cursor)
+
+      data = validate(await request.get_json(), "POST")
+      new_quote = QuoteModel(author=author, **data)
+      session.add(new_quote)
+      try:
+         await session.commit()
+      except exc.IntegrityError:
+         await session.rollback()
+         abort(400, "NOT NULL constraint failed")
+      except CLIENT_WRITE_ERRORS:
+         await session.rollback()
+         abort(400, "text must be a string")
+      return jsonify(new_quote.to_dict()), 200
+
+
+@app.post("/authors/<int:author_id>/quotes/bulk")
+async def bulk_quotes_by_author(author_id):
+   async with Session() as session:
+      if not await session.get(AuthorModel, author_id):
+         abort(404, f"Author with id = {author_id} not found")
+   return await bulk_insert_quotes(await read_bulk_items(), author_id)
+
+
+@app.post("/quotes/bulk")
+async def bulk_quotes():
+   return await bulk_insert_quotes(await read_bulk_items())
+
+
+@app.get("/authors/<int:author_id>/quotes/count")
+async def get_author_quotes_count(author_id):
+   async with Session() as session:
+      if not await session.get(AuthorModel, author_id):
+         abort(404, f"Author with id = {author_id} not found")
+      return jsonify(count=await get_quote_count(session, author_id)), 200
+
+
+@app.route("/quotes/<int:quote_id>", methods=["GET", "PUT", "DELETE"])
+async def handle_quote_by_id(quote_id):
+   async with Session() as session:
+      quote = await session.get(QuoteModel, quote_id)
+      if not quote:
+         abort(404, f"Quote with id={quote_id} not found")
+      if request.method == "GET":
+         return jsonify(quote.to_dict()), 200
+
+      if request.method == "PUT":
+         new_data = validate(await request.get_json(), "PUT")
+         for key, value in new_data.items():
+            setattr(quote, key, value)
+         message = quote.to_dict()
+      if request.method == "DELETE":
+         await session.delete(quote)
+         message = {"message": f"Quote with id={quote_id} deleted successfully"}
+      try:
+         await session.commit()
+      except CLIENT_WRITE_ERRORS:
+         await session.rollback()
+         abort(400, "Database commit operation failed.")
+      return jsonify(message), 200
+
+
+@app.get("/quotes")
+async def get_quotes():
+   if wants_stream():
+      return stream_response(select(*QUOTE_COLUMNS).order_by(QuoteModel.id))
+   async with Session() as session:
+      quotes_db, next_cursor = await paginate_quotes(session, select(QuoteModel))
+      return page_response([quote.to_dict() for quote in quotes_db], next_cursor)
+
+
+@app.delete("/quotes")
+async def delete_quotes():
+   conditions = []
+   for name in ("author_id", "rating"):
+      if name in request.args:
+         value = request.args.get(name, type=int)
+         if value is None:
+            abort(400, f"{name} must be an integer")
+         conditions.append(getattr(QuoteModel, name) == value)
+   if not conditions:
+      abort(400, "At least one filter (author_id, rating) is required")
+
+   async with Session() as session:
+      deleted_ids = (await session.scalars(delete(QuoteModel).where(*conditions).returning(QuoteModel.id))).all()
+      await session.commit()
+   return jsonify(deleted=len(deleted_ids)), 200
+
+
+@app.get("/quotes/random")
+async def get_random_quote():
+   n = request.args.get("n", default=1, type=int)
+   author_id = request.args.get("author_id", type=int)
+   min_rating = request.args.get("min_rating", type=int)
+   if n < 1:
+      abort(400, "n must be a positive integer")
+   if author_id is not None and author_id < 1:
+      abort(404)
+   n = min(n, app.config['QUOTES_MAX_PAGE_SIZE'])
+
+   quotes = {}
+   async with Session() as session:
+      # Слоты из quote_slots, как в app.py: недостающие после удалений добираются заново
+      for _ in range(3):
+         counts = (await session.execute(random_counts_statement(author_id, min_rating))).all()
+         picks = pick_random_slots(counts, n - len(quotes))
+         if not picks:
+            break
+         statement = (select(QuoteModel).join(QuoteSlotModel, QuoteSlotModel.quote_id == QuoteModel.id)
+                      .where(random_slots_filter(author_id, picks)))
+         for quote in await session.scalars(statement):
+            quotes.setdefault(quote.id, quote)
+         if len(quotes) >= n or len(picks) >= sum(count for _, count in counts):
+            break
+
+   if not quotes:
+      abort(404)
+   chosen = list(quotes.values())
+   random.shuffle(chosen)
+   if "n" not in request.args:
+      return jsonify(chosen[0].to_dict()), 200
+   return jsonify([quote.to_dict() for quote in chosen[:n]]), 200
+
+
+@app.get("/quotes/count")
+async def get_quotes_count():
+   async with Session() as session:
+      count = await get_quote_count(session)
+   if count:
+      return jsonify(count=count), 200
+   abort(404)
+
+
+@app.get("/stats/ratings")
+async def get_rating_stats():
+   async with Session() as session:
+      return jsonify(await rating_summary(session)), 200
+
+
+@app.get("/authors/<int:author_id>/stats")
+async def get_author_stats(author_id):
+   async with Session() as session:
+      if not await session.get(AuthorModel, author_id):
+         abort(404, f"Author with id = {author_id} not found")
+      return jsonify(author_id=author_id, **await rating_summary(session, author_id)), 200
+
+
+@app.get("/authors/top")
+async def get_top_authors():
+   statement = top_authors_statement(request.args, app.config['QUOTES_MAX_PAGE_SIZE'])
+   async with Session() as session:
+      rows = (await session.execute(statement)).all()
+   return jsonify(top_authors_results(rows)), 200
+
+
+@app.get("/changes")
+async def get_changes():
+   """Как get_changes() в app.py; long-poll перепроверяет журнал раз в CHANGES_POLL_INTERVAL с,
+   соединение между проверками не держится."""
+   since = request.args.get("since", default=0, type=int)
+   wait = request.args.get("wait", default=0, type=float)
+   limit = get_page_size()
+   if since < 0:
+      abort(400, "since must be a non-negative integer")
+   async with Session() as session:
+      log_state = await session.get(ChangeLogStateModel, 1)
+      horizon = log_state.horizon if log_state else 0
+      if 0 < since < horizon:
+         abort(410, "since is older than the change log horizon, restart from since=0")
+      if since < horizon:
+         limit += await session.scalar(changes_below_statement(horizon))
+   wait = min(max(wait, 0.0), app.config['CHANGES_MAX_WAIT'])
+
+   deadline = time.monotonic() + wait
+   while True:
+      async with Session() as session:
+         changes = [change_to_dict(row) for row in await session.execute(changes_statement(since, limit))]
+      if changes or (remaining := deadline - time.monotonic()) <= 0:
+         break
+      await asyncio.sleep(min(remaining, app.config['CHANGES_POLL_INTERVAL']))
+
+   last_seq = changes[-1]["seq"] if changes else since
+   if since < horizon:
+      last_seq = max(last_seq, horizon)
+   return jsonify(changes=changes, last_seq=last_seq, more=len(changes) == limit), 200
+
+
+@app.get("/quotes/search")
+async def search_quotes():
+   q = request.args.get("q", default="", type=str).strip()
+   if not q:
+      abort(400, "Query parameter q is required")
+   limit = get_page_size()
+   rank, last_id = float("-inf"), 0
+   after = request.args.get("after")
+   if after:
+      cursor = decode_cursor(after)
+      rank, last_id = cursor.get("rank"), cursor.get("id")
+      if not (type(rank) is float or is_cursor_int(rank)) or not is_cursor_int(last_id):
+         abort(400, "Invalid cursor")
+
+   open_marker, close_marker = SNIPPET_MARKERS
+   async with Session() as session:
+      try:
+         result = await session.execute(SEARCH_QUOTES_SQL, {
+            "q": q, "rank": rank, "id": last_id, "limit": limit + 1,
+            "open": open_marker, "close": close_marker, "tokens": app.config['SEARCH_SNIPPET_TOKENS'],
+         })
+      except exc.OperationalError as e:
+         if "locked" in str(e.orig) or "busy" in str(e.orig):
+            raise
+         abort(400, "Invalid search query")
+      rows = result.mappings().all()
+
+   next_cursor = None
+   if len(rows) > limit:
+      rows = rows[:limit]
+      next_cursor = encode_cursor({"rank": rows[-1]["rank"], "id": rows[-1]["id"]})
+   return page_response(search_results(rows, app.config['SEARCH_HIGHLIGHT']), next_cursor)
+
+
+@app.get("/quotes/filter")
+async def get_filtered_quotes():
+   filters, sort, limited, params = parse_quote_filter(request.args.to_dict(), app.config['QUOTES_MAX_PAGE_SIZE'])
+   if wants_stream():
+      return stream_response(quote_filter_statement(filters, sort, limited), params)
+   async with Session() as session:
+      quotes_db = (await session.execute(quote_filter_statement(filters, sort, limited), params)).all()
+   if quotes_db:
+      return jsonify(rows_to_dicts(quotes_db)), 200
+   abort(404)
@@ -0,0 +1,121 @@
+"""Сжатие ответов: байты по сети и процессорное время на уровень сжатия.
+
+Запуск из каталога Flask1:
+    python -m benchmarks.bench_compression --quotes 100000 --limit 1000 --seconds 2
+
+"level" - тела реальных ответов (JSON-страница /quotes, NDJSON-поток /quotes/filter),
+сжатые каждой кодировкой на нескольких уровнях: размер, доля от исходного и CPU на
+ответ (time.process_time). Поток сжимается по строкам, как его отдает compress_chunks().
+"endpoint" - запросы в секунду через test_client без сжатия, с gzip без кэша сжатых
+тел и с кэшем (ETag не меняется между запросами).
+
+Результаты (Linux, 1 vCPU, Python 3.11, zstandard 0.25.0, brotli 1.2.0, 100000 цитат,
+limit=1000; страница 223 244 байт, поток 4 491 048 байт / 19 764 строки):
+
+    encoding level  page bytes  ratio  cpu ms  stream bytes  ratio  cpu ms
+    gzip         1       10009   4.5%    0.89        187453   4.2%   23.14
+    gzip         6        8080   3.6%    1.90        161870   3.6%   44.38
+    gzip         9        7699   3.4%    3.20        149648   3.3%   94.45
+    deflate      6        8068   3.6%    1.85        161858   3.6%   48.90
+    zstd         1        5514   2.5%    0.19        133571   3.0%    8.49
+    zstd         3        6276   2.8%    0.21        145061   3.2%   10.83
+    zstd         9        6287   2.8%    2.65        123128   2.7%   60.94
+    zstd        19        5825   2.6%  388.09         99320   2.2% 8032.10
+    br           1        7469   3.3%    0.25        207007   4.6%   13.09
+    br           4        6803   3.0%    1.11        146325   3.3%   28.26
+    br           6        5910   2.6%    2.41        135348   3.0%   59.38
+    br          11        4571   2.0%  760.91         90106   2.0% 17235.77
+
+    endpoint /quotes?limit=1000  identity           124.6 req/s  223244 bytes
+                                 gzip 6, no cache    97.4 req/s    8080 bytes
+                                 gzip 6, cached     127.0 req/s    8080 bytes
+                                 br 4, cached       134.0 req/s    6803 bytes
+
+Данные однообразные, поэтому сжатие сильнее, чем на реальных цитатах, но порядок
+уровней тот же. Уровни по умолчанию (zstd 3, br 4, gzip 6) - там, где рост CPU перестает
+окупаться: zstd 19 и br 11 стоят в сотни раз больше при выигрыше в доли процента.
+Кэш по ETag убирает стоимость сжатия повторных ответов. Без накопления строк до 16 КБ
+в compress_chunks() поток с br 1 сжимался только до 64.6%, а gzip 6 занимал 57 мс.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_serialization import seed, measure
+
+FLASK_DIR = Path(__file__).resolve().parent.parent
+
+LEVELS = {"gzip": (1, 6, 9), "deflate": (6,), "zstd": (1, 3, 9, 19), "br": (1, 4, 6, 11)}
+
+
+def cpu_time(func, seconds):
+   """Медиана процессорного времени одного вызова func(), с."""
+   samples = []
+   started = time.perf_counter()
+   while time.perf_counter() - started < seconds or len(samples) < 3:
+      cpu = time.process_time()
+      func()
+      samples.append(time.process_time() - cpu)
+   return statistics.median(samples)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--quotes", type=int, default=100_000)
+   parser.add_argument("--authors", type=int, default=100)
+   parser.add_argument("--limit", type=int, default=1000)
+   parser.add_argument("--seconds", type=float, default=2)
+   args = parser.parse_args()
+
+   tmp = tempfile.TemporaryDirectory()
+   os.environ["QUOTES_DATABASE"] = str(Path(tmp.name) / "bench.db")
+   from flask_migrate import upgrade
+   from app import create_app, init_migrate
+   from compression import ENCODERS, compress, compress_chunks
+
+   app = create_app({"SERVER_TIMING": False})
+   init_migrate(app)
+   with app.app_context():
+      upgrade(directory=str(FLASK_DIR / "migrations"))
+   seed(os.environ["QUOTES_DATABASE"], args.quotes, args.authors)
+   client = app.test_client()
+
+   page_url = f"/quotes?limit={args.limit}"
+   page = client.get(page_url).data
+   stream = client.get("/quotes/filter?rating=3&stream=1").data
+   lines = stream.splitlines(keepends=True)
+   print(f"body  page {page_url} {len(page)} bytes, stream /quotes/filter?rating=3 {len(stream)} bytes, {len(lines)} lines")
+   print(f"{'':5} {'encoding':8} {'level':>5} {'page bytes':>11} {'ratio':>6} {'cpu ms':>7}"
+         f" {'stream bytes':>13} {'ratio':>6} {'cpu ms':>7}")
+   for encoding, levels in LEVELS.items():
+      if encoding not in ENCODERS:
+         print(f"level {encoding:8} not installed (pip install -r requirements-fast.txt)")
+         continue
+      for level in levels:
+         page_size = len(compress(page, encoding, level))
+         page_cpu = cpu_time(lambda: compress(page, encoding, level), args.seconds / 4)
+         stream_size = sum(map(len, compress_chunks(lines, encoding, level)))
+         stream_cpu = cpu_time(lambda: sum(map(len, compress_chunks(lines, encoding, level))), args.seconds / 4)
+         print(f"level {encoding:8} {level:5} {page_size:11} {page_size / len(page):6.1%} {page_cpu * 1000:7.2f}"
+               f" {stream_size:13} {stream_size / len(stream):6.1%} {stream_cpu * 1000:7.2f}")
+
+   variants = [
+      ("identity", {}, {}),
+      ("gzip 6, no cache", {"COMPRESSION_CACHE_SIZE": 0}, {"Accept-Encoding": "gzip"}),
+      ("gzip 6, cached", {}, {"Accept-Encoding": "gzip"}),
+      ("br 4, cached", {}, {"Accept-Encoding": "br"}),
+   ]
+   for name, config, headers in variants:
+      variant = create_app({"SERVER_TIMING": False, **config}).test_client()
+      variant.get(page_url, headers=headers)
+      rps = measure(lambda: variant.get(page_url, headers=headers).status_code == 200, args.seconds)
+      size = len(variant.get(page_url, headers=headers).data)
+      print(f"endpoint {page_url} {name:18} {rps:7.1f} req/s {size:8} bytes")
+   tmp.cleanup()
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,290 @@
+"""Нагрузочный бенчмарк всех эндпоинтов с порогами регрессии относительно baseline.
+
+Запуск из каталога Flask1:
+    python -m benchmarks.bench_endpoints --scale 100k --concurrency 16 --duration 10
+    python -m benchmarks.bench_endpoints --scale 1k --save-baseline benchmarks/baseline-1k.json
+    python -m benchmarks.bench_endpoints --scale 1k --baseline benchmarks/baseline-1k.json
+
+Для каждого прогона создается новая БД во временном каталоге (flask db upgrade + заполнение
+напрямую через sqlite3). Авторы распределены по закону Ципфа: несколько авторов владеют
+большей частью цитат. Затем запускается сервер (по умолчанию flask run с потоками)
+с QUOTES_DATABASE на эту БД, и каждый маршрут по очереди нагружается --concurrency
+потоками в течение --duration секунд. Для маршрута считаются p50/p95/p99 (мс),
+запросы в секунду и ошибки (статус >= 500 или сбой соединения).
+
+С --replica сервер читает GET-запросы из реплики (QUOTES_REPLICA_DATABASE во временном каталоге),
+с --group-commit POST-запросы создания идут через групповой commit (QUOTES_GROUP_COMMIT=1).
+
+Маршруты удаления идут последними; перед каждым из них в БД добавляются одноразовые
+авторы с цитатами (add_victims), и каждый запрос удаляет свои строки, а не получает 404.
+
+С --baseline маршрут считается регрессией, если p95 вырос или пропускная способность
+упала больше чем на --tolerance (доля). Маршрут, которого нет в baseline, - тоже ошибка:
+baseline нужно пересохранить с --save-baseline. В обоих случаях код выхода 1.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+FLASK_DIR = Path(__file__).resolve().parent.parent
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+WORDS = ("жизнь", "время", "код", "ошибка", "программа", "любовь", "мир", "истина",
+         "life", "time", "code", "bug", "program", "love", "world", "truth")
+
+
+def cursor(quote_id):
+   raw = json.dumps({"id": quote_id}, separators=(",", ":")).encode()
+   return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def author_name(r, d):
+   return f"Author {r.randint(1, d['authors'])}"
+
+
+def new_name(r, d):
+   return f"Bench {r.getrandbits(64):x}"
+
+
+# (имя, метод, функция (rnd, data) -> URL, тело запроса: None, JSON или функция (rnd, data) -> JSON)
+ROUTES = [
+   ("quotes page", "GET", lambda r, d: "/quotes?limit=100", None),
+   ("quotes page after", "GET", lambda r, d: f"/quotes?limit=100&after={cursor(r.randint(1, d['quotes']))}", None),
+   ("quote by id", "GET", lambda r, d: f"/quotes/{r.randint(1, d['quotes'])}", None),
+   ("random quote", "GET", lambda r, d: "/quotes/random", None),
+   ("random quotes n=10", "GET", lambda r, d: "/quotes/random?n=10&min_rating=3", None),
+   ("quotes count", "GET", lambda r, d: "/quotes/count", None),
+   ("filter author+rating", "GET", lambda r, d: f"/quotes/filter?author_id={d['tail_author'](r)}&rating={r.randint(1, 5)}", None),
+   ("search", "GET", lambda r, d: f"/quotes/search?q={quote(r.choice(WORDS))}&limit=20", None),
+   ("authors", "GET", lambda r, d: "/authors?stream=1", None),
+   ("author by id", "GET", lambda r, d: f"/authors/{r.randint(1, d['authors'])}", None),
+   ("author quotes", "GET", lambda r, d: f"/authors/{r.randint(1, d['authors'])}/quotes?limit=20", None),
+   ("author quotes count", "GET", lambda r, d: f"/authors/{r.randint(1, d['authors'])}/quotes/count", None),
+   ("rating stats", "GET", lambda r, d: "/stats/ratings", None),
+   ("author stats", "GET", lambda r, d: f"/authors/{r.randint(1, d['authors'])}/stats", None),
+   ("changes tail", "GET", lambda r, d: f"/changes?since={d['quotes'] + d['authors'] - 100}", None),
+   ("top authors", "GET", lambda r, d: f"/authors/top?by={r.choice(['count', 'avg_rating'])}&n=10", None),
+   ("post quote", "POST", lambda r, d: f"/authors/{r.randint(1, d['authors'])}/quotes", {"text": "bench", "rating": 3}),
+   ("put quote", "PUT", lambda r, d: f"/quotes/{r.randint(1, d['quotes'])}", {"rating": 4}),
+   ("post author", "POST", lambda r, d: "/authors", lambda r, d: {"name": new_name(r, d)}),
+   ("put author", "PUT", lambda r, d: f"/authors/{r.randint(1, d['authors'])}", lambda r, d: {"name": new_name(r, d)}),
+   ("author by name", "PUT", lambda r, d: f"/authors/by-name/{quote(author_name(r, d))}", None),
+   ("authors batch", "POST", lambda r, d: "/authors/batch",
+    lambda r, d: [author_name(r, d) for _ in range(9)] + [new_name(r, d)]),
+   ("bulk author quotes", "POST", lambda r, d: f"/authors/{r.randint(1, d['authors'])}/quotes/bulk",
+    [{"text": f"bench bulk {i}", "rating": i % 5 + 1} for i in range(100)]),
+   ("bulk quotes", "POST", lambda r, d: "/quotes/bulk",
+    lambda r, d: [{"author_id": r.randint(1, d['authors']), "text": f"bench bulk {i}", "rating": i % 5 + 1} for i in range(100)]),
+   # Удаления - в конце и над одноразовыми строками (add_victims); id выдаются по одному разу
+   ("delete quote", "DELETE", lambda r, d: f"/quotes/{next(d['victim_quotes'], 0)}", None),
+   ("delete quotes filter", "DELETE", lambda r, d: f"/quotes?author_id={next(d['victims'], 0)}&rating={r.randint(1, 5)}", None),
+   ("delete author", "DELETE", lambda r, d: f"/authors/{next(d['victims'], 0)}", None),
+]
+DESTRUCTIVE_ROUTES = {"delete quote", "delete quotes filter", "delete author"}
+
+
+def migrate(env):
+   subprocess.run([sys.executable, "-m", "flask", "--app", "app", "db", "upgrade"],
+                  cwd=FLASK_DIR, env=env, check=True, capture_output=True)
+
+
+def seed(path, quotes, zipf_s=1.1, seed_value=42):
+   """Заполнить authors/quotes: quotes / 20 авторов, распределение авторов по Ципфу."""
+   rnd = random.Random(seed_value)
+   authors = max(1, quotes // 20)
+   weights = [1 / (rank ** zipf_s) for rank in range(1, authors + 1)]
+   conn = sqlite3.connect(path)
+   conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i, f"Author {i}") for i in range(1, authors + 1)))
+   batch = 50_000
+   for start in range(0, quotes, batch):
+      size = min(batch, quotes - start)
+      author_ids = rnd.choices(range(1, authors + 1), weights=weights, k=size)
+      conn.executemany("INSERT INTO quotes (author_id, text, rating) VALUES (?, ?, ?)", (
+         (author_id, " ".join(rnd.choices(WORDS, k=8)), rnd.randint(1, 5)) for author_id in author_ids))
+   conn.commit()
+   conn.close()
+   # Авторы из "хвоста" - с небольшим числом цитат
+   return {"quotes": quotes, "authors": authors,
+           "tail_author": lambda r: r.randint(max(1, authors // 10), authors)}
+
+
+def add_victims(path, data, count):
+   """count одноразовых авторов с цитатой каждого рейтинга для маршрутов удаления.
+   Их id (и id цитат) раздаются через итераторы data["victims"], data["victim_quotes"]."""
+   conn = sqlite3.connect(path)
+   first = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM authors").fetchone()[0]
+   ids = range(first, first + count)
+   conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i, f"Victim {i}") for i in ids))
+   conn.executemany("INSERT INTO quotes (author_id, text, rating) VALUES (?, ?, ?)",
+                    ((i, "victim", rating) for i in ids for rating in range(1, 6)))
+   quote_ids = [row[0] for row in conn.execute("SELECT id FROM quotes WHERE author_id >= ? ORDER BY id", (first,))]
+   conn.commit()
+   conn.close()
+   data["victims"] = iter(ids)
+   data["victim_quotes"] = iter(quote_ids)
+
+
+def wait_for_server(host, port, timeout=30, interval=0.2):
+   deadline = time.monotonic() + timeout
+   while time.monotonic() < deadline:
+      try:
+         conn = http.client.HTTPConnection(host, port, timeout=1)
+         conn.request("GET", "/quotes/count")
+         conn.getresponse().read()
+         return
+      except OSError:
+         time.sleep(interval)
+   raise RuntimeError("server did not start")
+
+
+def percentile(values, pct):
+   if not values:
+      return 0.0
+   values = sorted(values)
+   return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def load_route(host, port, route, data, concurrency, duration):
+   name, method, make_url, body = route
+   latencies = []
+   errors = [0]
+   lock = threading.Lock()
+   stop = time.monotonic() + duration
+
+   def worker(index):
+      rnd = random.Random(index)
+      local, failed = [], 0
+      payload = json.dumps(body) if body is not None and not callable(body) else None
+      headers = {"Content-Type": "application/json"} if body is not None else {}
+      conn = http.client.HTTPConnection(host, port, timeout=30)
+      while time.monotonic() < stop:
+         url = make_url(rnd, data)
+         if callable(body):
+            payload = json.dumps(body(rnd, data))
+         started = time.perf_counter()
+         try:
+            conn.request(method, url, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+               failed += 1
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+               conn.close()
+               conn = http.client.HTTPConnection(host, port, timeout=30)
+         except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+         local.append((time.perf_counter() - started) * 1000)
+      conn.close()
+      with lock:
+         latencies.extend(local)
+         errors[0] += failed
+
+   threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+   started = time.perf_counter()
+   for thread in threads:
+      thread.start()
+   for thread in threads:
+      thread.join()
+   elapsed = time.perf_counter() - started
+   return {
+      "requests": len(latencies),
+      "rps": round(len(latencies) / elapsed, 1),
+      "p50": round(percentile(latencies, 50), 2),
+      "p95": round(percentile(latencies, 95), 2),
+      "p99": round(percentile(latencies, 99), 2),
+      "errors": errors[0],
+   }
+
+
+def compare(results, baseline, tolerance):
+   """(регрессии, маршруты без baseline). Маршрут без baseline не пропускается молча:
+   иначе новый маршрут никогда не проверялся бы."""
+   regressions = []
+   missing = [name for name in results if not baseline.get(name)]
+   for name, result in results.items():
+      base = baseline.get(name)
+      if not base:
+         continue
+      if base["p95"] and result["p95"] > base["p95"] * (1 + tolerance):
+         regressions.append(f"{name}: p95 {base['p95']} -> {result['p95']} ms")
+      if base["rps"] and result["rps"] < base["rps"] * (1 - tolerance):
+         regressions.append(f"{name}: rps {base['rps']} -> {result['rps']}")
+   return regressions, missing
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--scale", choices=SCALES, default="1k")
+   parser.add_argument("--concurrency", type=int, default=16)
+   parser.add_argument("--duration", type=float, default=10, help="секунд на маршрут")
+   parser.add_argument("--routes", help="подстрока имени маршрута для отбора")
+   parser.add_argument("--port", type=int, default=5055)
+   parser.add_argument("--server", default="{python} -m flask --app app run --no-reload --no-debugger --with-threads --port {port}",
+                       help="команда запуска сервера ({python}, {port})")
+   parser.add_argument("--replica", action="store_true", help="читать GET-запросы из реплики")
+   parser.add_argument("--group-commit", action="store_true", help="групповой commit для POST-запросов")
+   parser.add_argument("--baseline", type=Path, help="JSON с результатами для сравнения")
+   parser.add_argument("--save-baseline", type=Path, help="сохранить результаты как baseline")
+   parser.add_argument("--tolerance", type=float, default=0.25)
+   args = parser.parse_args()
+
+   with tempfile.TemporaryDirectory() as tmp:
+      database = Path(tmp) / "bench.db"
+      env = {**os.environ, "QUOTES_DATABASE": str(database)}
+      if args.replica:
+         env["QUOTES_REPLICA_DATABASE"] = str(Path(tmp) / "replica.db")
+      if args.group_commit:
+         env["QUOTES_GROUP_COMMIT"] = "1"
+      migrate(env)
+      started = time.perf_counter()
+      data = seed(database, SCALES[args.scale])
+      print(f"Seeded {data['quotes']} quotes / {data['authors']} authors in {time.perf_counter() - started:.1f}s",
+            file=sys.stderr)
+
+      command = args.server.format(python=sys.executable, port=args.port).split()
+      server = subprocess.Popen(command, cwd=FLASK_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+      try:
+         wait_for_server("127.0.0.1", args.port)
+         results = {}
+         print(f"{'route':22} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+         for route in ROUTES:
+            if args.routes and args.routes not in route[0]:
+               continue
+            if route[0] in DESTRUCTIVE_ROUTES:
+               # С запасом: больше запросов, чем маршрут успеет выполнить за --duration
+               add_victims(database, data, int(args.duration * 2000))
+            result = results[route[0]] = load_route("127.0.0.1", args.port, route, data, args.concurrency, args.duration)
+            print(f"{route[0]:22} {result['rps']:8.1f} {result['p50']:8.2f} {result['p95']:8.2f} "
+                  f"{result['p99']:8.2f} {result['errors']:6}")
+      finally:
+         server.terminate()
+         server.wait()
+
+   if args.save_baseline:
+      args.save_baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+   if args.baseline:
+      regressions, missing = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+      for line in regressions:
+         print(f"REGRESSION {line}")
+      for name in missing:
+         print(f"NO BASELINE {name}: regenerate it with --save-baseline")
+      if regressions or missing:
+         sys.exit(1)
+      print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+   main()
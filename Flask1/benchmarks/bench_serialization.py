@@ -0,0 +1,123 @@
+"""Скорость чтения списков цитат: ORM-объекты + to_dict() + json против строк Row + orjson.
+
+Запуск из каталога Flask1:
+    python -m benchmarks.bench_serialization --quotes 100000 --limit 1000 --seconds 5
+
+"pipeline" - путь списка без HTTP (SELECT страницы, словари, app.json.response) в трех
+вариантах: как было (ORM + json), только столбцы (Row + json) и быстрый путь (Row + orjson).
+Байты ответа сравниваются с исходным вариантом. "endpoint" - тот же список через
+test_client с json- и orjson-провайдером.
+
+Результаты (Linux, 1 vCPU, Python 3.11, SQLite 3.40.1, orjson 3.8.3, 100000 цитат,
+limit=1000, 5 с, две серии подряд):
+
+    pipeline  orm + json        56 179 / 64 740 rows/s
+    pipeline  rows + json      145 942 / 153 206 rows/s
+    pipeline  rows + orjson    169 639 / 194 861 rows/s
+    endpoint  /quotes               json 116 223 / 123 179   orjson 135 474 / 144 409 rows/s
+    endpoint  /authors/1/quotes     json 101 882 / 119 215   orjson 126 451 / 156 149 rows/s
+    endpoint  /quotes/filter        json 108 375 / 133 390   orjson 123 775 / 140 302 rows/s
+
+Основной выигрыш (примерно в 2.5 раза) дает отказ от ORM-объектов и Row._asdict().
+orjson добавляет еще 5-30%: текст цитат кириллический, и при ensure_ascii (по умолчанию
+во Flask 3) вывод orjson приходится дополнительно экранировать до \\uXXXX.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+FLASK_DIR = Path(__file__).resolve().parent.parent
+
+
+def seed(path, quotes, authors):
+   rnd = random.Random(42)
+   conn = sqlite3.connect(path)
+   conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i, f"Автор {i}") for i in range(1, authors + 1)))
+   conn.executemany("INSERT INTO quotes (author_id, text, rating) VALUES (?, ?, ?)", (
+      (1 if i % 2 else rnd.randint(1, authors), f"Цитата номер {i}: текст средней длины", rnd.randint(1, 5))
+      for i in range(quotes)))
+   conn.commit()
+   conn.close()
+
+
+def measure(func, seconds):
+   """Строк в секунду для func(), которая возвращает число обработанных строк."""
+   rows = 0
+   started = time.perf_counter()
+   while (elapsed := time.perf_counter() - started) < seconds:
+      rows += func()
+   return rows / elapsed
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--quotes", type=int, default=100_000)
+   parser.add_argument("--authors", type=int, default=100)
+   parser.add_argument("--limit", type=int, default=1000)
+   parser.add_argument("--seconds", type=float, default=3)
+   args = parser.parse_args()
+
+   tmp = tempfile.TemporaryDirectory()
+   os.environ["QUOTES_DATABASE"] = str(Path(tmp.name) / "bench.db")
+   from flask.json.provider import DefaultJSONProvider
+   from flask_migrate import upgrade
+   from app import create_app, init_migrate, QUOTE_COLUMNS, TimedJSONProvider, TimedOrjsonProvider, rows_to_dicts
+   from models import db, QuoteModel
+   from json_provider import OrjsonProvider, orjson
+   if orjson is None:
+      sys.exit("orjson is not installed: pip install -r requirements-fast.txt")
+
+   app = create_app()
+   init_migrate(app)
+   with app.app_context():
+      upgrade(directory=str(FLASK_DIR / "migrations"))
+   seed(os.environ["QUOTES_DATABASE"], args.quotes, args.authors)
+   app.config['SERVER_TIMING'] = False
+
+   def orm_pages():
+      quotes = QuoteModel.query.order_by(QuoteModel.id).limit(args.limit).all()
+      return [quote.to_dict() for quote in quotes]
+
+   def row_pages():
+      return rows_to_dicts(QuoteModel.query.with_entities(*QUOTE_COLUMNS).order_by(QuoteModel.id).limit(args.limit).all())
+
+   pipelines = [
+      ("orm + json", orm_pages, DefaultJSONProvider(app)),
+      ("rows + json", row_pages, DefaultJSONProvider(app)),
+      ("rows + orjson", row_pages, OrjsonProvider(app)),
+   ]
+   with app.test_request_context("/quotes"):
+      expected = None
+      for name, pages, provider in pipelines:
+         def run():
+            items = pages()
+            provider.response(items)
+            db.session.remove()  # новая сессия, как в каждом запросе: identity map пуст
+            return len(items)
+         body = provider.response(pages()).get_data()
+         db.session.remove()
+         expected = expected or body
+         same = "identical" if body == expected else "DIFFERENT OUTPUT"
+         print(f"pipeline  {name:22} {measure(run, args.seconds):9.0f} rows/s  {same}")
+
+   client = app.test_client()
+   for url in [f"/quotes?limit={args.limit}", f"/authors/1/quotes?limit={args.limit}", "/quotes/filter?rating=3"]:
+      line = f"endpoint  {url.split('?')[0]:22}"
+      bodies = []
+      for name, provider in [("json", TimedJSONProvider), ("orjson", TimedOrjsonProvider)]:
+         app.json = provider(app)
+         def run():
+            return client.get(url).data.count(b'"id":')
+         bodies.append(client.get(url).data)
+         line += f" {name} {measure(run, args.seconds):9.0f} rows/s"
+      print(line + ("  identical" if bodies[0] == bodies[1] else "  DIFFERENT OUTPUT"))
+   tmp.cleanup()
+
+
+if __name__ == "__main__":
+   main()
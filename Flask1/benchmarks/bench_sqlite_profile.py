@@ -0,0 +1,124 @@
+"""Пропускная способность SQLite под параллельной нагрузкой: профиль по умолчанию и SQLITE_PRAGMAS.
+
+Запуск из каталога Flask1:
+    python -m benchmarks.bench_sqlite_profile --readers 8 --writers 8 --seconds 10
+
+Читатели выполняют запросы как GET /quotes/<id> и GET /authors/<id>/quotes?limit=20,
+писатели - как POST /authors/<id>/quotes (SELECT автора, затем INSERT и COMMIT).
+Каждый профиль работает с новой БД во временном каталоге.
+
+Результаты (Linux, 1 vCPU, Python 3.11, SQLite 3.40.1, 10 с, две серии подряд):
+
+    readers writers  profile   reads/s  writes/s  locked errors
+          8       8  default      1738       326              0
+          8       8  tuned        2689       317              0
+          8       8  default      1923       299              0
+          8       8  tuned        2540       322              0
+          0      16  default         0       738              0
+          0      16  tuned           0      2516              0
+
+"default" - rollback journal и synchronous=FULL: каждый COMMIT делает fsync, а читатели
+мешают писателю завершить транзакцию. "tuned" - SQLITE_PRAGMAS (WAL, synchronous=NORMAL,
+busy_timeout, кэш, mmap) и BEGIN IMMEDIATE для записи. Запись без конкуренции с чтением
+ускоряется примерно в 3.4 раза, чтение при смешанной нагрузке - примерно в 1.4 раза.
+На одном ядре смешанная нагрузка упирается в GIL, поэтому запись при 8 читателях не растет.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, exc, text
+
+from sqlite_engine import DEFAULT_PRAGMAS, configure_sqlite_engine
+
+SCHEMA = [
+   "CREATE TABLE authors (id INTEGER PRIMARY KEY, name VARCHAR(302) NOT NULL UNIQUE)",
+   """CREATE TABLE quotes (id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL REFERENCES authors (id),
+      text VARCHAR(255) NOT NULL, rating INTEGER DEFAULT 1 NOT NULL)""",
+   "CREATE INDEX ix_quotes_author_id ON quotes (author_id)",
+]
+
+
+def make_engine(path, tuned):
+   engine = create_engine(f"sqlite:///{path}", pool_size=32, max_overflow=0)
+   if tuned:
+      configure_sqlite_engine(engine, DEFAULT_PRAGMAS,
+                              begin_immediate=lambda: threading.current_thread().name.startswith("writer"))
+   return engine
+
+
+def seed(engine, authors, quotes):
+   with engine.begin() as conn:
+      for statement in SCHEMA:
+         conn.exec_driver_sql(statement)
+      conn.execute(text("INSERT INTO authors (id, name) VALUES (:id, :name)"),
+                   [{"id": i, "name": f"Author {i}"} for i in range(1, authors + 1)])
+      conn.execute(text("INSERT INTO quotes (author_id, text, rating) VALUES (:a, :t, :r)"),
+                   [{"a": random.randint(1, authors), "t": f"Quote {i}", "r": random.randint(1, 5)}
+                    for i in range(quotes)])
+
+
+def reader(engine, stop, stats, authors, quotes):
+   while not stop.is_set():
+      try:
+         with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM quotes WHERE id = :id"), {"id": random.randint(1, quotes)}).all()
+            conn.execute(text("SELECT * FROM quotes WHERE author_id = :a ORDER BY id LIMIT 20"),
+                         {"a": random.randint(1, authors)}).all()
+         stats["reads"] += 1
+      except exc.OperationalError:
+         stats["errors"] += 1
+
+
+def writer(engine, stop, stats, authors):
+   while not stop.is_set():
+      try:
+         with engine.begin() as conn:
+            author_id = random.randint(1, authors)
+            conn.execute(text("SELECT id FROM authors WHERE id = :id"), {"id": author_id}).one()
+            conn.execute(text("INSERT INTO quotes (author_id, text, rating) VALUES (:a, 'new', 3)"), {"a": author_id})
+         stats["writes"] += 1
+      except exc.OperationalError:
+         stats["errors"] += 1
+
+
+def run(tuned, args):
+   with tempfile.TemporaryDirectory() as tmp:
+      engine = make_engine(Path(tmp) / "bench.db", tuned)
+      seed(engine, args.authors, args.quotes)
+      stop = threading.Event()
+      stats = {"reads": 0, "writes": 0, "errors": 0}
+      threads = [threading.Thread(target=reader, name=f"reader-{i}", args=(engine, stop, stats, args.authors, args.quotes))
+                 for i in range(args.readers)]
+      threads += [threading.Thread(target=writer, name=f"writer-{i}", args=(engine, stop, stats, args.authors))
+                  for i in range(args.writers)]
+      for thread in threads:
+         thread.start()
+      time.sleep(args.seconds)
+      stop.set()
+      for thread in threads:
+         thread.join()
+      engine.dispose()
+   return {key: value / args.seconds if key != "errors" else value for key, value in stats.items()}
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--readers", type=int, default=8)
+   parser.add_argument("--writers", type=int, default=8)
+   parser.add_argument("--seconds", type=float, default=10)
+   parser.add_argument("--authors", type=int, default=1000)
+   parser.add_argument("--quotes", type=int, default=100_000)
+   args = parser.parse_args()
+
+   print(f"{'profile':8}  {'reads/s':>8}  {'writes/s':>8}  {'locked errors':>13}")
+   for name, tuned in (("default", False), ("tuned", True)):
+      result = run(tuned, args)
+      print(f"{name:8}  {result['reads']:8.0f}  {result['writes']:8.0f}  {result['errors']:13}")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,101 @@
+"""Холодный старт воркера: импорт, создание приложения и первый ответ.
+
+Запуск из каталога Flask1:
+    python -m benchmarks.bench_startup --runs 20
+
+Каждый замер - новый интерпретатор (как новый pre-fork воркер после масштабирования):
+    import        - import app (модели, маршруты, зависимости)
+    create_app    - create_app(): конфигурация, engine, JSON-провайдер, кэши
+    first request - первый GET /authors через WSGI (соединение с БД, PRAGMA)
+    total         - от запуска интерпретатора до первого ответа
+Отдельно считается время до первого ответа настоящего сервера (flask run) и
+проверяется, что Alembic не загружается в обслуживающем процессе.
+
+Результаты (Linux, 1 vCPU, Python 3.11, 20 запусков, медиана, мс):
+
+                    до (модуль app)    create_app()
+    import                763.6             496.3
+    create_app              0.0              11.3
+    first request          22.9              20.6
+    total                 814.9             554.4
+    flask run -> 200      873.3             681.2
+
+До: модуль app при импорте подключал Flask-Migrate (и с ним Alembic, ~150-250 мс) и
+создавал engine. После: Alembic грузится только командой flask db, engine и кэши
+создает create_app(). Замеры шли попеременно на одной машине.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_endpoints import migrate, wait_for_server
+
+FLASK_DIR = Path(__file__).resolve().parent.parent
+
+# Выполняется в отдельном интерпретаторе; время старта интерпретатора передается аргументом
+WORKER = """
+import json, sys, time
+started = float(sys.argv[1])
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+flask_app = module.create_app() if hasattr(module, "create_app") else module.app
+t2 = time.perf_counter()
+status = flask_app.test_client().get("/authors").status_code
+t3 = time.perf_counter()
+print(json.dumps({
+   "interpreter": t0 - started, "import": t1 - t0, "create_app": t2 - t1, "first request": t3 - t2,
+   "total": t3 - started, "status": status, "alembic loaded": "alembic" in sys.modules,
+}))
+"""
+
+
+def run_worker(env) -> dict:
+   started = time.perf_counter()
+   # perf_counter в дочернем процессе отсчитывается от того же монотонного источника (Linux)
+   output = subprocess.run([sys.executable, "-c", WORKER, repr(started)], cwd=FLASK_DIR, env=env,
+                           check=True, capture_output=True, text=True).stdout
+   return json.loads(output.splitlines()[-1])
+
+
+def run_server(env, port) -> float:
+   started = time.perf_counter()
+   server = subprocess.Popen([sys.executable, "-m", "flask", "--app", "app", "run", "--no-reload", "--port", str(port)],
+                             cwd=FLASK_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+   try:
+      wait_for_server("127.0.0.1", port, interval=0.005)
+      return time.perf_counter() - started
+   finally:
+      server.terminate()
+      server.wait()
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+   parser.add_argument("--runs", type=int, default=20)
+   parser.add_argument("--port", type=int, default=5056)
+   args = parser.parse_args()
+
+   with tempfile.TemporaryDirectory() as tmp:
+      env = {**os.environ, "QUOTES_DATABASE": str(Path(tmp) / "bench.db")}
+      migrate(env)
+      samples = [run_worker(env) for _ in range(args.runs)]
+      servers = [run_server(env, args.port) for _ in range(max(1, args.runs // 4))]
+
+   print(f"{'phase':16} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+   for phase in ("interpreter", "import", "create_app", "first request", "total"):
+      values = [sample[phase] * 1000 for sample in samples]
+      print(f"{phase:16} {statistics.median(values):10.1f} {min(values):8.1f} {max(values):8.1f}")
+   values = [value * 1000 for value in servers]
+   print(f"{'flask run -> 200':16} {statistics.median(values):10.1f} {min(values):8.1f} {max(values):8.1f}")
+   print(f"status {samples[0]['status']}, alembic loaded in worker: {samples[0]['alembic loaded']}")
+
+
+if __name__ == "__main__":
+   main()
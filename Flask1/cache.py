@@ -0,0 +1,156 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+   """Ограниченный LRU-кэш с временем жизни записей и статистикой попаданий.
+
+   Потокобезопасен. При переполнении вытесняется давно не использованная запись.
+
+   generation растет при каждом pop() и clear(). Заполняющий кэш читает его до чтения
+   источника и передает в set(): если между ними запись была инвалидирована, set()
+   ничего не сохраняет, и прочитанное до изменения значение не вернется в кэш.
+   """
+
+   def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+      self.maxsize = maxsize
+      self.ttl = ttl
+      self._clock = clock
+      self._data = OrderedDict()
+      self._lock = threading.Lock()
+      self.generation = 0
+      self.hits = self.misses = self.evictions = self.expirations = 0
+
+   def __len__(self):
+      return len(self._data)
+
+   def get(self, key, default=MISSING):
+      with self._lock:
+         item = self._data.get(key)
+         if item is None:
+            self.misses += 1
+            return default
+         expires, value = item
+         if expires <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+         self._data.move_to_end(key)
+         self.hits += 1
+         return value
+
+   def set(self, key, value, generation=None) -> bool:
+      """Сохранить value; с generation - только если с тех пор не было pop()/clear()."""
+      with self._lock:
+         if generation is not None and generation != self.generation:
+            return False
+         self._data[key] = (self._clock() + self.ttl, value)
+         self._data.move_to_end(key)
+         while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+         return True
+
+   def pop(self, key):
+      with self._lock:
+         self.generation += 1
+         self._data.pop(key, None)
+
+   def clear(self):
+      with self._lock:
+         self.generation += 1
+         self._data.clear()
+
+   def stats(self) -> dict:
+      with self._lock:
+         return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+         }
+
+
+class DataVersionWatcher:
+   """Обнаруживает запись в файл SQLite из других процессов через PRAGMA data_version.
+
+   data_version сравнимо только в пределах одного соединения, поэтому используется
+   собственное соединение. Значение меняется после commit любого другого соединения,
+   включая соединения этого же процесса. Проверка выполняется не чаще раза в interval секунд.
+   """
+
+   def __init__(self, path, interval=0.0, clock=time.monotonic):
+      self.path = path
+      self.interval = interval
+      self._clock = clock
+      self._lock = threading.Lock()
+      self._conn = None
+      self._version = None
+      self._checked = float("-inf")
+
+   def changed(self) -> bool:
+      with self._lock:
+         now = self._clock()
+         if now - self._checked < self.interval:
+            return False
+         self._checked = now
+         if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+         version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+         changed = self._version is not None and version != self._version
+         self._version = version
+         return changed
+
+
+class TableVersions:
+   """Версии таблиц для ETag и Last-Modified условных GET-запросов.
+
+   Версии и время последнего изменения хранит БД (таблица table_versions, ее обновляют
+   триггеры в транзакции записи), поэтому ETag одинаков во всех процессах и после
+   перезапуска. Они читаются собственным соединением и только после commit другого
+   соединения (PRAGMA data_version, не чаще interval секунд) или после invalidate().
+   """
+
+   def __init__(self, path, interval=0.0, clock=time.monotonic):
+      self.path = path
+      self.interval = interval
+      self._clock = clock
+      self._lock = threading.Lock()
+      self._conn = None
+      self._data_version = None
+      self._checked = float("-inf")
+      self._versions = {}
+
+   def invalidate(self):
+      """Перечитать версии при следующем get(), не дожидаясь interval (после своего commit)."""
+      with self._lock:
+         self._data_version = None
+
+   def _refresh(self):
+      now = self._clock()
+      if self._data_version is not None and now - self._checked < self.interval:
+         return
+      self._checked = now
+      if self._conn is None:
+         self._conn = sqlite3.connect(self.path, check_same_thread=False)
+      data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+      if data_version != self._data_version:
+         rows = self._conn.execute("SELECT name, version, modified_at FROM table_versions")
+         self._versions = {name: (version, modified_at) for name, version, modified_at in rows}
+         self._data_version = data_version
+
+   def get(self, *tables):
+      """(etag, modified_at) для набора таблиц; modified_at - момент последнего изменения (time.time())."""
+      with self._lock:
+         self._refresh()
+         state = [self._versions.get(table, (0, 0.0)) for table in tables]
+      etag = ".".join(str(version) for version, _ in state)
+      return etag, max(modified for _, modified in state)
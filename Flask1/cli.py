@@ -0,0 +1,478 @@
+"""Команды flask quotes. Модуль загружается только при вызове команды (см. app.LazyGroup)."""
+import collections
+import csv
+import io
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import time
+from urllib.parse import urlsplit
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text, event, insert, delete
+
+from models import db, AuthorModel, QuoteModel, QuoteCounterModel, RatingStatsModel, ChangeLogStateModel
+from app import validate, encode_cursor, entity_cache, state, resolve_author_ids
+from app import QUOTE_FILTER_FIELDS, QUOTE_SORT_FIELDS, SCAN_OPERATORS
+
+quotes_cli = AppGroup("quotes", help="Обслуживание базы цитат.")
+
+
+@quotes_cli.command("reconcile-counters")
+def reconcile_counters():
+   """Пересчитать quote_counters с нуля по таблице quotes."""
+   db.session.execute(text("DELETE FROM quote_counters"))
+   db.session.execute(text("""
+      INSERT INTO quote_counters (author_id, count)
+      SELECT 0, count(*) FROM quotes
+      UNION ALL
+      SELECT author_id, count(*) FROM quotes GROUP BY author_id
+   """))
+   db.session.commit()
+   click.echo(f"Counters rebuilt: {QuoteCounterModel.get_count()} quotes total")
+
+
+@quotes_cli.command("rebuild-stats")
+def rebuild_stats():
+   """Пересчитать rating_stats и слоты /quotes/random (quote_slots) с нуля по таблице quotes."""
+   db.session.execute(text("DELETE FROM rating_stats"))
+   db.session.execute(text("""
+      INSERT INTO rating_stats (author_id, rating, count)
+      SELECT 0, rating, count(*) FROM quotes GROUP BY rating
+      UNION ALL
+      SELECT author_id, rating, count(*) FROM quotes GROUP BY author_id, rating
+   """))
+   db.session.execute(text("DELETE FROM quote_slots"))
+   db.session.execute(text("""
+      INSERT INTO quote_slots (author_id, rating, slot, quote_id)
+      SELECT 0, rating, row_number() OVER (PARTITION BY rating ORDER BY id), id FROM quotes
+      UNION ALL
+      SELECT author_id, rating, row_number() OVER (PARTITION BY author_id, rating ORDER BY id), id FROM quotes
+   """))
+   db.session.commit()
+   click.echo(f"Rating stats rebuilt: {RatingStatsModel.summary()['count']} quotes total")
+
+
+@quotes_cli.command("rebuild-search")
+def rebuild_search():
+   """Перестроить полнотекстовый индекс quotes_fts по таблице quotes."""
+   db.session.execute(text("INSERT INTO quotes_fts (quotes_fts) VALUES ('rebuild')"))
+   db.session.commit()
+   click.echo("Search index rebuilt")
+
+
+@quotes_cli.command("compact-changes")
+@click.option("--retention-days", default=7, show_default=True,
+              help="Сколько дней хранить записи об удалениях.")
+def compact_changes(retention_days):
+   """Очистить журнал изменений.
+
+   Для каждой строки остается только последняя запись: клиент с любым since все равно
+   получит ее, а data в ней - текущее состояние. Записи об удалениях старше
+   --retention-days удаляются, горизонт журнала сдвигается на наибольший удаленный seq.
+   """
+   superseded = db.session.execute(text("""
+      DELETE FROM changes WHERE seq < (
+         SELECT max(latest.seq) FROM changes AS latest
+         WHERE latest.table_name = changes.table_name AND latest.row_id = changes.row_id)
+   """)).rowcount
+   cutoff = int(time.time()) - retention_days * 86400
+   expired = db.session.execute(text("DELETE FROM changes WHERE op = 'delete' AND changed_at < :cutoff RETURNING seq"),
+                                {"cutoff": cutoff}).scalars().all()
+   if expired:
+      db.session.execute(text("UPDATE change_log_state SET horizon = max(horizon, :seq) WHERE id = 1"),
+                         {"seq": max(expired)})
+   db.session.commit()
+   click.echo(f"Change log compacted: {superseded} superseded and {len(expired)} expired entries removed, "
+              f"horizon {ChangeLogStateModel.get_horizon()}")
+
+
+@quotes_cli.command("refresh-replica")
+@click.option("--once", is_flag=True, help="Снять один снимок и выйти.")
+def refresh_replica(once):
+   """Обновлять реплику для чтения (QUOTES_REPLICA_DATABASE) после записей в основную БД.
+
+   Для процессов сервера с SQLITE_REPLICA_REFRESH = False. Если реплику уже обновляет
+   другой процесс, команда ждет его завершения.
+   """
+   replica = state().replica
+   if replica is None:
+      raise click.UsageError("QUOTES_REPLICA_DATABASE is not set")
+   if once:
+      replica.refresh()
+      click.echo(f"Replica {replica.path} refreshed")
+      return
+   click.echo(f"Refreshing {replica.path} every {replica.interval}s after writes, Ctrl+C to stop")
+   replica.run()
+
+
+EXPORT_FIELDS = ["id", "author", "author_id", "text", "rating"]
+
+
+def chunked(iterable, size):
+   iterator = iter(iterable)
+   while chunk := list(itertools.islice(iterator, size)):
+      yield chunk
+
+
+def detect_format(file, fmt):
+   if fmt:
+      return fmt
+   name = getattr(file, "name", "")
+   return "csv" if str(name).endswith(".csv") else "jsonl"
+
+
+class Progress:
+   """Вывод прогресса и скорости (строк/с) в stderr."""
+   def __init__(self, action):
+      self.action = action
+      self.count = 0
+      self.started = time.perf_counter()
+
+   def update(self, count):
+      self.count += count
+      elapsed = time.perf_counter() - self.started
+      click.echo(f"{self.action} {self.count} rows, {self.count / elapsed if elapsed else 0:.0f} rows/sec", err=True)
+
+
+@quotes_cli.command("export")
+@click.argument("output", type=click.File("w", encoding="utf-8"), default="-")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl", "ndjson"]), help="По умолчанию по расширению файла, иначе jsonl.")
+@click.option("--batch-size", default=5000, show_default=True, help="Сколько строк читать из БД за раз.")
+def export_quotes(output, fmt, batch_size):
+   """Потоковая выгрузка цитат (с именами авторов) в CSV или JSONL/NDJSON."""
+   fmt = detect_format(output, fmt)
+   stmt = (db.select(QuoteModel.id, AuthorModel.name.label("author"), QuoteModel.author_id,
+                     QuoteModel.text, QuoteModel.rating)
+           .join(AuthorModel, AuthorModel.id == QuoteModel.author_id)
+           .order_by(QuoteModel.id)
+           .execution_options(yield_per=batch_size))
+   writer = None
+   if fmt == "csv":
+      writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+      writer.writeheader()
+   progress = Progress("Exported")
+   for partition in db.session.execute(stmt).mappings().partitions():
+      for row in partition:
+         if writer:
+            writer.writerow(row)
+         else:
+            output.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+      progress.update(len(partition))
+
+
+def read_import_rows(input, fmt):
+   """(номер строки, строка) файла импорта (input открыт в двоичном режиме). Нечитаемая
+   строка JSONL дает None и предупреждение с номером строки, а не прерывает импорт."""
+   # csv требует newline="": иначе \r\n внутри поля в кавычках превратится в \n
+   input = io.TextIOWrapper(input, encoding="utf-8", newline="")
+   if fmt == "csv":
+      reader = csv.DictReader(input)
+      for row in reader:
+         yield reader.line_num, row
+      return
+   for number, line in enumerate(input, 1):
+      if not line.strip():
+         continue
+      try:
+         row = json.loads(line)
+      except ValueError as e:
+         click.echo(f"Line {number}: invalid JSON ({e}), skipped", err=True)
+         yield number, None
+         continue
+      if not isinstance(row, dict):
+         click.echo(f"Line {number}: expected a JSON object, skipped", err=True)
+         yield number, None
+         continue
+      yield number, row
+
+
+@quotes_cli.command("import")
+@click.argument("input", type=click.File("rb"))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl", "ndjson"]), help="По умолчанию по расширению файла, иначе jsonl.")
+@click.option("--chunk-size", default=5000, show_default=True, help="Сколько строк вставлять в одной транзакции.")
+def import_quotes(input, fmt, chunk_size):
+   """Потоковая загрузка цитат из CSV или JSONL/NDJSON.
+
+   Строка должна содержать author (имя) и text, rating необязателен. Неизвестные
+   авторы создаются. Поле id из выгрузки игнорируется.
+   """
+   fmt = detect_format(input, fmt)
+   skipped = 0
+   progress = Progress("Imported")
+   for chunk in chunked(read_import_rows(input, fmt), chunk_size):
+      rows = []
+      for number, row in chunk:
+         if row is None:
+            skipped += 1
+            continue
+         # Не строка в author или text сорвала бы импорт посреди файла, когда часть
+         # пачек уже зафиксирована: ошибка связывания, нехешируемое имя или KeyError
+         invalid = [field for field in ("author", "text") if type(row.get(field)) is not str or not row[field]]
+         if invalid:
+            click.echo(f"Line {number}: {' and '.join(invalid)} must be a non-empty string, skipped", err=True)
+            skipped += 1
+            continue
+         rating = row.get("rating")
+         if isinstance(rating, str) and rating.isdigit():
+            rating = int(rating)
+         data = validate({"text": row["text"], "rating": rating if rating is not None else 1}, "POST")
+         data["author"] = row["author"]
+         rows.append(data)
+      # Имена авторов - одним SELECT/INSERT на пачку, повторные - из кэша author_ids (при ENTITY_CACHE_COORDINATION)
+      author_ids, _ = resolve_author_ids(data["author"] for data in rows)
+      for data in rows:
+         data["author_id"] = author_ids[data.pop("author")]
+      if rows:
+         db.session.execute(insert(QuoteModel.__table__), rows)
+      db.session.commit()
+      progress.update(len(rows))
+   click.echo(f"Done: {progress.count} rows imported, {skipped} skipped", err=True)
+
+
+# Запросы для flask quotes check-plans: (URL, таблицы, которым разрешен SCAN,
+# максимум SQL-запросов или None). SCAN quotes на первой странице /quotes - это обход
+# по rowid с LIMIT, а не полный просмотр; /authors/top просматривает rating_stats
+# (O(авторов)) и свой подзапрос top из n строк. Лимит запросов для ?expand=author проверяет,
+# что число запросов не растет с размером страницы (нет N+1). Потоковые ответы и список
+# авторов отдают всю таблицу - их SCAN ожидаем; /changes?since=0 после очистки журнала
+# еще считает записи до горизонта. /quotes/filter по каждому оператору добавляет
+# filter_plan_checks()
+PLAN_CHECK_REQUESTS = [
+   ("/quotes?limit=10", {"quotes"}, 1),
+   ("/quotes?limit=10&after={cursor}", set(), 1),
+   ("/quotes?stream=1", {"quotes"}, 1),
+   ("/quotes/{quote_id}", set(), 1),
+   ("/quotes/random?n=5&author_id={author_id}&min_rating=3", set(), 2),
+   ("/quotes/count", set(), 1),
+   ("/quotes/filter?author_id={author_id}&rating=5", set(), 1),
+   ("/quotes/filter?rating__gte=4&sort=-rating&limit=10", set(), 1),
+   ("/quotes/filter?id__in={quote_id},{quote_id}&sort=author_id", set(), 1),
+   ("/quotes/filter?author__name__prefix=A&author_id={author_id}", set(), 1),
+   ("/quotes/filter?rating=5&stream=1", set(), 1),
+   ("/quotes/search?q=text", set(), 1),
+   ("/authors", {"authors"}, 1),
+   ("/authors?stream=1", {"authors"}, 1),
+   ("/authors/{author_id}", set(), 1),
+   ("/authors/{author_id}/quotes?limit=10", set(), 2),
+   ("/authors/{author_id}/quotes?stream=1", set(), 2),
+   ("/authors/{author_id}/quotes/count", set(), 2),
+   ("/stats/ratings", set(), 1),
+   ("/authors/{author_id}/stats", set(), 2),
+   ("/authors/top?by=count&n=5", {"rating_stats", "top"}, 1),
+   ("/authors/top?by=avg_rating&n=5&min_count=2", {"rating_stats", "top"}, 1),
+   ("/changes?since={quote_id}&limit=100", set(), 2),
+   ("/changes?since=0", {"changes"}, 3),
+   ("/quotes?limit=100&expand=author", {"quotes"}, 1),
+   ("/quotes/{quote_id}?expand=author", set(), 2),
+   ("/quotes/random?n=50&expand=author", set(), 2),
+   ("/quotes/filter?rating=5&expand=author", set(), 1),
+   ("/quotes/search?q=text&limit=100&expand=author", set(), 2),
+   ("/authors/{author_id}/quotes?limit=100&expand=author", set(), 2),
+   ("/cache/stats", set(), 0),
+   ("/metrics", set(), 0),
+]
+
+RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+# Пример значения для каждого поля QUOTE_FILTER_FIELDS (для in - список из одного значения)
+PLAN_CHECK_FILTER_VALUES = {"id": "{quote_id}", "author_id": "{author_id}", "rating": "3",
+                            "text": "text", "author__name": "A"}
+
+# Запросы на запись: (метод, URL, тело: None, JSON или функция (параметры) -> JSON,
+# разрешенные полные SCAN, максимум SQL-запросов). Выполняются по порядку над временным
+# автором {author_id} с цитатами ({scratch_quote_id} - одна из них), которого check-plans
+# создает сам; последний запрос его удаляет, новые авторы с именами {name}-... удаляются
+# после проверки. BEGIN IMMEDIATE тоже считается, запросы триггеров - нет (см. trigger_statements())
+PLAN_CHECK_WRITES = [
+   ("POST", "/authors", lambda p: {"name": f"{p['name']}-new"}, set(), 2),
+   ("PUT", "/authors/by-name/{name}", None, set(), 3),
+   ("PUT", "/authors/by-name/{name}-by-name", None, set(), 3),
+   ("POST", "/authors/batch", lambda p: [p["name"], f"{p['name']}-batch"], set(), 3),
+   ("POST", "/authors/{author_id}/quotes", {"text": "check-plans", "rating": 2}, set(), 3),
+   ("POST", "/authors/{author_id}/quotes/bulk", [{"text": "check-plans bulk", "rating": 3}] * 5, set(), 3),
+   ("POST", "/quotes/bulk", lambda p: [{"author_id": p["author_id"], "text": "check-plans bulk"}] * 5, set(), 3),
+   ("PUT", "/quotes/{scratch_quote_id}", {"rating": 4}, set(), 3),
+   ("PUT", "/authors/{author_id}", lambda p: {"name": f"{p['name']}-renamed"}, set(), 3),
+   ("DELETE", "/quotes/{scratch_quote_id}", None, set(), 3),
+   ("DELETE", "/quotes?author_id={author_id}&rating=1", None, set(), 2),
+   ("DELETE", "/authors/{author_id}", None, set(), 4),
+]
+PLAN_CHECK_NEW_AUTHORS = ("new", "by-name", "batch")
+
+# Полный проход по таблице - и по самой таблице, и по ее индексу (SCAN quotes USING
+# COVERING INDEX ...). SCAN виртуальной таблицы FTS - поиск по MATCH, а не проход
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?:$| USING (?:COVERING )?INDEX )")
+TRIGGER_BODY = re.compile(r"\bBEGIN\b(.*)\bEND\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+TRIGGER_ROW = re.compile(r"\b(?:NEW|OLD)\.\w+", re.IGNORECASE)
+
+
+def filter_plan_checks() -> list:
+   """По запросу /quotes/filter на каждый оператор каждого поля QUOTE_FILTER_FIELDS.
+   Операторам SCAN_OPERATORS (LIKE '%...%') полный SCAN разрешен: индекс им не помогает."""
+   checks = []
+   for field, (_, _, operators) in QUOTE_FILTER_FIELDS.items():
+      value = PLAN_CHECK_FILTER_VALUES.get(field)
+      if value is None:
+         raise click.ClickException(f"No PLAN_CHECK_FILTER_VALUES entry for filter field {field}")
+      for op in operators:
+         key = field if op == "eq" else f"{field}__{op}"
+         allowed = {"quotes", "authors"} if op in SCAN_OPERATORS else set()
+         url = f"/quotes/filter?{key}={value}"
+         # Без сортировки по полю диапазон идет в порядке ORDER BY id, и планировщик
+         # обходит таблицу по rowid вместо индекса поля
+         if op in RANGE_OPERATORS and field != "id" and field in QUOTE_SORT_FIELDS:
+            url += f"&sort={field}"
+         checks.append((url, allowed, 1))
+   return checks
+
+
+def uncovered_routes(checks) -> list:
+   """Маршруты приложения (метод и правило), для которых в checks нет ни одного запроса."""
+   adapter = current_app.url_map.bind("localhost")
+   covered = set()
+   for method, url, *_ in checks:
+      endpoint, _ = adapter.match(urlsplit(url).path, method=method)
+      covered.add((endpoint, method))
+   missing = []
+   for rule in current_app.url_map.iter_rules():
+      if rule.endpoint == "static":
+         continue
+      for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+         if (rule.endpoint, method) not in covered:
+            missing.append(f"{method} {rule.rule}")
+   return missing
+
+
+def trigger_statements():
+   """(триггер, запрос) для каждого запроса в телах триггеров БД; NEW.x и OLD.x заменены на 0."""
+   triggers = db.session.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name"))
+   for name, sql in triggers:
+      body = TRIGGER_BODY.search(sql).group(1)
+      statement = ""
+      for part in body.split(";"):
+         statement += part + ";"
+         if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+               yield name, TRIGGER_ROW.sub("0", statement)
+            statement = ""
+
+
+def create_plan_check_author():
+   """Временный автор с цитатами всех рейтингов для запросов PLAN_CHECK_WRITES.
+   Возвращает (id автора, имя, id одной из цитат)."""
+   author = AuthorModel(f"check-plans-{time.time_ns()}")
+   db.session.add(author)
+   db.session.flush()
+   quote_ids = db.session.scalars(insert(QuoteModel).returning(QuoteModel.id), [
+      {"author_id": author.id, "text": "check-plans", "rating": rating} for rating in range(1, 6)]).all()
+   db.session.commit()
+   result = author.id, author.name, quote_ids[-1]
+   db.session.remove()
+   return result
+
+
+@quotes_cli.command("check-plans")
+def check_plans():
+   """Прогнать EXPLAIN QUERY PLAN для всех SQL-запросов эндпоинтов и триггеров и упасть на
+   полном SCAN таблицы, на превышении числа SQL-запросов или если для маршрута приложения
+   нет ни одного запроса проверки.
+
+   Запросы на запись меняют и удаляют только временного автора и его цитаты, созданные командой.
+   """
+   quote = QuoteModel.query.order_by(QuoteModel.id).first()
+   if quote is None:
+      click.echo("Warning: quotes table is empty, some endpoints will return 404 early")
+   params = {
+      "quote_id": quote.id if quote else 1,
+      "author_id": quote.author_id if quote else 1,
+      "cursor": encode_cursor({"id": quote.id if quote else 0}),
+   }
+
+   captured = []
+   def capture(conn, cursor, statement, parameters, context, executemany):
+      # executemany: план один, достаточно первого набора параметров
+      if executemany and isinstance(parameters, list):
+         parameters = parameters[0]
+      captured.append((statement, parameters))
+
+   client = current_app.test_client()
+   failures = 0
+   checks = [("GET", url.format(**params), None, allowed, max_statements)
+             for url, allowed, max_statements in PLAN_CHECK_REQUESTS + filter_plan_checks()]
+   author_id, name, scratch_quote_id = create_plan_check_author()
+   scratch = {"author_id": author_id, "name": name, "scratch_quote_id": scratch_quote_id}
+   checks += [(method, url.format(**scratch), body(scratch) if callable(body) else body, allowed, max_statements)
+              for method, url, body, allowed, max_statements in PLAN_CHECK_WRITES]
+   for route in uncovered_routes(checks):
+      failures += 1
+      click.echo(f"NO PLAN CHECK: {route} (add it to PLAN_CHECK_REQUESTS or PLAN_CHECK_WRITES)")
+
+   try:
+      for method, url, body, allowed, max_statements in checks:
+         if method == "GET":
+            client.get(url)  # прогрев: ленивые загрузки (например, table_versions) не считаются
+         # Клиент работает в контексте приложения команды: сбрасываем identity map сессии
+         # и кэш сущностей, чтобы запросы к БД действительно выполнялись
+         db.session.remove()
+         entity_cache.clear()
+         captured.clear()
+         for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", capture)
+         try:
+            response = client.open(url, method=method, json=body)
+            response.get_data()  # потоковый ответ читает БД, пока отдается тело
+            status = response.status_code
+         finally:
+            for engine in db.engines.values():
+               event.remove(engine, "before_cursor_execute", capture)
+            db.session.remove()
+
+         label = url if method == "GET" else f"{method} {url}"
+         click.echo(f"{label} -> {status}, {len(captured)} statement(s)")
+         if status >= 500:
+            failures += 1
+            click.echo("  SERVER ERROR")
+         if max_statements is not None and len(captured) > max_statements:
+            failures += 1
+            click.echo(f"  TOO MANY STATEMENTS: expected at most {max_statements}")
+         failures += explain_statements(captured, allowed)
+   finally:
+      db.session.execute(delete(AuthorModel).where(
+         AuthorModel.name.in_([f"{name}-{suffix}" for suffix in PLAN_CHECK_NEW_AUTHORS])))
+      db.session.commit()
+
+   # Триггеры выполняются внутри INSERT/UPDATE/DELETE, и EXPLAIN QUERY PLAN этих запросов
+   # их не показывает: тела триггеров проверяются отдельно
+   statements = collections.defaultdict(list)
+   for trigger, statement in trigger_statements():
+      statements[trigger].append((statement, ()))
+   for trigger, trigger_captured in statements.items():
+      click.echo(f"trigger {trigger}: {len(trigger_captured)} statement(s)")
+      failures += explain_statements(trigger_captured, set())
+
+   if failures:
+      click.echo(f"{failures} problem(s) found")
+      sys.exit(1)
+   click.echo("OK: no unexpected full table scans or extra statements")
+
+
+def explain_statements(captured, allowed) -> int:
+   """EXPLAIN QUERY PLAN для запросов (statement, parameters); количество полных SCAN
+   таблиц не из allowed (каждый выводится)."""
+   failures = 0
+   with db.engine.connect() as conn:
+      for statement, parameters in captured:
+         if not statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+            continue
+         plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+         for row in plan:
+            match = FULL_SCAN.match(row[-1])
+            if match and match.group(1) not in allowed:
+               failures += 1
+               click.echo(f"  FULL SCAN of {match.group(1)}: {' '.join(statement.split())}")
+               click.echo(f"    plan: {row[-1]}")
+   return failures
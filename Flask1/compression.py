@@ -0,0 +1,98 @@
+import zlib
+
+try:
+   import zstandard
+except ImportError:  # необязательная зависимость (requirements-fast.txt)
+   zstandard = None
+
+try:
+   import brotli
+except ImportError:  # необязательная зависимость (requirements-fast.txt)
+   brotli = None
+
+
+class ZlibEncoder:
+   """gzip (wbits=31) и deflate (wbits=15, формат zlib, как требует HTTP)."""
+
+   def __init__(self, level, wbits):
+      self._obj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+   def compress(self, data: bytes) -> bytes:
+      return self._obj.compress(data)
+
+   def finish(self) -> bytes:
+      return self._obj.flush()
+
+
+class ZstdEncoder:
+   def __init__(self, level):
+      self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+   def compress(self, data: bytes) -> bytes:
+      return self._obj.compress(data)
+
+   def finish(self) -> bytes:
+      return self._obj.flush()
+
+
+class BrotliEncoder:
+   def __init__(self, level):
+      self._obj = brotli.Compressor(quality=level)
+
+   def compress(self, data: bytes) -> bytes:
+      return self._obj.process(data)
+
+   def finish(self) -> bytes:
+      return self._obj.finish()
+
+
+# Content-Encoding -> (кодировщик по уровню сжатия, допустимые уровни)
+ENCODERS = {
+   "gzip": (lambda level: ZlibEncoder(level, 31), range(0, 10)),
+   "deflate": (lambda level: ZlibEncoder(level, 15), range(0, 10)),
+}
+if zstandard is not None:
+   ENCODERS["zstd"] = (ZstdEncoder, range(1, 23))
+if brotli is not None:
+   ENCODERS["br"] = (BrotliEncoder, range(0, 12))
+
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6, "deflate": 6}
+
+
+def available_encodings(preferred) -> list:
+   """Кодировки из preferred (в порядке предпочтения сервера), для которых есть кодировщик."""
+   return [encoding for encoding in preferred if encoding in ENCODERS]
+
+
+def get_encoder(encoding, level):
+   factory, levels = ENCODERS[encoding]
+   if level not in levels:
+      raise ValueError(f"Invalid {encoding} level {level}, expected {levels.start}..{levels.stop - 1}")
+   return factory(level)
+
+
+def compress(data: bytes, encoding, level) -> bytes:
+   encoder = get_encoder(encoding, level)
+   return encoder.compress(data) + encoder.finish()
+
+
+def compress_chunks(chunks, encoding, level, buffer_size=16384):
+   """Сжатие потокового тела по мере поступления частей.
+
+   Мелкие части (строки NDJSON) собираются до buffer_size байт и только потом
+   передаются кодировщику: вызов на каждую строку дороже, а brotli на низких уровнях
+   сжимает каждый вызов отдельно и почти не уменьшает такой поток. Память не зависит
+   от длины потока, клиент получает данные, не дожидаясь конца ответа.
+   """
+   encoder = get_encoder(encoding, level)
+   pending, size = [], 0
+   for chunk in chunks:
+      chunk = chunk.encode() if isinstance(chunk, str) else chunk
+      pending.append(chunk)
+      size += len(chunk)
+      if size >= buffer_size:
+         data = encoder.compress(b"".join(pending))
+         pending, size = [], 0
+         if data:
+            yield data
+   yield encoder.compress(b"".join(pending)) + encoder.finish()
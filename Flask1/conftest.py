@@ -0,0 +1,34 @@
+"""Общие фикстуры тестов: приложение на временной БД с примененными миграциями.
+
+Запуск из каталога Flask1 (или из корня репозитория):
+    python -m pytest -q
+"""
+from pathlib import Path
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app, init_migrate
+
+FLASK_DIR = Path(__file__).resolve().parent
+
+
+@pytest.fixture
+def database(tmp_path):
+   """Путь к пустой БД, к которой применены все миграции."""
+   path = tmp_path / "quotes.db"
+   app = create_app({"QUOTES_DATABASE": path})
+   init_migrate(app)
+   with app.app_context():
+      upgrade(directory=str(FLASK_DIR / "migrations"))
+   return path
+
+
+@pytest.fixture
+def app(database):
+   return create_app({"QUOTES_DATABASE": database, "SERVER_TIMING": False})
+
+
+@pytest.fixture
+def client(app):
+   return app.test_client()
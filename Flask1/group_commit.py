@@ -0,0 +1,105 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+   """Групповой commit: записи из многих потоков выполняются одним потоком-писателем
+   в общих транзакциях.
+
+   submit(job, *args) ставит задание в очередь и возвращает Future. Писатель берет
+   первое задание, добирает до max_batch заданий в течение max_delay секунд и выполняет
+   их в одной транзакции с одним flush. Если пакет упал (например, IntegrityError),
+   он откатывается и повторяется по заданиям, каждое в своем SAVEPOINT: ошибка
+   попадает только в Future виновного задания. Остальные получают результаты после
+   общего commit. Если не удался сам commit, ошибку получают все задания пакета.
+
+   job(*args) добавляет объекты в session и возвращает функцию без аргументов,
+   которая после flush вычисляет результат задания (например, author.to_dict).
+   Поток писателя живет в контексте приложения app, g.group_commit_writer в нем
+   равен True (по нему транзакция открывается как BEGIN IMMEDIATE).
+   """
+
+   def __init__(self, app, session, max_batch=64, max_delay=0.002):
+      self.app = app
+      self.session = session
+      self.max_batch = max_batch
+      self.max_delay = max_delay
+      self._queue = queue.SimpleQueue()
+      self._lock = threading.Lock()
+      self._thread = None
+
+   def submit(self, job, *args) -> Future:
+      with self._lock:
+         if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+      future = Future()
+      self._queue.put((future, job, args))
+      return future
+
+   def _collect(self) -> list:
+      batch = [self._queue.get()]
+      deadline = time.monotonic() + self.max_delay
+      while len(batch) < self.max_batch:
+         timeout = deadline - time.monotonic()
+         try:
+            batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+         except queue.Empty:
+            break
+      return batch
+
+   def _run(self):
+      with self.app.app_context():
+         g.group_commit_writer = True
+         while True:
+            batch = self._collect()
+            try:
+               self._execute(batch)
+            except Exception:
+               logger.exception("Group commit failed")
+            finally:
+               self.session.remove()
+
+   def _execute(self, batch):
+      batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+      try:
+         # Оптимистично: все задания, один flush (один INSERT на таблицу) и один commit
+         finishers = [job(*args) for _, job, args in batch]
+         self.session.flush()
+         results = [(future, finish()) for (future, _, _), finish in zip(batch, finishers)]
+      except Exception:
+         self.session.rollback()
+         results = self._execute_isolated(batch)
+      try:
+         self.session.commit()
+      except Exception as e:
+         self.session.rollback()
+         for future, _ in results:
+            future.set_exception(e)
+         raise
+      for future, result in results:
+         future.set_result(result)
+
+   def _execute_isolated(self, batch) -> list:
+      """Пакет с ошибкой: каждое задание в своем SAVEPOINT, ошибка - только в его Future."""
+      results = []
+      for future, job, args in batch:
+         savepoint = self.session.begin_nested()
+         try:
+            finish = job(*args)
+            self.session.flush()
+            result = finish()
+            savepoint.commit()
+         except Exception as e:
+            savepoint.rollback()
+            future.set_exception(e)
+            continue
+         results.append((future, result))
+      return results
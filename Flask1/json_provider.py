@@ -0,0 +1,91 @@
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+   import orjson
+except ImportError:  # необязательная зависимость (requirements-fast.txt)
+   orjson = None
+
+COMPACT = (",", ":")
+
+# Числа с плавающей точкой вне строк JSON; строки пропускаются целиком, чтобы не трогать "1e5" в тексте.
+# orjson и json.dumps пишут по-разному только экспоненту (1e16 и 1e+16) и числа меньше 1e-4
+# (0.00001 и 1e-05), поэтому замена выполняется, только если такие записи встречаются в выводе.
+_FLOAT = re.compile(rb'"(?:[^"\\]|\\.)*"|(?<![\d.-])(-?\d+(?:\.\d+)?e-?\d+|-?0\.0000\d*)')
+_EXPONENT = re.compile(rb"e-?[0-9]")
+# Последовательности backslashreplace, перед которыми четное число обратных косых черт
+_LATIN1 = re.compile(rb"(?<!\\)((?:\\\\)*)\\x")
+_ASTRAL = re.compile(rb"(?<!\\)((?:\\\\)*)\\U([0-9a-f]{8})")
+
+
+def _python_float(match):
+   token = match.group(1)
+   if token is None:
+      return match.group()
+   return repr(float(token)).encode()
+
+
+def _surrogates(match):
+   code = int(match.group(2), 16) - 0x10000
+   return match.group(1) + b"\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+
+
+def _ascii(data: bytes) -> bytes:
+   """\\uXXXX вместо не-ASCII символов и DEL, как у json.dumps(ensure_ascii=True).
+
+   backslashreplace работает в C; остается привести \\xXX к \\u00XX и \\UXXXXXXXX
+   к суррогатной паре. DEL (0x7f) в выводе orjson встречается только внутри строк.
+   """
+   # Проверки по ведущим байтам UTF-8 исходного вывода: U+0080..U+00FF и U+10000 и выше
+   latin1 = b"\xc2" in data or b"\xc3" in data
+   astral = any(lead in data for lead in (b"\xf0", b"\xf1", b"\xf2", b"\xf3", b"\xf4"))
+   data = data.decode().encode("ascii", "backslashreplace")
+   if latin1:
+      data = _LATIN1.sub(rb"\1\\u00", data)
+   if astral:
+      data = _ASTRAL.sub(_surrogates, data)
+   if b"\x7f" in data:
+      data = data.replace(b"\x7f", b"\\u007f")
+   return data
+
+
+class OrjsonProvider(DefaultJSONProvider):
+   """JSON-провайдер на orjson с тем же выводом, что у DefaultJSONProvider.
+
+   Компактный вывод (jsonify вне debug, потоковый NDJSON) кодирует orjson, затем
+   результат приводится к байтам json.dumps: числа с плавающей точкой в форме repr(),
+   а при ensure_ascii - \\uXXXX для DEL и не-ASCII символов.
+   Остальные вызовы (indent, другие аргументы) и то, что orjson не умеет
+   (целые больше 64 бит, строки с одиночными суррогатами), уходят в json.dumps.
+   Отличие одно: Infinity и NaN orjson кодирует как null.
+   """
+
+   def _encode(self, obj):
+      option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+      if self.sort_keys:
+         option |= orjson.OPT_SORT_KEYS
+      try:
+         data = orjson.dumps(obj, default=self.default, option=option)
+      except orjson.JSONEncodeError:
+         return None
+      if _EXPONENT.search(data) or b"0.0000" in data:
+         data = _FLOAT.sub(_python_float, data)
+      if self.ensure_ascii and (not data.isascii() or b"\x7f" in data):
+         data = _ascii(data)
+      return data
+
+   def dumps(self, obj, **kwargs):
+      if kwargs == {"separators": COMPACT}:
+         data = self._encode(obj)
+         if data is not None:
+            return data.decode()
+      return super().dumps(obj, **kwargs)
+
+   def response(self, *args, **kwargs):
+      if self.compact is False or (self.compact is None and self._app.debug):
+         return super().response(*args, **kwargs)
+      data = self._encode(self._prepare_response_obj(args, kwargs))
+      if data is None:
+         return super().response(*args, **kwargs)
+      return self._app.response_class(data + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,102 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+
+# Границы корзин гистограммы задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def instrument_engine(engine, on_statement):
+   """Замерять каждый SQL-запрос engine и передавать результат в on_statement.
+
+   on_statement(cursor, statement, parameters, executemany, elapsed) вызывается после
+   выполнения запроса; elapsed - секунды от before_cursor_execute до after_cursor_execute.
+   """
+   @event.listens_for(engine, "before_cursor_execute")
+   def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+      conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+   @event.listens_for(engine, "after_cursor_execute")
+   def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+      elapsed = time.perf_counter() - conn.info["query_started"].pop()
+      on_statement(cursor, statement, parameters, executemany, elapsed)
+
+
+class _Histogram:
+   __slots__ = ("counts", "sum")
+
+   def __init__(self, size):
+      self.counts = [0] * size
+      self.sum = 0.0
+
+
+def _labels(**labels) -> str:
+   escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+   return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class RequestMetrics:
+   """Метрики HTTP-запросов по маршрутам в текстовом формате Prometheus.
+
+   Маршрут - шаблон правила URL (/quotes/<int:quote_id>), а не сам путь, поэтому
+   число рядов ограничено числом маршрутов. Потокобезопасен.
+   """
+
+   def __init__(self, buckets=DEFAULT_BUCKETS, prefix="quotes"):
+      self.buckets = tuple(sorted(buckets))
+      self.prefix = prefix
+      self._lock = threading.Lock()
+      self._requests = {}   # (method, route, status) -> количество
+      self._latency = {}    # (method, route) -> _Histogram
+      self._db = {}         # (method, route) -> [запросов SQL, секунд в БД, байт ответа]
+
+   def observe(self, method, route, status, duration, statements=0, db_time=0.0, response_size=0):
+      key = (method, route)
+      with self._lock:
+         self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+         histogram = self._latency.get(key)
+         if histogram is None:
+            histogram = self._latency[key] = _Histogram(len(self.buckets) + 1)
+         histogram.counts[bisect.bisect_left(self.buckets, duration)] += 1
+         histogram.sum += duration
+         totals = self._db.setdefault(key, [0, 0.0, 0])
+         totals[0] += statements
+         totals[1] += db_time
+         totals[2] += response_size
+
+   def render(self) -> str:
+      p = self.prefix
+      lines = [
+         f"# HELP {p}_http_requests_total HTTP requests by route and status.",
+         f"# TYPE {p}_http_requests_total counter",
+      ]
+      with self._lock:
+         for (method, route, status), count in sorted(self._requests.items()):
+            lines.append(f"{p}_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+         lines += [
+            f"# HELP {p}_http_request_duration_seconds HTTP request latency by route.",
+            f"# TYPE {p}_http_request_duration_seconds histogram",
+         ]
+         for (method, route), histogram in sorted(self._latency.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram.counts):
+               cumulative += count
+               labels = _labels(method=method, route=route, le=bound)
+               lines.append(f"{p}_http_request_duration_seconds_bucket{labels} {cumulative}")
+            labels = _labels(method=method, route=route)
+            lines.append(f"{p}_http_request_duration_seconds_sum{labels} {histogram.sum}")
+            lines.append(f"{p}_http_request_duration_seconds_count{labels} {cumulative}")
+
+         totals = sorted(self._db.items())
+         for index, (name, help_text) in enumerate([
+            ("db_statements_total", "SQL statements executed by route."),
+            ("db_duration_seconds_total", "Time spent in SQL statements by route."),
+            ("http_response_size_bytes_total", "Response body bytes by route (streamed bodies are not counted)."),
+         ]):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} counter"]
+            for (method, route), values in totals:
+               lines.append(f"{p}_{name}{_labels(method=method, route=route)} {values[index]}")
+      return "\n".join(lines) + "\n"
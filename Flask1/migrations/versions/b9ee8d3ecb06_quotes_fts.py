@@ -0,0 +1,50 @@
+"""quotes full-text search
+
+Revision ID: b9ee8d3ecb06
+Revises: 554f93656d25
+Create Date: 2024-03-11 19:03:52.117640
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9ee8d3ecb06'
+down_revision = '554f93656d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5-индекс по quotes.text с внешним содержимым: сам текст хранится только в quotes,
+    # индекс синхронизируется триггерами в той же транзакции.
+    op.execute("""
+    CREATE VIRTUAL TABLE quotes_fts USING fts5(
+        text, content='quotes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    op.execute("""
+    CREATE TRIGGER quotes_fts_ai AFTER INSERT ON quotes BEGIN
+        INSERT INTO quotes_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    END
+    """)
+    op.execute("""
+    CREATE TRIGGER quotes_fts_ad AFTER DELETE ON quotes BEGIN
+        INSERT INTO quotes_fts (quotes_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+    END
+    """)
+    op.execute("""
+    CREATE TRIGGER quotes_fts_au AFTER UPDATE OF text ON quotes BEGIN
+        INSERT INTO quotes_fts (quotes_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+        INSERT INTO quotes_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    END
+    """)
+    op.execute("INSERT INTO quotes_fts (quotes_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS quotes_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS quotes_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS quotes_fts_ai")
+    op.execute("DROP TABLE IF EXISTS quotes_fts")
@@ -0,0 +1,174 @@
+"""Модели и объект db без привязки к приложению: импорт не создает приложение,
+engine и соединения. Приложение подключается в app.create_app() через db.init_app()."""
+from flask import current_app, g, request, has_request_context, has_app_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+
+def is_read_request() -> bool:
+   return has_request_context() and request.method in ("GET", "HEAD")
+
+
+def is_write_request() -> bool:
+   """Открывать ли транзакцию как BEGIN IMMEDIATE: пишущий запрос или поток группового commit."""
+   if not current_app.config['SQLITE_BEGIN_IMMEDIATE']:
+      return False
+   if has_request_context():
+      return not is_read_request()
+   return has_app_context() and g.get("group_commit_writer", False)
+
+
+class RoutingSession(Session):
+   """Сессия, которая в GET-запросах читает через реплику (см. choose_read_bind)
+   или через bind "readonly", если они настроены."""
+
+   def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+      if bind is None and not self._flushing and is_read_request():
+         engines = db.engines
+         if g.get("read_replica"):
+            return engines["replica"]
+         if "readonly" in engines:
+            return engines["readonly"]
+      return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+class AuthorModel(db.Model):
+   __tablename__ = "authors"
+   id = db.Column(db.Integer, primary_key=True)
+   name = db.Column(db.String(302), unique=True, nullable=False)
+   quotes = db.relationship('QuoteModel', backref='author', lazy='dynamic', cascade="all, delete-orphan")
+
+   def __init__(self, name):
+       self.name = name
+
+   def __repr__(self):
+      return f"Author({self.name})"
+   
+   def to_dict(self):
+      return {
+         "id": self.id,
+         "name": self.name
+      }
+
+class QuoteModel(db.Model):
+   __tablename__ = "quotes"
+   __table_args__ = (db.Index("ix_quotes_author_id_rating", "author_id", "rating"),)
+   id = db.Column(db.Integer, primary_key=True)
+   author_id = db.Column(db.Integer, db.ForeignKey(AuthorModel.id), nullable=False, index=True)
+   # Индекс - для ?text__prefix= в /quotes/filter (диапазонный поиск)
+   text = db.Column(db.String(255), unique=False, nullable=False, index=True)
+   rating = db.Column(db.Integer, unique=False, nullable=False, default=1, server_default="1", index=True)
+
+   def __init__(self, author: AuthorModel, text, rating):
+       self.author_id = author.id
+       self.text  = text
+       self.rating = rating
+      
+   # author_id, а не self.author: repr не должен загружать автора отдельным запросом
+   def __repr__(self):
+      return f"Quote(author_id={self.author_id}, {self.text}, {self.rating})"
+
+   def to_dict(self, expand=()):
+      data = {
+         "id": self.id,
+         "author_id": self.author_id,
+         "text": self.text,
+         "rating": self.rating
+      }
+      if "author" in expand:
+         data["author"] = self.author.to_dict()
+      return data
+
+class QuoteCounterModel(db.Model):
+   """Количество цитат по авторам; author_id = 0 - общее количество.
+
+   Поддерживается триггерами БД (миграция 54876f8705db), пересчитывается командой
+   flask quotes reconcile-counters.
+   """
+   __tablename__ = "quote_counters"
+   TOTAL = 0
+   author_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+   @classmethod
+   def get_count(cls, author_id=TOTAL) -> int:
+      counter = db.session.get(cls, author_id)
+      return counter.count if counter else 0
+
+
+class RatingStatsModel(db.Model):
+   """Количество цитат по (автор, оценка); author_id = 0 - по всем авторам.
+
+   Поддерживается триггерами БД (миграция a9c8ddbecc11), пересчитывается командой
+   flask quotes rebuild-stats. Строки с count = 0 после удалений остаются.
+   """
+   __tablename__ = "rating_stats"
+   TOTAL = 0
+   author_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   rating = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+   @classmethod
+   def summary(cls, author_id=TOTAL, session=None) -> dict:
+      """count, avg_rating и гистограмма оценок (1-5 всегда присутствуют) по не более чем 5 строкам.
+      session - сессия запроса вместо db.session (asgi_app.py, через run_sync)."""
+      rows = (session or db.session).execute(db.select(cls.rating, cls.count).where(cls.author_id == author_id, cls.count > 0)).all()
+      histogram = dict.fromkeys(range(1, 6), 0)
+      histogram.update(rows)
+      count = sum(histogram.values())
+      avg_rating = round(sum(rating * n for rating, n in histogram.items()) / count, 2) if count else None
+      return {"count": count, "avg_rating": avg_rating, "histogram": {str(rating): n for rating, n in sorted(histogram.items())}}
+
+
+class ChangeModel(db.Model):
+   """Журнал вставок, изменений и удалений quotes и authors для GET /changes.
+
+   Пишется триггерами БД (миграция c9841d708291) в той же транзакции, что и изменение,
+   поэтому учитываются все пути записи. Данные строки в журнале не хранятся: /changes
+   отдает текущее состояние строки. Очищается командой flask quotes compact-changes.
+   """
+   __tablename__ = "changes"
+   __table_args__ = (db.Index("ix_changes_table_name_row_id", "table_name", "row_id"), {"sqlite_autoincrement": True})
+   seq = db.Column(db.Integer, primary_key=True)
+   table_name = db.Column(db.String(16), nullable=False)
+   row_id = db.Column(db.Integer, nullable=False)
+   op = db.Column(db.String(8), nullable=False)
+   changed_at = db.Column(db.Integer, nullable=False, server_default=text("(CAST(strftime('%s', 'now') AS INTEGER))"))
+
+
+class ChangeLogStateModel(db.Model):
+   """horizon - наибольший seq удаленной по сроку хранения записи об удалении.
+   Клиент с 0 < since < horizon мог пропустить удаление и должен перечитать журнал с since=0."""
+   __tablename__ = "change_log_state"
+   id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   horizon = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+   @classmethod
+   def get_horizon(cls) -> int:
+      state = db.session.get(cls, 1)
+      return state.horizon if state else 0
+
+
+class TableVersionModel(db.Model):
+   """Версия и время последнего изменения (с долями секунды) таблиц authors и quotes
+   для ETag и Last-Modified; обновляются триггерами БД (миграция 64d8be3080b0)."""
+   __tablename__ = "table_versions"
+   name = db.Column(db.String(16), primary_key=True)
+   version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+   modified_at = db.Column(db.Float, nullable=False)
+
+
+class QuoteSlotModel(db.Model):
+   """Плотная нумерация цитат 1..count в корзинах (author_id, rating); author_id = 0 -
+   все авторы. count корзины - RatingStatsModel. Поддерживается триггерами БД
+   (миграция 647c3a9fab9b): при удалении на место цитаты переносится последняя."""
+   __tablename__ = "quote_slots"
+   __table_args__ = (db.Index("ix_quote_slots_quote_id", "quote_id"), {"sqlite_with_rowid": False})
+   author_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   rating = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+   quote_id = db.Column(db.Integer, nullable=False)
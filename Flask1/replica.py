@@ -0,0 +1,114 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+   import fcntl
+except ImportError:  # Windows: блокировки нет, каждый процесс обновляет реплику сам
+   fcntl = None
+
+from cache import DataVersionWatcher
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteReplica:
+   """Копия файла SQLite для чтения, обновляемая через online backup API.
+
+   refresh() копирует основную БД во временный файл рядом с репликой и атомарно
+   подменяет им реплику (os.replace). Открытые соединения дочитывают старый файл,
+   новые открывают уже новый. Время модификации файла реплики - момент, на который
+   снят снимок, поэтому его видят все процессы, читающие реплику.
+
+   Копия переводится в journal_mode=DELETE: файлы -wal/-shm старой реплики не
+   должны примениться к новой.
+
+   run() обновляет реплику, только пока держит блокировку файла {path}.lock: из
+   нескольких процессов сервера (и flask quotes refresh-replica) копирует один,
+   остальные ждут и подхватывают обновление, если он завершится.
+   """
+
+   def __init__(self, primary, path, interval=1.0, on_swap=None):
+      self.primary = str(primary)
+      self.path = str(path)
+      self.interval = interval
+      self.on_swap = on_swap
+      self._lock = threading.Lock()
+      self._seen = None
+      self._thread = None
+
+   def synced_at(self) -> float:
+      """Момент снимка (time.time()), 0.0 - реплики еще нет."""
+      try:
+         return os.stat(self.path).st_mtime
+      except FileNotFoundError:
+         return 0.0
+
+   def poll(self) -> float:
+      """synced_at(); при смене файла реплики вызывает on_swap() (один раз на снимок)."""
+      synced_at = self.synced_at()
+      if synced_at != self._seen:
+         with self._lock:
+            if synced_at != self._seen:
+               if self._seen is not None and self.on_swap is not None:
+                  self.on_swap()
+               self._seen = synced_at
+      return synced_at
+
+   def refresh(self) -> float:
+      tmp = f"{self.path}.tmp-{os.getpid()}"
+      started = time.time()
+      source = sqlite3.connect(f"file:{self.primary}?mode=ro", uri=True)
+      target = sqlite3.connect(tmp)
+      try:
+         # Один шаг backup() читает согласованный снимок основной БД
+         source.backup(target)
+         target.execute("PRAGMA journal_mode = DELETE")
+      finally:
+         target.close()
+         source.close()
+      os.utime(tmp, (started, started))
+      os.replace(tmp, self.path)
+      return started
+
+   def try_lead(self, lock_file) -> bool:
+      """Взять блокировку обновления без ожидания; освобождается при закрытии lock_file."""
+      if fcntl is None:
+         return True
+      try:
+         fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except BlockingIOError:
+         return False
+      return True
+
+   def run(self, stop=None):
+      """Обновлять реплику после каждой записи в основную БД, не чаще раза в interval с,
+      пока этот процесс - ведущий (try_lead)."""
+      watcher = DataVersionWatcher(self.primary)
+      stop = stop or threading.Event()
+      leader = pending = False
+      with open(f"{self.path}.lock", "a") as lock_file:
+         while not stop.is_set():
+            started = time.monotonic()
+            if not leader and self.try_lead(lock_file):
+               # Первый снимок ведущего - всегда: реплика могла остаться от прошлого запуска
+               # или предыдущий ведущий не успел снять последние записи
+               leader = pending = True
+            if leader:
+               pending = watcher.changed() or pending
+               try:
+                  if pending:
+                     self.refresh()
+                     pending = False
+               except sqlite3.Error:
+                  logger.exception("Replica refresh failed")
+            stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+   def start(self):
+      """Запустить run() в фоновом потоке (один раз)."""
+      with self._lock:
+         if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="sqlite-replica", daemon=True)
+            self._thread.start()
@@ -0,0 +1,39 @@
+from sqlalchemy import event
+
+# Профиль файловой SQLite под конкурентной нагрузкой
+DEFAULT_PRAGMAS = {
+   "journal_mode": "WAL",     # читатели не блокируют писателя и наоборот
+   "synchronous": "NORMAL",   # в WAL целостность сохраняется, fsync только на checkpoint
+   "busy_timeout": 5000,      # мс ожидания блокировки вместо немедленного "database is locked"
+   "cache_size": -65536,      # 64 МиБ кэша страниц на соединение
+   "mmap_size": 268435456,    # 256 МиБ memory-mapped I/O
+   "temp_store": "MEMORY",
+}
+
+# journal_mode меняет файл БД и не применяется к read-only соединениям
+READ_ONLY_SKIP = {"journal_mode"}
+
+
+def configure_sqlite_engine(engine, pragmas: dict, begin_immediate=None, readonly=False):
+   """Применять pragmas к каждому новому соединению engine.
+
+   Если begin_immediate() возвращает True, транзакция открывается как BEGIN IMMEDIATE:
+   пишущий запрос берет блокировку записи сразу и ждет ее busy_timeout, а не получает
+   "database is locked" при попытке повысить блокировку. Остальные транзакции
+   открывает драйвер sqlite3 как обычно (BEGIN перед первым изменением данных).
+   """
+   @event.listens_for(engine, "connect")
+   def on_connect(dbapi_connection, connection_record):
+      cursor = dbapi_connection.cursor()
+      for name, value in pragmas.items():
+         if readonly and name in READ_ONLY_SKIP:
+            continue
+         cursor.execute(f"PRAGMA {name} = {value}")
+      if readonly:
+         cursor.execute("PRAGMA query_only = ON")
+      cursor.close()
+
+   @event.listens_for(engine, "begin")
+   def on_begin(conn):
+      if not readonly and begin_immediate is not None and begin_immediate():
+         conn.exec_driver_sql("BEGIN IMMEDIATE")
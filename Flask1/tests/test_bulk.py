@@ -0,0 +1,52 @@
+"""Пакетная загрузка цитат: результат по каждому элементу, ошибка элемента не срывает пакет."""
+import json
+
+
+def test_bulk_mixed_items(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   items = [
+      {"author_id": author_id, "text": "good", "rating": 5},
+      {"author_id": author_id, "text": ["x"]},
+      {"author_id": author_id, "text": 5},
+      {"author_id": True, "text": "bool author"},
+      {"author_id": 999999, "text": "no author"},
+      {"text": "no author_id"},
+      {"author_id": author_id, "text": "rating true", "rating": True},
+      {"author_id": author_id, "bogus": 1},
+      "not an object",
+   ]
+   response = client.post("/quotes/bulk", json=items)
+   assert response.status_code == 200
+   body = response.get_json()
+   assert [result["status"] for result in body["results"]] == [201, 400, 400, 400, 400, 400, 201, 400, 400]
+   assert (body["inserted"], body["failed"]) == (2, 7)
+   assert body["results"][0]["quote"] == {"id": 1, "author_id": author_id, "text": "good", "rating": 5}
+   assert body["results"][6]["quote"]["rating"] == 1
+   assert client.get("/quotes/count").get_json() == {"count": 2}
+   for result in body["results"]:
+      if result["status"] == 201:
+         assert client.get(f"/quotes/{result['quote']['id']}").get_json() == result["quote"]
+
+
+def test_bulk_by_author_ndjson(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   lines = [json.dumps({"text": "one"}), "not json", json.dumps({"text": {"a": 1}}), "", json.dumps({"text": "two", "rating": 2})]
+   response = client.post(f"/authors/{author_id}/quotes/bulk", data="\n".join(lines) + "\n",
+                          content_type="application/x-ndjson")
+   body = response.get_json()
+   assert [result["status"] for result in body["results"]] == [201, 400, 400, 201]
+   assert [result["quote"]["text"] for result in body["results"] if result["status"] == 201] == ["one", "two"]
+   assert client.get(f"/authors/{author_id}/quotes/count").get_json() == {"count": 2}
+
+
+def test_bulk_ids_match_items(app, client):
+   app.config['QUOTES_BULK_CHUNK_SIZE'] = 4
+   first = client.post("/authors", json={"name": "First"}).get_json()["id"]
+   second = client.post("/authors", json={"name": "Second"}).get_json()["id"]
+   # Одинаковые элементы вперемешку с разными, пачки по 4 строки
+   items = [{"author_id": [first, second][i % 2], "text": f"q{i % 3}", "rating": i % 2 + 1} for i in range(10)]
+   body = client.post("/quotes/bulk", json=items).get_json()
+   ids = [result["quote"]["id"] for result in body["results"]]
+   assert len(set(ids)) == 10
+   for item, quote_id in zip(items, ids):
+      assert client.get(f"/quotes/{quote_id}").get_json() == dict(item, id=quote_id)
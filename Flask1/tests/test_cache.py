@@ -0,0 +1,40 @@
+"""Кэш сущностей: значение, прочитанное до записи, не возвращается в кэш после ее инвалидации."""
+import threading
+
+from app import get_cached_entity, entity_cache
+from cache import TTLCache, MISSING
+from models import db, QuoteModel
+
+
+def test_set_skipped_after_invalidation():
+   cache = TTLCache()
+   generation = cache.generation
+   cache.pop("key")
+   assert not cache.set("key", "stale", generation)
+   assert cache.get("key") is MISSING
+   assert cache.set("key", "fresh", cache.generation)
+   assert cache.get("key") == "fresh"
+
+
+def test_stale_read_not_cached(app, client, monkeypatch):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   quote_id = client.post(f"/authors/{author_id}/quotes", json={"text": "old"}).get_json()["id"]
+   with app.test_request_context(f"/quotes/{quote_id}"):
+      session_get = db.session.get
+      statuses = []
+      def get_then_write(model, entity_id):
+         # Запись и инвалидация кэша - между чтением старой версии и заполнением кэша
+         # (в другом потоке - со своим контекстом приложения и сессией; PUT тоже читает
+         # цитату через db.session.get, ему - исходный метод)
+         monkeypatch.setattr(db.session, "get", session_get)
+         entity = session_get(model, entity_id)
+         writer = threading.Thread(target=lambda: statuses.append(
+            client.put(f"/quotes/{quote_id}", json={"text": "new"}).status_code))
+         writer.start()
+         writer.join()
+         return entity
+      monkeypatch.setattr(db.session, "get", get_then_write)
+      assert get_cached_entity(QuoteModel, quote_id)["text"] == "old"
+      assert statuses == [200]
+      assert entity_cache.get(("quotes", quote_id)) is MISSING
+   assert client.get(f"/quotes/{quote_id}").get_json()["text"] == "new"
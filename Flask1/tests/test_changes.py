@@ -0,0 +1,154 @@
+"""Журнал изменений /changes: снимок с since=0, flask quotes compact-changes, горизонт и long-poll."""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def changes_app(database):
+   # Ожидающий запрос перепроверяет БД раз в 30 с: быстрый ответ - только по сигналу commit
+   return create_app({"QUOTES_DATABASE": database, "SERVER_TIMING": False, "CHANGES_POLL_INTERVAL": 30})
+
+
+def replay(client, since=0):
+   """Применить журнал после since как upsert/delete по id; (authors, quotes, last_seq)."""
+   tables = {"authors": {}, "quotes": {}}
+   while True:
+      body = client.get(f"/changes?since={since}&limit=3").get_json()
+      for change in body["changes"]:
+         rows = tables[change["table"]]
+         if change["data"] is None:
+            rows.pop(change["id"], None)
+         else:
+            rows[change["id"]] = change["data"]
+      since = body["last_seq"]
+      if not body["more"]:
+         return tables["authors"], tables["quotes"], since
+
+
+def current_state(client):
+   authors = {author["id"]: author for author in client.get("/authors").get_json()}
+   quotes = {quote["id"]: quote for quote in client.get("/quotes?limit=100").get_json()}
+   return authors, quotes
+
+
+@pytest.fixture
+def history(changes_app):
+   """Вставки, изменения и удаления: у большинства строк в журнале несколько записей."""
+   client = changes_app.test_client()
+   authors = [client.post("/authors", json={"name": f"Author {i}"}).get_json()["id"] for i in range(3)]
+   quotes = [client.post(f"/authors/{authors[i % 3]}/quotes", json={"text": f"quote {i}"}).get_json()["id"]
+             for i in range(9)]
+   for quote_id in quotes[:6]:
+      client.put(f"/quotes/{quote_id}", json={"rating": 5})
+   client.delete(f"/quotes/{quotes[0]}")
+   client.delete(f"/authors/{authors[2]}")
+   client.put(f"/authors/{authors[1]}", json={"name": "Renamed"})
+   return client
+
+
+def compact(app, *args):
+   result = app.test_cli_runner().invoke(args=["quotes", "compact-changes", *args])
+   assert result.exit_code == 0, result.output
+   return result.output
+
+
+def log_rows(database):
+   conn = sqlite3.connect(database)
+   rows = conn.execute("SELECT table_name, row_id, op FROM changes ORDER BY seq").fetchall()
+   conn.close()
+   return rows
+
+
+def test_snapshot_survives_compaction(changes_app, database, history):
+   authors, quotes, last_seq = replay(history)
+   assert (authors, quotes) == current_state(history)
+
+   before = log_rows(database)
+   compact(changes_app)
+   after = log_rows(database)
+   # От каждой строки осталась только последняя запись
+   assert len(after) < len(before)
+   assert len({(table, row_id) for table, row_id, _ in after}) == len(after)
+   assert after == [row for index, row in enumerate(before) if row[:2] not in {other[:2] for other in before[index + 1:]}]
+
+   authors, quotes, compacted_seq = replay(history)
+   assert (authors, quotes) == current_state(history)
+   assert compacted_seq == last_seq
+   # Клиент, читавший журнал до очистки, продолжает с того же seq
+   history.post("/authors", json={"name": "After compaction"})
+   body = history.get(f"/changes?since={last_seq}").get_json()
+   assert [(change["table"], change["op"]) for change in body["changes"]] == [("authors", "insert")]
+
+
+def test_horizon(changes_app, database, history):
+   _, _, last_seq = replay(history)
+   conn = sqlite3.connect(database)
+   deletes = [seq for seq, in conn.execute("SELECT seq FROM changes WHERE op = 'delete' ORDER BY seq")]
+   # Записи об удалениях старше срока хранения
+   conn.execute("UPDATE changes SET changed_at = changed_at - 10 * 86400 WHERE op = 'delete'")
+   conn.commit()
+   conn.close()
+   assert deletes
+
+   output = compact(changes_app, "--retention-days", "7")
+   assert f"horizon {deletes[-1]}" in output
+   assert all(op != "delete" for _, _, op in log_rows(database))
+
+   # Клиент с since ниже горизонта мог пропустить удаление
+   response = history.get(f"/changes?since={deletes[-1] - 1}")
+   assert response.status_code == 410
+   assert "since=0" in response.get_json()["message"]
+   assert history.get(f"/changes?since={deletes[-1]}").status_code == 200
+   assert history.get(f"/changes?since={last_seq}").get_json()["changes"] == []
+
+   # since=0 - полный снимок и ниже горизонта: удаленных строк в нем просто нет.
+   # Первая страница доходит до горизонта, иначе следующая получила бы 410
+   assert history.get("/changes?since=0&limit=3").get_json()["last_seq"] >= deletes[-1]
+   authors, quotes, _ = replay(history)
+   assert (authors, quotes) == current_state(history)
+
+   # Горизонт выше всех оставшихся записей: снимок все равно продолжается без 410
+   for author_id in authors:
+      history.delete(f"/authors/{author_id}")
+   conn = sqlite3.connect(database)
+   conn.execute("UPDATE changes SET changed_at = changed_at - 10 * 86400 WHERE op = 'delete'")
+   conn.commit()
+   conn.close()
+   compact(changes_app, "--retention-days", "7")
+   body = history.get("/changes?since=0&limit=1").get_json()
+   assert body == {"changes": [], "last_seq": body["last_seq"], "more": False}
+   assert history.get(f"/changes?since={body['last_seq']}").status_code == 200
+
+
+def test_long_poll_wakes_on_commit(changes_app):
+   client = changes_app.test_client()
+   last_seq = client.get("/changes?since=0").get_json()["last_seq"]
+   result = {}
+
+   def poll():
+      started = time.monotonic()
+      result["body"] = changes_app.test_client().get(f"/changes?since={last_seq}&wait=10").get_json()
+      result["elapsed"] = time.monotonic() - started
+
+   thread = threading.Thread(target=poll)
+   thread.start()
+   time.sleep(0.3)
+   client.post("/authors", json={"name": "Wakes the poller"})
+   thread.join(timeout=15)
+   assert not thread.is_alive()
+   assert [change["data"]["name"] for change in result["body"]["changes"]] == ["Wakes the poller"]
+   assert 0.3 <= result["elapsed"] < 5
+
+
+def test_long_poll_times_out(changes_app):
+   client = changes_app.test_client()
+   last_seq = client.get("/changes?since=0").get_json()["last_seq"]
+   started = time.monotonic()
+   body = client.get(f"/changes?since={last_seq}&wait=0.3").get_json()
+   assert 0.3 <= time.monotonic() - started < 5
+   assert body == {"changes": [], "last_seq": last_seq, "more": False}
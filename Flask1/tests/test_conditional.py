@@ -0,0 +1,31 @@
+"""Условные GET: ETag и Last-Modified из версий таблиц в БД."""
+import time
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+from app import create_app
+
+
+def test_etag_matches_across_workers(app, database):
+   other = create_app({"QUOTES_DATABASE": database}).test_client()
+   client = app.test_client()
+   etag = client.get("/quotes").headers["ETag"]
+   assert other.get("/quotes", headers={"If-None-Match": etag}).status_code == 304
+
+   author_id = other.post("/authors", json={"name": "Author"}).get_json()["id"]
+   other.post(f"/authors/{author_id}/quotes", json={"text": "new"})
+   assert client.get("/quotes", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since_same_second_is_not_304(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   client.post(f"/authors/{author_id}/quotes", json={"text": "new"})
+   now = format_datetime(datetime.fromtimestamp(int(time.time()), timezone.utc), usegmt=True)
+   assert client.get("/quotes", headers={"If-Modified-Since": now}).status_code == 200
+
+
+def test_not_modified_varies_on_accept_encoding(client):
+   etag = client.get("/quotes", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+   response = client.get("/quotes", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+   assert response.status_code == 304
+   assert "Accept-Encoding" in response.headers["Vary"]
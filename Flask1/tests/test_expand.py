@@ -0,0 +1,63 @@
+"""?expand=author: число SQL-запросов не зависит от числа цитат на странице."""
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from models import db
+
+EXPAND_URLS = [
+   "/quotes?limit=1000&expand=author",
+   "/quotes?expand=author&stream=1",
+   "/quotes/filter?rating__gte=1&expand=author",
+   "/quotes/search?q=quote&limit=1000&expand=author",
+   "/quotes/random?n=1000&expand=author",
+   "/authors/1/quotes?limit=1000&expand=author",
+]
+
+
+def seed(path, start, stop):
+   """Цитаты start..stop-1; у каждой (кроме цитат автора 1) свой автор - худший случай для N+1."""
+   conn = sqlite3.connect(path)
+   ids = range(start, stop)
+   conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i, f"Author {i}") for i in ids))
+   conn.executemany("INSERT INTO quotes (author_id, text, rating) VALUES (?, ?, ?)",
+                    ((1 if i % 2 else i, f"quote number {i}", i % 5 + 1) for i in ids))
+   conn.commit()
+   conn.close()
+
+
+def count_statements(app, url):
+   """(статус, тело, число SQL-запросов) для GET url; кэши прогреваются первым запросом."""
+   client = app.test_client()
+   client.get(url)
+   statements = []
+   def capture(conn, cursor, statement, parameters, context, executemany):
+      statements.append(statement)
+   with app.app_context():
+      engines = list(db.engines.values())
+   for engine in engines:
+      event.listen(engine, "before_cursor_execute", capture)
+   try:
+      response = client.get(url)
+      body = response.get_data(as_text=True)
+   finally:
+      for engine in engines:
+         event.remove(engine, "before_cursor_execute", capture)
+   return response.status_code, body, len(statements)
+
+
+@pytest.mark.parametrize("url", EXPAND_URLS)
+def test_expand_author_statement_count_is_constant(database, url):
+   counts = {}
+   seeded = 1
+   for quotes in (10, 200):
+      seed(database, seeded, quotes + 1)
+      seeded = quotes + 1
+      # Без кэша сущностей: каждый автор должен прийти из того же SELECT, а не из кэша
+      app = create_app({"QUOTES_DATABASE": database, "SERVER_TIMING": False, "ENTITY_CACHE_SIZE": 0})
+      status, body, counts[quotes] = count_statements(app, url)
+      assert status == 200, body
+      assert body.count('"author":{') >= min(quotes // 2, 5), body[:500]
+   assert counts[10] == counts[200], counts
@@ -0,0 +1,44 @@
+"""/quotes/filter: разбор ?limit=, prefix по индексу, contains ограничен limit."""
+import pytest
+from sqlalchemy import text
+
+from app import parse_quote_filter, quote_filter_statement
+from models import db
+
+
+@pytest.fixture
+def quotes(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   for i in range(12):
+      client.post(f"/authors/{author_id}/quotes", json={"text": f"{'alpha' if i % 2 else 'beta'} {i}", "rating": 3})
+   return author_id
+
+
+@pytest.mark.parametrize("limit", ["²", "abc", "0", "-1", ""])
+def test_bad_limit(client, quotes, limit):
+   response = client.get(f"/quotes/filter?rating=3&limit={limit}")
+   assert response.status_code == 400
+   assert response.get_json() == {"message": "limit must be a positive integer"}
+
+
+def test_bad_value(client, quotes):
+   assert client.get("/quotes/filter?rating=²").get_json() == {"message": "rating must be an integer"}
+
+
+def test_prefix_uses_index(app, client, quotes):
+   texts = [quote["text"] for quote in client.get("/quotes/filter?text__prefix=alpha").get_json()]
+   assert texts == [f"alpha {i}" for i in range(1, 12, 2)]
+   with app.app_context():
+      filters, sort, limited, params = parse_quote_filter({"text__prefix": "alpha"}, 100)
+      statement = quote_filter_statement(filters, sort, limited).params(params)
+      compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+      plan = " ".join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+   assert "ix_quotes_text" in plan
+
+
+def test_contains_is_capped(app, client, quotes):
+   app.config['QUOTES_MAX_PAGE_SIZE'] = 5
+   assert len(client.get("/quotes/filter?text__contains=a").get_json()) == 5
+   assert len(client.get("/quotes/filter?author__name__contains=Auth&limit=3").get_json()) == 3
+   # Фильтры по индексу без limit не ограничиваются
+   assert len(client.get("/quotes/filter?rating=3").get_json()) == 12
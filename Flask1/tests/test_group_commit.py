@@ -0,0 +1,115 @@
+"""Групповой commit: конкурентные записи в общих транзакциях, ошибка задания - только в его Future."""
+import threading
+
+import pytest
+from sqlalchemy import event, exc
+
+from app import create_app, state, create_author
+from models import db, AuthorModel, QuoteModel
+
+
+@pytest.fixture
+def group_app(database):
+   # Длинное окно сбора: одновременные запросы гарантированно попадают в общий пакет
+   return create_app({"QUOTES_DATABASE": database, "SERVER_TIMING": False, "ENTITY_CACHE_SIZE": 0,
+                      "GROUP_COMMIT": True, "GROUP_COMMIT_MAX_DELAY": 0.2})
+
+
+@pytest.fixture
+def batches(group_app, monkeypatch):
+   """Размеры пакетов и пакеты, выполненные по заданиям (SAVEPOINT)."""
+   with group_app.app_context():
+      writer = state().group_writer
+   sizes, isolated = [], []
+   execute, execute_isolated = writer._execute, writer._execute_isolated
+   monkeypatch.setattr(writer, "_execute", lambda batch: sizes.append(len(batch)) or execute(batch))
+   monkeypatch.setattr(writer, "_execute_isolated", lambda batch: isolated.append(len(batch)) or execute_isolated(batch))
+   return writer, sizes, isolated
+
+
+def counts(app):
+   with app.app_context():
+      return (db.session.scalar(db.select(db.func.count()).select_from(AuthorModel)),
+              db.session.scalar(db.select(db.func.count()).select_from(QuoteModel)))
+
+
+def test_concurrent_requests(group_app, batches):
+   _, sizes, isolated = batches
+   author_id = group_app.test_client().post("/authors", json={"name": "Author"}).get_json()["id"]
+   # 8 одинаковых имен, 4 цитаты, 4 цитаты с текстом, который драйвер не свяжет
+   requests = ([("/authors", {"name": "Duplicate"})] * 8
+               + [(f"/authors/{author_id}/quotes", {"text": f"quote {i}", "rating": 3}) for i in range(4)]
+               + [(f"/authors/{author_id}/quotes", {"text": ["not", "a", "string"]})] * 4)
+   barrier = threading.Barrier(len(requests))
+   responses = [None] * len(requests)
+
+   def post(index, url, body):
+      client = group_app.test_client()
+      barrier.wait()
+      response = client.post(url, json=body)
+      responses[index] = response.status_code, response.get_json()
+
+   threads = [threading.Thread(target=post, args=(index, *request)) for index, request in enumerate(requests)]
+   for thread in threads:
+      thread.start()
+   for thread in threads:
+      thread.join()
+
+   authors, quotes, unbindable = responses[:8], responses[8:12], responses[12:]
+   assert sorted(status for status, _ in authors) == [201] + [400] * 7
+   assert [body for status, body in authors if status == 400] == [{"message": "UNIQUE constraint failed"}] * 7
+   assert [status for status, _ in quotes] == [200] * 4
+   assert sorted(body["text"] for _, body in quotes) == [f"quote {i}" for i in range(4)]
+   assert unbindable == [(400, {"message": "text must be a string"})] * 4
+   assert counts(group_app) == (2, 4)
+   # Записи объединялись в пакеты, и пакет с ошибкой повторялся по заданиям
+   assert max(sizes) > 1
+   assert isolated
+
+
+def test_savepoint_isolation(group_app, batches):
+   writer, sizes, isolated = batches
+   with group_app.app_context():
+      writer.submit(create_author, "Existing").result()
+
+   def partial_then_duplicate():
+      # Первая строка вставлена, вторая нарушает UNIQUE: откатывается только SAVEPOINT задания
+      db.session.add(AuthorModel("Partial"))
+      db.session.add(AuthorModel("Existing"))
+      return lambda: None
+
+   with group_app.app_context():
+      futures = [writer.submit(create_author, "Before"), writer.submit(partial_then_duplicate),
+                 writer.submit(create_author, ["unbindable"]), writer.submit(create_author, "After")]
+      assert futures[0].result()["name"] == "Before"
+      with pytest.raises(exc.IntegrityError):
+         futures[1].result()
+      with pytest.raises(exc.ProgrammingError):
+         futures[2].result()
+      assert futures[3].result()["name"] == "After"
+      names = set(db.session.scalars(db.select(AuthorModel.name)))
+   assert names == {"Existing", "Before", "After"}
+   assert sizes[-1] == 4 and isolated == [4]
+
+
+def test_failed_commit_reaches_every_future(group_app, batches):
+   writer, sizes, _ = batches
+
+   def fail_commit(session):
+      raise RuntimeError("disk I/O error")
+
+   event.listen(db.session, "before_commit", fail_commit)
+   try:
+      with group_app.app_context():
+         futures = [writer.submit(create_author, f"Author {i}") for i in range(5)]
+         errors = [future.exception(timeout=5) for future in futures]
+   finally:
+      event.remove(db.session, "before_commit", fail_commit)
+   assert sizes == [5]
+   assert all(isinstance(error, RuntimeError) for error in errors)
+   assert counts(group_app) == (0, 0)
+
+   # Писатель пережил ошибку и продолжает работать
+   with group_app.app_context():
+      assert writer.submit(create_author, "Later").result(timeout=5)["name"] == "Later"
+   assert counts(group_app) == (1, 0)
@@ -0,0 +1,48 @@
+"""flask quotes import: CSV и JSONL."""
+import csv
+
+
+def test_import_jsonl_skips_malformed_lines(app, client, tmp_path):
+   path = tmp_path / "quotes.jsonl"
+   path.write_text('{"author": "A", "text": "one"}\n'
+                   '{"author": "A", "text": \n'
+                   '[1, 2]\n'
+                   '\n'
+                   '{"author": "B", "text": "two", "rating": 5}\n', encoding="utf-8")
+   result = app.test_cli_runner().invoke(args=["quotes", "import", str(path)])
+   assert result.exit_code == 0, result.output
+   assert "Line 2: invalid JSON" in result.output
+   assert "Line 3: expected a JSON object" in result.output
+   assert "2 rows imported, 2 skipped" in result.output
+   assert client.get("/quotes/count").get_json() == {"count": 2}
+
+
+def test_import_jsonl_skips_mistyped_fields(app, client, tmp_path):
+   path = tmp_path / "quotes.jsonl"
+   path.write_text('{"author": "A", "text": "one"}\n'
+                   '{"author": "A", "text": ["x"]}\n'
+                   '{"author": ["A"], "text": "list author"}\n'
+                   '{"author": 5, "text": "int author"}\n'
+                   '{"author": "", "text": "empty author"}\n'
+                   '{"author": "B", "text": "two"}\n', encoding="utf-8")
+   # Пачки по одной строке: ошибка в середине не должна оставить импорт наполовину
+   result = app.test_cli_runner().invoke(args=["quotes", "import", "--chunk-size", "1", str(path)])
+   assert result.exit_code == 0, result.output
+   assert "Line 2: text must be a non-empty string" in result.output
+   assert "Line 3: author must be a non-empty string" in result.output
+   assert "Line 4: author must be a non-empty string" in result.output
+   assert "2 rows imported, 4 skipped" in result.output
+   assert [quote["text"] for quote in client.get("/quotes").get_json()] == ["one", "two"]
+
+
+def test_import_csv_keeps_newlines_in_fields(app, client, tmp_path):
+   path = tmp_path / "quotes.csv"
+   with open(path, "w", encoding="utf-8", newline="") as file:
+      writer = csv.DictWriter(file, fieldnames=["author", "text", "rating"])
+      writer.writeheader()
+      writer.writerow({"author": "Пушкин", "text": "первая строка\r\nвторая строка", "rating": "4"})
+   result = app.test_cli_runner().invoke(args=["quotes", "import", str(path)])
+   assert result.exit_code == 0, result.output
+   [quote] = client.get("/quotes").get_json()
+   assert quote["text"] == "первая строка\r\nвторая строка"
+   assert quote["rating"] == 4
@@ -0,0 +1,45 @@
+"""Keyset-пагинация: курсор и ?limit= с неверными значениями - 400, а не 500 или страница по умолчанию."""
+import pytest
+
+from app import encode_cursor
+
+
+@pytest.fixture
+def author_id(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   for i in range(5):
+      client.post(f"/authors/{author_id}/quotes", json={"text": f"quote {i}"})
+   return author_id
+
+
+def test_pages(client, author_id):
+   seen, url = [], "/quotes?limit=2"
+   while url:
+      response = client.get(url)
+      seen += [quote["id"] for quote in response.get_json()]
+      cursor = response.headers.get("X-Next-Cursor")
+      url = cursor and f"/quotes?limit=2&after={cursor}"
+   assert seen == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("cursor", [
+   {"id": True}, {"id": 1.5}, {"id": "1"}, {"id": 2 ** 63}, {"id": None}, {},
+])
+def test_bad_cursor(client, author_id, cursor):
+   for url in ("/quotes", f"/authors/{author_id}/quotes"):
+      response = client.get(f"{url}?after={encode_cursor(cursor)}")
+      assert response.status_code == 400
+      assert response.get_json() == {"message": "Invalid cursor"}
+
+
+@pytest.mark.parametrize("cursor", [{"rank": True, "id": 1}, {"rank": -1.0, "id": False}, {"rank": 2 ** 64, "id": 1}])
+def test_bad_search_cursor(client, author_id, cursor):
+   assert client.get(f"/quotes/search?q=quote&after={encode_cursor(cursor)}").status_code == 400
+
+
+@pytest.mark.parametrize("limit", ["abc", "²", "1.5", "", "0", "-3"])
+def test_bad_limit(client, author_id, limit):
+   for url in ("/quotes", f"/authors/{author_id}/quotes", "/quotes/search?q=quote&"):
+      response = client.get(f"{url}{'' if url.endswith('&') else '?'}limit={limit}")
+      assert response.status_code == 400
+      assert response.get_json() == {"message": "limit must be a positive integer"}
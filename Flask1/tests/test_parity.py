@@ -0,0 +1,177 @@
+"""Совпадение ответов app.py и asgi_app.py на одной временной БД (зависимости requirements-async.txt)."""
+import asyncio
+import importlib
+import json
+import sys
+
+import pytest
+
+from app import encode_cursor
+
+pytest.importorskip("quart")
+pytest.importorskip("aiosqlite")
+
+# Шаги записи выполняются в каждом приложении над своими данными ({impl} - "flask"
+# или "asgi"), чтения - над общими: (метод, URL, тело)
+PARITY_WRITES = [
+   ("POST", "/authors", {"name": "Parity {impl}"}),
+   ("POST", "/authors", {"name": "Parity {impl}"}),
+   ("POST", "/authors/{author_id}/quotes", {"text": "parity quote one", "rating": 3}),
+   ("POST", "/authors/{author_id}/quotes", {"text": "parity quote two", "rating": 9}),
+   ("POST", "/authors/{author_id}/quotes", {"text": "parity quote three"}),
+   ("POST", "/authors/{author_id}/quotes", {"text": "parity <script>alert(1)</script> & more"}),
+   ("PUT", "/quotes/{quote_id}", {"text": "parity quote edited", "rating": 5}),
+   ("PUT", "/quotes/{quote_id}", {"text": {"not": "a string"}}),
+   ("PUT", "/authors/{author_id}", {"name": "Parity {impl} edited"}),
+   ("POST", "/authors", {"name": ["not a string"]}),
+   ("POST", "/authors/999999/quotes", {"text": "nobody"}),
+   ("POST", "/authors/{author_id}/quotes/bulk", [{"text": "parity bulk {impl}", "rating": 2}, {"text": ["bad"]}]),
+   ("POST", "/authors/999999/quotes/bulk", [{"text": "nobody"}]),
+   ("POST", "/quotes/bulk", [{"author_id": 999999, "text": "nobody"}, "not an object"]),
+   ("POST", "/quotes/bulk", {"not": "a list"}),
+   ("PUT", "/authors/by-name/Parity {impl} by name", None),
+   ("PUT", "/authors/by-name/Parity {impl} by name", None),
+   ("POST", "/authors/batch", ["Parity {impl} batch", {"name": "Parity {impl} batch"}, 5]),
+]
+PARITY_READS = [
+   "/authors",
+   "/authors/{author_id}",
+   "/authors/{author_id}/quotes",
+   "/authors/{author_id}/quotes?limit=1",
+   "/authors/{author_id}/quotes?limit=1&after={cursor}",
+   "/authors/{author_id}/quotes/count",
+   "/authors/999999",
+   "/quotes?limit=5",
+   "/quotes/{quote_id}",
+   "/quotes/999999",
+   "/quotes/count",
+   "/quotes/filter?author_id={author_id}",
+   "/quotes/filter?rating=5",
+   "/quotes/filter?rating=-1",
+   "/quotes/filter?rating__gte=3&sort=-rating&limit=2",
+   "/quotes/filter?author__name__contains=Parity&text__prefix=parity",
+   "/quotes/filter?id__in={quote_id},999999",
+   "/quotes/filter?bogus=1",
+   "/quotes/filter?rating=abc",
+   "/quotes/search?q=parity",
+   "/quotes/search?q=parity&limit=1",
+   "/quotes?limit=0",
+   "/quotes?after=broken",
+   "/quotes?limit=abc",
+   f"/quotes?after={encode_cursor({'id': True})}",
+   f"/quotes?after={encode_cursor({'id': 2 ** 64})}",
+   f"/quotes/search?q=parity&after={encode_cursor({'rank': True, 'id': 1})}",
+   "/stats/ratings",
+   "/authors/{author_id}/stats",
+   "/authors/999999/stats",
+   "/authors/top?by=count&n=5",
+   "/authors/top?by=avg_rating&min_count=2",
+   "/authors/top?by=bogus",
+   "/changes?since=0",
+   "/changes?since=0&limit=3",
+   "/changes?since=-1",
+]
+# Потоковые ответы (NDJSON) сравниваются построчно: (URL, заголовки)
+PARITY_STREAMS = [
+   ("/authors?stream=1", {}),
+   ("/quotes?stream=1", {}),
+   ("/authors/{author_id}/quotes", {"Accept": "application/x-ndjson"}),
+   ("/quotes/filter?rating__gte=1&sort=-rating&stream=1", {}),
+]
+# Есть только в синхронном приложении: asgi_app.py отвечает 501
+ASGI_NOT_IMPLEMENTED = ["/cache/stats", "/metrics"]
+# Случайные ответы сравниваются по статусу и набору ключей
+PARITY_RANDOM = ["/quotes/random", "/quotes/random?n=2&author_id={author_id}", "/quotes/random?author_id=999999"]
+PARITY_DELETES = ["/quotes/{quote_id}", "/quotes?author_id={author_id}&rating=1", "/authors/{author_id}"]
+
+
+def parity_shape(body):
+   if isinstance(body, list):
+      return [parity_shape(item) for item in body[:1]]
+   if isinstance(body, dict):
+      return sorted(body)
+   return type(body).__name__
+
+
+@pytest.fixture
+def asgi_app(database, monkeypatch):
+   """asgi_app.py читает настройки (default_config()) при импорте: импортируем заново на временной БД."""
+   monkeypatch.setenv("QUOTES_DATABASE", str(database))
+   sys.modules.pop("asgi_app", None)
+   module = importlib.import_module("asgi_app")
+   yield module
+   asyncio.run(module.engine.dispose())
+   sys.modules.pop("asgi_app", None)
+
+
+def test_flask_and_asgi_responses_match(database, asgi_app):
+   from app import create_app
+   # Без кэша сущностей: он не видит записи другого приложения
+   flask_client = create_app({"QUOTES_DATABASE": database, "ENTITY_CACHE_SIZE": 0}).test_client()
+   asgi_client = asgi_app.app.test_client()
+
+   async def asgi_call(method, url, body=None):
+      response = await asgi_client.open(url, method=method, json=body)
+      return response.status_code, await response.get_json(), response.headers.get("X-Next-Cursor")
+
+   def call(impl, method, url, body=None):
+      if impl == "asgi":
+         return asyncio.run(asgi_call(method, url, body))
+      response = flask_client.open(url, method=method, json=body)
+      return response.status_code, response.get_json(), response.headers.get("X-Next-Cursor")
+
+   async def asgi_stream(url, headers):
+      response = await asgi_client.get(url, headers=headers)
+      return response.status_code, response.mimetype, await response.get_data()
+
+   def stream(impl, url, headers):
+      if impl == "asgi":
+         status, mimetype, data = asyncio.run(asgi_stream(url, headers))
+      else:
+         response = flask_client.get(url, headers=headers)
+         status, mimetype, data = response.status_code, response.mimetype, response.get_data()
+      return status, mimetype, [json.loads(line) for line in data.splitlines()]
+
+   mismatches = []
+   def compare(label, flask_result, asgi_result, exact=True):
+      if not exact:
+         flask_result = (flask_result[0], parity_shape(flask_result[1]))
+         asgi_result = (asgi_result[0], parity_shape(asgi_result[1]))
+      if flask_result != asgi_result:
+         mismatches.append(f"{label}\n  flask: {flask_result}\n  asgi:  {asgi_result}")
+
+   params = {impl: {"impl": impl, "author_id": 999999, "quote_id": 999999, "cursor": ""} for impl in ("flask", "asgi")}
+   for method, url, body in PARITY_WRITES:
+      results = {}
+      for impl, values in params.items():
+         data = json.loads(json.dumps(body).replace("{impl}", impl)) if body else None
+         results[impl] = call(impl, method, url.format(**values), data)
+         status, response, _ = results[impl]
+         if status in (200, 201) and url == "/authors" and values["author_id"] == 999999:
+            values["author_id"] = response["id"]
+         if status == 200 and url.endswith("/quotes") and values["quote_id"] == 999999:
+            values["quote_id"] = response["id"]
+            values["cursor"] = encode_cursor({"id": response["id"]})
+      compare(f"{method} {url}", results["flask"], results["asgi"], exact=False)
+   assert all(values["quote_id"] != 999999 for values in params.values())
+
+   for impl in ("flask", "asgi"):
+      for url in PARITY_READS:
+         url = url.format(**params[impl])
+         compare(f"GET {url}", call("flask", "GET", url), call("asgi", "GET", url))
+      for url in PARITY_RANDOM:
+         url = url.format(**params[impl])
+         compare(f"GET {url}", call("flask", "GET", url), call("asgi", "GET", url), exact=False)
+      for url, headers in PARITY_STREAMS:
+         url = url.format(**params[impl])
+         compare(f"GET {url} {headers}", stream("flask", url, headers), stream("asgi", url, headers))
+   for url in ASGI_NOT_IMPLEMENTED:
+      status = call("asgi", "GET", url)[0]
+      if status != 501:
+         mismatches.append(f"GET {url}: asgi returned {status}, expected 501")
+
+   for url in PARITY_DELETES:
+      results = {impl: call(impl, "DELETE", url.format(**values)) for impl, values in params.items()}
+      compare(f"DELETE {url}", results["flask"], results["asgi"], exact=False)
+
+   assert not mismatches, "\n".join(mismatches)
@@ -0,0 +1,45 @@
+"""flask quotes check-plans на временной БД: планы запросов без полных SCAN и число SQL-запросов."""
+import sqlite3
+
+import pytest
+
+from cli import FULL_SCAN
+
+
+@pytest.mark.parametrize("detail, table", [
+   ("SCAN quotes", "quotes"),
+   ("SCAN TABLE quotes", "quotes"),
+   ("SCAN quotes USING INDEX ix_quotes_rating", "quotes"),
+   ("SCAN quotes USING COVERING INDEX ix_quotes_author_id", "quotes"),
+   ("SEARCH quotes USING INDEX ix_quotes_author_id (author_id=?)", None),
+   ("SCAN quotes_fts VIRTUAL TABLE INDEX 0:M2", None),
+   ("SCAN CONSTANT ROW", None),
+])
+def test_full_scan_pattern(detail, table):
+   match = FULL_SCAN.match(detail)
+   assert (match and match.group(1)) == table
+
+
+def test_check_plans(app, database):
+   conn = sqlite3.connect(database)
+   conn.executemany("INSERT INTO authors (id, name) VALUES (?, ?)", ((i, f"Author {i}") for i in range(1, 11)))
+   conn.executemany("INSERT INTO quotes (author_id, text, rating) VALUES (?, ?, ?)",
+                    ((i % 10 + 1, f"text of quote {i}", i % 5 + 1) for i in range(100)))
+   conn.commit()
+
+   result = app.test_cli_runner().invoke(args=["quotes", "check-plans"])
+   assert result.exit_code == 0, result.output
+   for line in ("POST /quotes/bulk ->", "PUT /authors/by-name/", "/quotes/filter?text__prefix=text ->",
+                "/quotes?stream=1 ->", "/changes?since=0 ->", "trigger quote_slots_ad:", "DELETE /authors/"):
+      assert line in result.output
+   # Временный автор для запросов на запись удален вместе с цитатами
+   assert conn.execute("SELECT count(*) FROM authors").fetchone()[0] == 10
+   assert conn.execute("SELECT count(*) FROM quotes").fetchone()[0] == 100
+   conn.close()
+
+
+def test_route_without_check(app, database):
+   app.add_url_rule("/unchecked", "unchecked", lambda: "")
+   result = app.test_cli_runner().invoke(args=["quotes", "check-plans"])
+   assert result.exit_code == 1
+   assert "NO PLAN CHECK: GET /unchecked" in result.output
@@ -0,0 +1,80 @@
+"""/quotes/random: слоты quote_slots остаются плотными после записей, выборка учитывает ограничения."""
+import collections
+
+from sqlalchemy import text
+
+from models import db
+
+
+def check_slots(app):
+   """Слоты каждой корзины - ровно 1..count из rating_stats, каждая цитата в двух корзинах."""
+   with app.app_context():
+      buckets = db.session.execute(text("""
+         SELECT author_id, rating, count(*), min(slot), max(slot), count(DISTINCT quote_id) FROM quote_slots
+         GROUP BY author_id, rating
+      """)).all()
+      stats = dict(((author_id, rating), count) for author_id, rating, count in db.session.execute(
+         text("SELECT author_id, rating, count FROM rating_stats WHERE count > 0")))
+      assert {(author_id, rating): count for author_id, rating, count, *_ in buckets} == stats
+      for _, _, count, low, high, distinct in buckets:
+         assert (low, high, distinct) == (1, count, count)
+      mismatched = db.session.scalar(text("""
+         SELECT count(*) FROM quote_slots JOIN quotes ON quotes.id = quote_slots.quote_id
+         WHERE quote_slots.rating != quotes.rating OR quote_slots.author_id NOT IN (0, quotes.author_id)
+      """))
+      assert mismatched == 0
+
+
+def test_slots_stay_dense(app, client):
+   authors = [client.post("/authors", json={"name": f"Author {i}"}).get_json()["id"] for i in range(3)]
+   ids = []
+   for i in range(60):
+      quote = client.post(f"/authors/{authors[i % 3]}/quotes", json={"text": f"q{i}", "rating": i % 5 + 1})
+      ids.append(quote.get_json()["id"])
+   check_slots(app)
+
+   for quote_id in ids[::4]:
+      assert client.delete(f"/quotes/{quote_id}").status_code == 200
+   for quote_id in ids[1::5]:
+      client.put(f"/quotes/{quote_id}", json={"rating": 5})
+   check_slots(app)
+
+   client.delete("/quotes?rating=5")
+   client.delete(f"/authors/{authors[0]}")
+   check_slots(app)
+
+   remaining = {quote["id"] for quote in client.get("/quotes?limit=100").get_json()}
+   sampled = client.get("/quotes/random?n=100").get_json()
+   assert len(sampled) == len(remaining)
+   assert {quote["id"] for quote in sampled} == remaining
+
+
+def test_random_constraints(client):
+   first = client.post("/authors", json={"name": "First"}).get_json()["id"]
+   second = client.post("/authors", json={"name": "Second"}).get_json()["id"]
+   for rating in range(1, 6):
+      client.post(f"/authors/{first}/quotes", json={"text": f"first {rating}", "rating": rating})
+      client.post(f"/authors/{second}/quotes", json={"text": f"second {rating}", "rating": rating})
+
+   quote = client.get("/quotes/random").get_json()
+   assert set(quote) == {"id", "author_id", "text", "rating"}
+
+   sample = client.get(f"/quotes/random?n=10&author_id={second}&min_rating=4").get_json()
+   assert sorted(quote["rating"] for quote in sample) == [4, 5]
+   assert {quote["author_id"] for quote in sample} == {second}
+
+   assert len(client.get("/quotes/random?n=3").get_json()) == 3
+   assert client.get("/quotes/random?n=0").status_code == 400
+   assert client.get("/quotes/random?author_id=0").status_code == 404
+   assert client.get("/quotes/random?author_id=999").status_code == 404
+   assert client.get(f"/quotes/random?author_id={first}&min_rating=6").status_code == 404
+
+
+def test_random_is_uniform(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   # Неравные корзины оценок: выбор не должен зависеть от размера корзины
+   for i in range(10):
+      client.post(f"/authors/{author_id}/quotes", json={"text": f"q{i}", "rating": 1 if i < 8 else 5})
+   hits = collections.Counter(client.get("/quotes/random").get_json()["id"] for _ in range(2000))
+   assert len(hits) == 10
+   assert min(hits.values()) > 120 and max(hits.values()) < 290
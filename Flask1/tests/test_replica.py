@@ -0,0 +1,123 @@
+"""Реплика для чтения: подмена снимка, чтение своих записей по cookie, один обновляющий процесс."""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import create_app, state, REPLICA_COOKIE
+from replica import SQLiteReplica
+
+
+@pytest.fixture
+def replica_app(database, tmp_path):
+   return create_app({"QUOTES_DATABASE": database, "SERVER_TIMING": False,
+                      "SQLITE_REPLICA_DATABASE": str(tmp_path / "replica.db"), "SQLITE_REPLICA_REFRESH": False})
+
+
+def refresh(app):
+   """Новый снимок; пауза - чтобы время снимка заведомо отличалось от предыдущих событий."""
+   time.sleep(0.01)
+   with app.app_context():
+      state().replica.refresh()
+
+
+def insert_directly(database, name):
+   """Запись в основную БД в обход приложения: cookie клиент не получает."""
+   conn = sqlite3.connect(database)
+   conn.execute("INSERT INTO authors (name) VALUES (?)", (name,))
+   conn.commit()
+   conn.close()
+
+
+def test_reads_primary_until_first_snapshot(replica_app, database):
+   client = replica_app.test_client()
+   insert_directly(database, "First")
+   assert len(client.get("/authors").get_json()) == 1
+
+
+def test_snapshot_swap(replica_app, database):
+   client = replica_app.test_client()
+   insert_directly(database, "First")
+   refresh(replica_app)
+   assert [author["name"] for author in client.get("/authors").get_json()] == ["First"]
+   assert client.get("/authors/1").get_json()["name"] == "First"
+
+   # До нового снимка чтение идет из старого
+   conn = sqlite3.connect(database)
+   conn.execute("UPDATE authors SET name = 'Renamed' WHERE id = 1")
+   conn.commit()
+   conn.close()
+   insert_directly(database, "Second")
+   assert len(client.get("/authors").get_json()) == 1
+
+   refresh(replica_app)
+   assert [author["name"] for author in client.get("/authors").get_json()] == ["Renamed", "Second"]
+   # Подмена сбрасывает кэш сущностей, заполненный из старого снимка
+   assert client.get("/authors/1").get_json()["name"] == "Renamed"
+
+
+def test_read_your_writes(replica_app):
+   writer = replica_app.test_client()
+   reader = replica_app.test_client()
+   writer.post("/authors", json={"name": "First"})
+   refresh(replica_app)
+
+   response = writer.post("/authors", json={"name": "Second"})
+   assert response.status_code == 201
+   assert writer.get_cookie(REPLICA_COOKIE) is not None
+   # Писавший клиент читает основную БД, остальные - снимок без его записи
+   assert len(writer.get("/authors").get_json()) == 2
+   assert len(reader.get("/authors").get_json()) == 1
+
+   # Снимок новее записи: писавший клиент снова читает реплику
+   refresh(replica_app)
+   assert len(writer.get("/authors").get_json()) == 2
+   assert len(reader.get("/authors").get_json()) == 2
+
+   # Неудачная запись cookie не обновляет
+   cookie = writer.get_cookie(REPLICA_COOKIE).value
+   assert writer.post("/authors", json={"name": "Second"}).status_code == 400
+   assert writer.get_cookie(REPLICA_COOKIE).value == cookie
+
+
+def test_single_refresher(database, tmp_path):
+   path = tmp_path / "replica.db"
+
+   class CountingReplica(SQLiteReplica):
+      refreshes = 0
+
+      def refresh(self):
+         self.refreshes += 1
+         return super().refresh()
+
+   first, second = CountingReplica(database, path, 0.01), CountingReplica(database, path, 0.01)
+   first_stop, second_stop = threading.Event(), threading.Event()
+   threads = [threading.Thread(target=first.run, args=(first_stop,)),
+              threading.Thread(target=second.run, args=(second_stop,))]
+   threads[0].start()
+   time.sleep(0.1)
+   threads[1].start()
+   try:
+      for i in range(3):
+         insert_directly(database, f"Author {i}")
+         time.sleep(0.1)
+      assert first.refreshes >= 2
+      assert second.refreshes == 0
+
+      # Ведущий остановился: второй берет блокировку и сразу снимает снимок
+      first_stop.set()
+      threads[0].join()
+      time.sleep(0.1)
+      assert second.refreshes == 1
+      insert_directly(database, "Late")
+      time.sleep(0.1)
+      assert second.refreshes == 2
+      conn = sqlite3.connect(path)
+      assert conn.execute("SELECT count(*) FROM authors").fetchone()[0] == 4
+      conn.close()
+   finally:
+      first_stop.set()
+      second_stop.set()
+      for thread in threads:
+         thread.join()
@@ -0,0 +1,17 @@
+"""/quotes/search: фрагменты с разметкой совпадений."""
+
+
+def test_snippet_escapes_quote_text(client):
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   client.post(f"/authors/{author_id}/quotes", json={"text": 'needle <img src=x onerror="alert(1)"> & co'})
+   [result] = client.get("/quotes/search?q=needle").get_json()
+   assert result["snippet"] == "<b>needle</b> &lt;img src=x onerror=&quot;alert(1)&quot;&gt; &amp; co"
+   assert result["text"] == 'needle <img src=x onerror="alert(1)"> & co'
+
+
+def test_snippet_custom_highlight(app, client):
+   app.config['SEARCH_HIGHLIGHT'] = ("[", "]")
+   author_id = client.post("/authors", json={"name": "Author"}).get_json()["id"]
+   client.post(f"/authors/{author_id}/quotes", json={"text": "find the needle here"})
+   [result] = client.get("/quotes/search?q=needle").get_json()
+   assert result["snippet"] == "find the [needle] here"